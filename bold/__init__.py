@@ -4,15 +4,52 @@ __author__ = 'Carlos Pena'
 __email__ = 'mycalesis@gmail.com'
 __version__ = '0.0.2'
 
-import logging
+import sys
 
-from .api import call_id
-from .api import call_taxon_search
-from .api import call_taxon_data
-from .api import call_specimen_data
-from .api import call_sequence_data
-from .api import call_full_data
-from .api import call_trace_files
 
+# Public names and the submodules defining them. The submodules are only
+# imported when one of their names is used, so that ``import bold`` is fast.
+_LAZY_NAMES = {
+    'call_id': 'api',
+    'call_id_many': 'api',
+    'call_taxon_search': 'api',
+    'call_taxon_data': 'api',
+    'call_specimen_data': 'api',
+    'call_sequence_data': 'api',
+    'call_full_data': 'api',
+    'call_trace_files': 'api',
+    'Session': 'session',
+}
 
-logging.basicConfig(format='[bold module]:%(levelname)s:%(message)s', level=logging.DEBUG)
+# Submodules, imported on first attribute access like ``bold.api``
+_SUBMODULES = (
+    'aio', 'api', 'cache', 'kmer', 'metrics', 'record', 'scheduler', 'seqstore',
+    'session', 'store', 'table', 'taxonomy', 'utils',
+)
+
+__all__ = sorted(_LAZY_NAMES)
+
+
+def _load(name):
+    from importlib import import_module
+    module = import_module('.' + _LAZY_NAMES[name], __name__)
+    value = getattr(module, name)
+    globals()[name] = value
+    return value
+
+
+if sys.version_info >= (3, 7):
+    def __getattr__(name):
+        if name in _LAZY_NAMES:
+            return _load(name)
+        if name in _SUBMODULES:
+            from importlib import import_module
+            return import_module('.' + name, __name__)
+        raise AttributeError("module %r has no attribute %r" % (__name__, name))
+
+    def __dir__():
+        return sorted(set(globals()) | set(_LAZY_NAMES) | set(_SUBMODULES))
+else:
+    # Module level __getattr__ is not supported, import everything now
+    for _name in _LAZY_NAMES:
+        _load(_name)
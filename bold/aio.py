@@ -0,0 +1,151 @@
+# -*- coding: utf-8 -*-
+"""Asynchronous versions of the ``call_*`` functions for use with asyncio.
+
+Every coroutine builds its request and parses the results exactly like the
+function of the same name in :mod:`bold.api`. The blocking HTTP transfer runs
+in a pool of worker threads over the shared, pooled
+:class:`bold.session.Session`, so many queries can be in flight at once from
+a single event loop. The number of concurrent requests is limited with
+:func:`set_max_concurrency`, and they are paced by the default
+:class:`bold.scheduler.Scheduler` like any other call, so its rates and
+concurrency limits must be raised too to go beyond them. Identical calls
+awaited at the same time share one request and one worker thread; if it
+fails, each caller gets its own copy of the exception.
+
+Needs Python 3.5 or later.
+
+Examples:
+
+    >>> import asyncio
+    >>> from bold import aio
+    >>> async def identify(sequences):
+    ...     return await asyncio.gather(*[aio.call_id(seq, db='COX1') for seq in sequences])
+
+"""
+import asyncio
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from . import api
+
+
+DEFAULT_MAX_CONCURRENCY = 32
+
+_max_concurrency = DEFAULT_MAX_CONCURRENCY
+_executor = None
+_executor_lock = threading.Lock()
+# Calls in flight, by event loop, function and arguments
+_pending = dict()
+
+
+def set_max_concurrency(limit):
+    """Sets how many requests to BOLD can be in flight at the same time.
+
+    Consider raising ``pool_size`` of the default
+    :class:`bold.session.Session` as well, so that the connections can be
+    kept alive between calls, and the limits of the default
+    :class:`bold.scheduler.Scheduler`, which paces every request.
+
+    Args:
+        limit: Maximum number of concurrent requests.
+
+    Raises:
+        ValueError: If `limit` is lower than 1.
+
+    """
+    global _max_concurrency, _executor
+    if limit < 1:
+        raise ValueError('Invalid value for ``limit``.')
+    with _executor_lock:
+        _max_concurrency = limit
+        executor = _executor
+        _executor = None
+    if executor is not None:
+        executor.shutdown(wait=False)
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=_max_concurrency)
+        return _executor
+
+
+async def _run(function, *args, **kwargs):
+    loop = asyncio.get_event_loop()
+    key = (loop, function.__name__, args, tuple(sorted(kwargs.items())))
+    try:
+        future = _pending.get(key)
+    except TypeError:
+        # Unhashable arguments, e.g. a SeqRecord, are still coalesced by
+        # bold.api in the worker thread
+        key = future = None
+    leader = future is None
+    if leader:
+        future = loop.run_in_executor(_get_executor(),
+                                      functools.partial(function, *args, **kwargs))
+        if key is not None:
+            _pending[key] = future
+            future.add_done_callback(lambda future: _pending.pop(key, None))
+    try:
+        # A cancelled caller must not cancel the call for the others
+        return await asyncio.shield(future)
+    except Exception as e:
+        if leader:
+            raise
+        raise api._copy_exception(e)
+
+
+async def call_id(seq, db):
+    """Asynchronous version of :func:`bold.api.call_id`."""
+    return await _run(api.call_id, seq, db)
+
+
+async def call_taxon_search(taxonomic_identification, fuzzy=None):
+    """Asynchronous version of :func:`bold.api.call_taxon_search`."""
+    return await _run(api.call_taxon_search, taxonomic_identification, fuzzy=fuzzy)
+
+
+async def call_taxon_data(tax_id, data_type=None, include_tree=None):
+    """Asynchronous version of :func:`bold.api.call_taxon_data`."""
+    return await _run(api.call_taxon_data, tax_id, data_type=data_type,
+                      include_tree=include_tree)
+
+
+async def call_specimen_data(taxon=None, ids=None, bin=None, container=None,
+                             institutions=None, researchers=None, geo=None,
+                             format=None):
+    """Asynchronous version of :func:`bold.api.call_specimen_data`."""
+    return await _run(api.call_specimen_data, taxon=taxon, ids=ids, bin=bin,
+                      container=container, institutions=institutions,
+                      researchers=researchers, geo=geo, format=format)
+
+
+async def call_sequence_data(taxon=None, ids=None, bin=None, container=None,
+                             institutions=None, researchers=None, geo=None,
+                             marker=None):
+    """Asynchronous version of :func:`bold.api.call_sequence_data`."""
+    return await _run(api.call_sequence_data, taxon=taxon, ids=ids, bin=bin,
+                      container=container, institutions=institutions,
+                      researchers=researchers, geo=geo, marker=marker)
+
+
+async def call_full_data(taxon=None, ids=None, bin=None, container=None,
+                         institutions=None, researchers=None, geo=None,
+                         marker=None, format=None):
+    """Asynchronous version of :func:`bold.api.call_full_data`."""
+    return await _run(api.call_full_data, taxon=taxon, ids=ids, bin=bin,
+                      container=container, institutions=institutions,
+                      researchers=researchers, geo=geo, marker=marker,
+                      format=format)
+
+
+async def call_trace_files(taxon=None, ids=None, bin=None, container=None,
+                           institutions=None, researchers=None, geo=None,
+                           marker=None):
+    """Asynchronous version of :func:`bold.api.call_trace_files`."""
+    return await _run(api.call_trace_files, taxon=taxon, ids=ids, bin=bin,
+                      container=container, institutions=institutions,
+                      researchers=researchers, geo=geo, marker=marker)
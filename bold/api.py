@@ -1,20 +1,317 @@
-import json
+import hashlib
 import os
 import re
-from random import randint
 import sys
+import threading
 import warnings
 import xml
 import xml.etree.ElementTree as ET
 
 from Bio import BiopythonWarning
-from Bio import SeqIO
-from Bio._py3k import Request as _Request
-from Bio._py3k import urlopen as _urlopen
+from Bio._py3k import basestring
 from Bio._py3k import urlencode as _urlencode
 from Bio._py3k import _as_string
+from Bio._py3k import _binary_to_string_handle
+from Bio._py3k import StringIO
+
+from io import BytesIO
+
+try:
+    from queue import Empty, Queue
+except ImportError:
+    from Queue import Empty, Queue
 
 from . import utils
+from .record import record_class
+from . import metrics
+from .metrics import timer
+from .session import get_default_session
+
+# The cache, scheduler, table and taxonomy modules (and sqlite3 and json with
+# them) are imported where they are used, on the first call to BOLD.
+
+
+# ugly hack for python 2.6 that does not have ET.ParseError
+if sys.version.startswith('2.6'):
+    _XMLParseError = xml.parsers.expat.ExpatError
+else:
+    _XMLParseError = ET.ParseError
+
+# End-points of the BOLD API for each service alias
+_URLS = {
+    'call_id': "http://boldsystems.org/index.php/Ids_xml",
+    'call_taxon_search': "http://www.boldsystems.org/index.php/API_Tax/TaxonSearch",
+    'call_taxon_data': "http://www.boldsystems.org/index.php/API_Tax/TaxonData",
+    'call_specimen_data': "http://www.boldsystems.org/index.php/API_Public/specimen",
+    'call_sequence_data': "http://www.boldsystems.org/index.php/API_Public/sequence",
+    'call_full_data': "http://www.boldsystems.org/index.php/API_Public/combined",
+    'call_trace_files': "http://www.boldsystems.org/index.php/API_Public/trace",
+}
+
+_XML_FIELDS = (
+    # These pairs correspond to convertions of key names from BOLD
+    # to friendly versions:
+    #
+    # (key name from BOLD, friendlier key name)
+
+    # For call_id
+    ('ID', 'bold_id'),
+    ('sequencedescription', 'sequence_description'),
+    ('database', 'database'),
+    ('citation', 'citation'),
+    ('taxonomicidentification', 'taxonomic_identification'),
+    ('similarity', 'similarity'),
+    ('specimen/url', 'specimen_url'),
+    ('specimen/collectionlocation/country', 'specimen_collection_location_country'),
+    ('specimen/collectionlocation/coord/lat', 'specimen_collection_location_latitude'),
+    ('specimen/collectionlocation/coord/lon', 'specimen_collection_location_longitude'),
+
+    ('record_id', 'record_id'),
+    ('processid', 'process_id'),
+    ('bin_uri', 'bin_uri'),
+    ('specimen_identifiers/sampleid', 'specimen_identifiers_sample_id'),
+    ('specimen_identifiers/catalognum', 'specimen_identifiers_catalog_num'),
+    ('specimen_identifiers/fieldnum', 'specimen_identifiers_field_num'),
+    ('specimen_identifiers/institution_storing', 'specimen_identifiers_institution_storing'),
+    ('taxonomy/identification_provided_by', 'taxonomy_identification_provided_by'),
+    ('taxonomy/phylum/taxon/taxID', 'taxonomy_phylum_taxon_id'),
+    ('taxonomy/phylum/taxon/name', 'taxonomy_phylum_taxon_name'),
+    ('taxonomy/class/taxon/taxID', 'taxonomy_class_taxon_id'),
+    ('taxonomy/class/taxon/name', 'taxonomy_class_taxon_name'),
+    ('taxonomy/order/taxon/taxID', 'taxonomy_order_taxon_id'),
+    ('taxonomy/order/taxon/name', 'taxonomy_order_taxon_name'),
+    ('taxonomy/family/taxon/taxID', 'taxonomy_family_taxon_id'),
+    ('taxonomy/family/taxon/name', 'taxonomy_family_taxon_name'),
+    ('taxonomy/genus/taxon/taxID', 'taxonomy_genus_taxon_id'),
+    ('taxonomy/genus/taxon/name', 'taxonomy_genus_taxon_name'),
+    ('taxonomy/species/taxon/taxID', 'taxonomy_species_taxon_id'),
+    ('taxonomy/species/taxon/name', 'taxonomy_species_taxon_name'),
+    ('specimen_details/voucher_type', 'specimen_details_voucher_type'),
+    ('specimen_details/voucher_desc', 'specimen_details_voucher_desc'),
+    ('specimen_details/extrainfo', 'specimen_details_extra_info'),
+    ('specimen_details/lifestage', 'specimen_details_lifestage'),
+    ('collection_event/collector', 'collection_event_collector'),
+    ('collection_event/collectors', 'collection_event_collectors'),
+    ('collection_event/collectiondate', 'collection_event_collection_date'),
+    ('collection_event/coordinates/lat', 'collection_event_coordinates_latitude'),
+    ('collection_event/coordinates/long', 'collection_event_coordinates_longitude'),
+    ('collection_event/exactsite', 'collection_event_exact_site'),
+    ('collection_event/country', 'collection_event_country'),
+    ('collection_event/province', 'collection_event_province'),
+    ('specimen_imagery/media/mediaID', 'specimen_imagery_media_id'),
+    ('specimen_imagery/media/caption', 'specimen_imagery_media_caption'),
+    ('specimen_imagery/media/metatags', 'specimen_imagery_media_metatags'),
+    ('specimen_imagery/media/copyright', 'specimen_imagery_media_copyright'),
+    ('specimen_imagery/media/image_file', 'specimen_imagery_media_image_file'),
+    ('tracefiles/read/read_id', 'tracefiles_read_read_id'),
+    ('tracefiles/read/run_date', 'tracefiles_read_run_date'),
+    ('tracefiles/read/sequencing_center', 'tracefiles_read_sequencing_center'),
+    ('tracefiles/read/direction', 'tracefiles_read_direction'),
+    ('tracefiles/read/seq_primer', 'tracefiles_read_seq_primer'),
+    ('tracefiles/read/trace_link', 'tracefiles_read_trace_link'),
+    ('tracefiles/read/markercode', 'tracefiles_read_marker_code'),
+    ('sequences/sequence/sequenceID', 'sequences_sequence_sequence_id'),
+    ('sequences/sequence/markercode', 'sequences_sequence_marker_code'),
+    ('sequences/sequence/genbank_accession', 'sequences_sequence_genbank_accession'),
+    ('sequences/sequence/nucleotides', 'sequences_sequence_nucleotides'),
+)
+
+
+class _XMLFieldExtractor(object):
+    """Converts XML elements from BOLD into dictionaries in a single pass.
+
+    The element paths of ``fields`` are compiled once into a lookup table, so
+    each record subtree is walked only once instead of evaluating every path
+    with ``find`` and ``findall``.
+
+    Args:
+        tag: XML tag of the elements holding one item each.
+        fields: Pairs of (path of element from BOLD, friendlier key name).
+
+    """
+    def __init__(self, tag, fields):
+        self.tag = tag
+        self.keys = dict(fields)
+        self.prefixes = set()
+        for path, key in fields:
+            steps = path.split('/')
+            for i in range(1, len(steps)):
+                self.prefixes.add('/'.join(steps[:i]))
+
+    def __call__(self, element):
+        item = dict()
+        self._walk(element, '', item)
+        return item
+
+    def _walk(self, element, prefix, item):
+        keys = self.keys
+        prefixes = self.prefixes
+        for child in element:
+            path = prefix + child.tag
+            key = keys.get(path)
+            if key is not None:
+                if key not in item:
+                    item[key] = child.text
+                elif isinstance(item[key], list):
+                    item[key].append(child.text)
+                else:
+                    # Several elements share this path
+                    item[key] = [item[key], child.text]
+            if path in prefixes:
+                self._walk(child, path + '/', item)
+
+
+_ID_EXTRACTOR = _XMLFieldExtractor('match', _XML_FIELDS)
+_RECORD_EXTRACTOR = _XMLFieldExtractor('record', _XML_FIELDS)
+
+# Compact records returned with ``compact=True``
+SpecimenRecord = record_class('SpecimenRecord', [key for path, key in _XML_FIELDS])
+
+
+_TRACE_EXTENSIONS = ('.ab1', '.scf')
+
+
+def _parse_trace_listing(text):
+    """Maps trace file names to (process_id, marker) from a TAR file listing."""
+    lines = text.splitlines()
+    if not lines:
+        return dict()
+    header = [column.strip().lower() for column in lines[0].split('\t')]
+    try:
+        process_id_column = [i for i, column in enumerate(header) if 'process' in column][0]
+        marker_column = [i for i, column in enumerate(header) if 'marker' in column][0]
+        file_column = [i for i, column in enumerate(header) if 'file' in column][0]
+    except IndexError:
+        return dict()
+
+    listing = dict()
+    for line in lines[1:]:
+        columns = line.split('\t')
+        if len(columns) < len(header):
+            continue
+        name = os.path.basename(columns[file_column].strip())
+        if name.lower().endswith('.gz'):
+            name = name[:-3]
+        listing[name] = (columns[process_id_column].strip(), columns[marker_column].strip())
+    return listing
+
+
+# Conversions of key names in JSON from BOLD to friendly versions
+_JSON_KEYS = {
+    'taxid': 'tax_id',
+    'taxon': 'taxon',
+    'tax_rank': 'tax_rank',
+    'tax_division': 'tax_division',
+    'parentid': 'parent_id',
+    'parentname': 'parent_name',
+    'taxonrep': 'taxon_rep',
+}
+
+
+def _json_item(json_obj):
+    get = _JSON_KEYS.get
+    item = dict()
+    for k, v in json_obj.items():
+        item[get(k, k)] = v
+    return item
+
+
+def _is_simple_json(keys):
+    """True if any key is not a taxon ID, i.e. the document is one item."""
+    for key in keys:
+        if not '0' <= key[:1] <= '9':
+            return True
+    return False
+
+
+def _is_number(value):
+    return value is not None and not isinstance(value, (dict, list, basestring, bool))
+
+
+_JSON_WHITESPACE = re.compile(r'[ \t\n\r]*')
+
+
+class _JSONObjectReader(object):
+    """Decodes the members of a top-level JSON object one at a time.
+
+    Only one member needs to be in memory at a time, so large documents can
+    be parsed while they are being downloaded.
+
+    Args:
+        handle: File-like object returning strings.
+        chunk_size: Number of characters read at a time.
+
+    """
+    def __init__(self, handle, chunk_size=65536):
+        import json
+
+        self.handle = handle
+        self.chunk_size = chunk_size
+        self.decoder = json.JSONDecoder()
+        self.buffer = ''
+        self.position = 0
+        self.eof = False
+
+    def __iter__(self):
+        if self._next_char() != '{':
+            raise ValueError("BOLD did not return any result.")
+        self.position += 1
+        if self._next_char() == '}':
+            return
+        while True:
+            if self._next_char() != '"':
+                raise ValueError('Invalid JSON document from BOLD.')
+            key = self._decode()
+            self._expect(':')
+            yield key, self._decode()
+            if self._expect(',}') == '}':
+                return
+
+    def _fill(self, size):
+        if self.eof:
+            return False
+        chunk = self.handle.read(size)
+        if not chunk:
+            self.eof = True
+            return False
+        self.buffer = self.buffer[self.position:] + chunk
+        self.position = 0
+        return True
+
+    def _next_char(self):
+        """Skips whitespace and returns the next character, '' at the end."""
+        while True:
+            self.position = _JSON_WHITESPACE.match(self.buffer, self.position).end()
+            if self.position < len(self.buffer):
+                return self.buffer[self.position]
+            if not self._fill(self.chunk_size):
+                return ''
+
+    def _expect(self, characters):
+        character = self._next_char()
+        if not character or character not in characters:
+            raise ValueError('Invalid JSON document from BOLD.')
+        self.position += 1
+        return character
+
+    def _decode(self):
+        self._next_char()
+        size = self.chunk_size
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.position)
+            except ValueError:
+                # The value continues in the next chunks
+                if not self._fill(size):
+                    raise
+                size *= 2
+                continue
+            if _is_number(value) and (end == len(self.buffer) or
+                                      self.buffer[end] not in ' \t\n\r,}]') and self._fill(size):
+                # The number might continue in the next chunk
+                continue
+            self.position = end
+            return value
 
 
 class Response(object):
@@ -25,8 +322,54 @@ class Response(object):
     Attributes:
         items (list or str): Metadata from BOLD after parsing.
         service (str): Alias of the method used to interact with BOLD.
+        compact (bool): Whether XML records are parsed into
+                        :class:`SpecimenRecord` objects instead of dictionaries.
+        timings (dict): Seconds spent in each step of the call: ``connect``
+                        (DNS lookup and TCP connection, 0 when a pooled
+                        connection was reused), ``first_byte``, ``download``,
+                        ``decode``, ``parse`` and ``total``. Steps that were
+                        not measured, e.g. for cached responses, are missing.
+        bytes_received (int): Size of the body received.
+        record_count (int): Number of items parsed.
 
     """
+    compact = False
+    bytes_received = None
+    record_count = None
+
+    def __init__(self):
+        self.timings = dict()
+
+    def _complete(self, start):
+        """Records the totals of a finished call and reports them."""
+        self.timings['total'] = timer() - start
+        items = getattr(self, 'items', None)
+        if items is not None and not isinstance(items, basestring):
+            self.record_count = len(items)
+        metrics.emit(self)
+
+    def _instrument(self, items, handle, start):
+        """Times the parsing of streamed items, reported once all are read."""
+        parse = 0.0
+        count = 0
+        iterator = iter(items)
+        while True:
+            parse_start = timer()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                break
+            finally:
+                parse += timer() - parse_start
+            count += 1
+            yield item
+        # Downloading and parsing overlap
+        self.timings['parse'] = parse
+        self.timings['total'] = timer() - start
+        self.record_count = count
+        _count_bytes(self, handle)
+        metrics.emit(self)
+
     def _parse_data(self, service, result_string):
         """Parses XML response from BOLD.
 
@@ -49,17 +392,10 @@ class Response(object):
         if service == 'call_specimen_data' or service == 'call_full_data' or \
                 service == 'call_id':
             # Result_string could be data as tab-separated values (tsv)
-            # ugly hack for python 2.6 that does not have ET.ParseError
-            if sys.version.startswith('2.6'):
-                try:
-                    self._parse_xml(result_string)
-                except xml.parsers.expat.ExpatError:
-                    self.items = result_string
-            else:
-                try:
-                    self._parse_xml(result_string)
-                except ET.ParseError:
-                    self.items = result_string
+            try:
+                self._parse_xml(result_string)
+            except _XMLParseError:
+                self.items = result_string
 
         if service == 'call_sequence_data':
             self._parse_fasta(result_string)
@@ -68,6 +404,143 @@ class Response(object):
             # file_contents is in binary form
             self.file_contents = result_string
 
+    def _parse_stream(self, service, handle):
+        """Parses response from BOLD lazily while it is being downloaded.
+
+        Args:
+            service: Alias of the method used to interact with BOLD.
+            handle: File-like object returned by the HTTP request.
+
+        Returns:
+            Iterator over all items as dictionaries or SeqRecord objects.
+
+        """
+        self.method = service
+
+        if service == 'call_specimen_data' or service == 'call_full_data':
+            self.items = self._iter_xml(handle)
+        elif service == 'call_sequence_data':
+            self.items = self._iter_fasta(handle)
+        elif service == 'call_taxon_search' or service == 'call_taxon_data':
+            self.items = self._iter_json(handle)
+        elif service == 'call_trace_files':
+            # The archive is read when calling `save` or `iter_traces`
+            self.file_contents = None
+            self._handle = handle
+        else:
+            handle.close()
+            raise ValueError('Streaming is not supported for ``' + service + '``.')
+
+    def _parse_table(self, service, handle):
+        """Parses TSV data from BOLD into columns while it is being downloaded.
+
+        Args:
+            service: Alias of the method used to interact with BOLD.
+            handle: File-like object returned by the HTTP request.
+
+        Returns:
+            A :class:`bold.table.Table` with one sequence per column.
+
+        Raises:
+            ValueError: "BOLD did not return any result."
+
+        """
+        from .table import read_tsv
+
+        self.method = service
+        try:
+            table = read_tsv(_binary_to_string_handle(handle))
+        finally:
+            handle.close()
+        if table is None:
+            raise ValueError("BOLD did not return any result.")
+        self.items = table
+
+    def save(self, destination, chunk_size=65536, progress=None):
+        """Writes the TAR archive of trace files to disk.
+
+        If the response was streamed, the archive is copied from the network
+        in chunks of `chunk_size` bytes and never held in memory as a whole.
+
+        Args:
+            destination: File name or binary file object to write to.
+            chunk_size: Number of bytes read and written at a time.
+            progress: Optional function called with the number of bytes
+                      written so far after every chunk.
+
+        Returns:
+            Number of bytes written.
+
+        """
+        handle = self._trace_handle()
+        if hasattr(destination, 'write'):
+            output = destination
+        else:
+            output = open(destination, 'wb')
+        written = 0
+        try:
+            while True:
+                chunk = handle.read(chunk_size)
+                if not chunk:
+                    break
+                output.write(chunk)
+                written += len(chunk)
+                if progress is not None:
+                    progress(written)
+        finally:
+            handle.close()
+            if output is not destination:
+                output.close()
+        return written
+
+    def iter_traces(self):
+        """Reads the trace files from the TAR archive one at a time.
+
+        The archive is read sequentially, so only one trace file is kept in
+        memory. Process ID and marker are taken from the file listing of the
+        archive when it precedes the trace file, and otherwise from the name
+        of the trace file (marker is None then).
+
+        Yields:
+            Tuples of (process_id, marker, trace file contents as bytes).
+
+        """
+        import tarfile
+        import zlib
+
+        handle = self._trace_handle()
+        listing = dict()
+        try:
+            archive = tarfile.open(fileobj=handle, mode='r|*')
+            for member in archive:
+                if not member.isfile():
+                    continue
+                name = os.path.basename(member.name)
+                contents = archive.extractfile(member).read()
+                if name.lower().endswith('.gz'):
+                    name = name[:-3]
+                    contents = zlib.decompress(contents, 16 + zlib.MAX_WBITS)
+
+                if name.lower().endswith(_TRACE_EXTENSIONS):
+                    if name in listing:
+                        process_id, marker = listing[name]
+                    else:
+                        process_id, marker = re.split('[\\[_.]', name)[0], None
+                    yield process_id, marker, contents
+                elif name.lower().endswith('.txt'):
+                    listing.update(_parse_trace_listing(_as_string(contents)))
+        finally:
+            handle.close()
+
+    def _trace_handle(self):
+        if getattr(self, '_handle', None) is not None:
+            handle = self._handle
+            self._handle = None
+            return handle
+        if getattr(self, 'file_contents', None) is None:
+            raise ValueError('This response has no trace files to read.')
+        return BytesIO(self.file_contents)
+
     def _parse_json(self, result_string):
         """Parses JSON response from BOLD.
 
@@ -81,50 +554,56 @@ class Response(object):
             ValueError: "BOLD did not return any result."
 
         """
-        items_from_bold = []
-        append = items_from_bold.append
+        import json
+
         response = json.loads(result_string)
-        if hasattr(response, 'items'):
-            # Is this a simple JSON and we got only one item?
-            simple_json = False
-            for i in response.keys():
-                res = re.search('^[0-9]+', i)
-                if res is None:
-                    simple_json = True
-
-            if simple_json is True:
-                response = [response]
-            for string_id in response:
-                item = dict()
-                try:
-                    json_obj = response[string_id]
-                except TypeError:
-                    obj = string_id
-                    json_obj = obj
-
-                if hasattr(json_obj, 'items'):
-                    for k, v in json_obj.items():
-                        if k == 'taxid':
-                            item['tax_id'] = v
-                        elif k == 'taxon':
-                            item['taxon'] = v
-                        elif k == 'tax_rank':
-                            item['tax_rank'] = v
-                        elif k == 'tax_division':
-                            item['tax_division'] = v
-                        elif k == 'parentid':
-                            item['parent_id'] = v
-                        elif k == 'parentname':
-                            item['parent_name'] = v
-                        elif k == 'taxonrep':
-                            item['taxon_rep'] = v
-                        else:
-                            item[k] = v
-                    append(item)
-            self.items = items_from_bold
-        else:
+        if not hasattr(response, 'items'):
             raise ValueError("BOLD did not return any result.")
 
+        if _is_simple_json(response):
+            # A simple JSON with only one item
+            self.items = [_json_item(response)]
+        else:
+            self.items = [_json_item(json_obj) for json_obj in response.values()
+                          if hasattr(json_obj, 'items')]
+
+    def _iter_json(self, handle, chunk_size=65536):
+        """Parses JSON from BOLD one item at a time while it is being downloaded.
+
+        Documents keyed by taxon ID yield each taxon as soon as it has been
+        read. A simple JSON document is yielded as one item at the end.
+
+        Args:
+            handle: File-like object with the JSON returned from BOLD.
+            chunk_size: Number of characters read at a time.
+
+        Yields:
+            Items as dictionaries.
+
+        Raises:
+            ValueError: "BOLD did not return any result."
+
+        """
+        members = iter(_JSONObjectReader(_binary_to_string_handle(handle), chunk_size))
+        keyed = False
+        try:
+            for key, json_obj in members:
+                if not _is_simple_json([key]):
+                    keyed = True
+                    if hasattr(json_obj, 'items'):
+                        yield _json_item(json_obj)
+                    continue
+                if keyed:
+                    raise ValueError('Cannot stream a JSON document mixing taxon IDs and '
+                                     'other keys. Use ``stream=False``.')
+                document = {key: json_obj}
+                for key, json_obj in members:
+                    document[key] = json_obj
+                yield _json_item(document)
+                return
+        finally:
+            handle.close()
+
     def _parse_xml(self, result_string):
         """Parses XML response from BOLD.
 
@@ -138,94 +617,58 @@ class Response(object):
         items_from_bold = []
         append = items_from_bold.append
 
-        if self.method == 'call_id':
-            xml_tag = 'match'
-        else:
-            xml_tag = 'record'
-
         root = ET.fromstring(result_string)
-        for match in root.findall(xml_tag):
-            item = dict()
-            fields = [
-                # These pairs correspond to convertions of key names from BOLD
-                # to friendly versions:
-                #
-                # (key name from BOLD, friendlier key name)
-
-                # For call_id
-                ('ID', 'bold_id'),
-                ('sequencedescription', 'sequence_description'),
-                ('database', 'database'),
-                ('citation', 'citation'),
-                ('taxonomicidentification', 'taxonomic_identification'),
-                ('similarity', 'similarity'),
-                ('specimen/url', 'specimen_url'),
-                ('specimen/collectionlocation/country', 'specimen_collection_location_country'),
-                ('specimen/collectionlocation/coord/lat', 'specimen_collection_location_latitude'),
-                ('specimen/collectionlocation/coord/lon', 'specimen_collection_location_longitude'),
-
-                ('record_id', 'record_id'),
-                ('processid', 'process_id'),
-                ('bin_uri', 'bin_uri'),
-                ('specimen_identifiers/sampleid', 'specimen_identifiers_sample_id'),
-                ('specimen_identifiers/catalognum', 'specimen_identifiers_catalog_num'),
-                ('specimen_identifiers/fieldnum', 'specimen_identifiers_field_num'),
-                ('specimen_identifiers/institution_storing', 'specimen_identifiers_institution_storing'),
-                ('taxonomy/identification_provided_by', 'taxonomy_identification_provided_by'),
-                ('taxonomy/phylum/taxon/taxID', 'taxonomy_phylum_taxon_id'),
-                ('taxonomy/phylum/taxon/name', 'taxonomy_phylum_taxon_name'),
-                ('taxonomy/class/taxon/taxID', 'taxonomy_class_taxon_id'),
-                ('taxonomy/class/taxon/name', 'taxonomy_class_taxon_name'),
-                ('taxonomy/order/taxon/taxID', 'taxonomy_order_taxon_id'),
-                ('taxonomy/order/taxon/name', 'taxonomy_order_taxon_name'),
-                ('taxonomy/family/taxon/taxID', 'taxonomy_family_taxon_id'),
-                ('taxonomy/family/taxon/name', 'taxonomy_family_taxon_name'),
-                ('taxonomy/genus/taxon/taxID', 'taxonomy_genus_taxon_id'),
-                ('taxonomy/genus/taxon/name', 'taxonomy_genus_taxon_name'),
-                ('taxonomy/species/taxon/taxID', 'taxonomy_species_taxon_id'),
-                ('taxonomy/species/taxon/name', 'taxonomy_species_taxon_name'),
-                ('specimen_details/voucher_type', 'specimen_details_voucher_type'),
-                ('specimen_details/voucher_desc', 'specimen_details_voucher_desc'),
-                ('specimen_details/extrainfo', 'specimen_details_extra_info'),
-                ('specimen_details/lifestage', 'specimen_details_lifestage'),
-                ('collection_event/collector', 'collection_event_collector'),
-                ('collection_event/collectors', 'collection_event_collectors'),
-                ('collection_event/collectiondate', 'collection_event_collection_date'),
-                ('collection_event/coordinates/lat', 'collection_event_coordinates_latitude'),
-                ('collection_event/coordinates/long', 'collection_event_coordinates_longitude'),
-                ('collection_event/exactsite', 'collection_event_exact_site'),
-                ('collection_event/country', 'collection_event_country'),
-                ('collection_event/province', 'collection_event_province'),
-                ('specimen_imagery/media/mediaID', 'specimen_imagery_media_id'),
-                ('specimen_imagery/media/caption', 'specimen_imagery_media_caption'),
-                ('specimen_imagery/media/metatags', 'specimen_imagery_media_metatags'),
-                ('specimen_imagery/media/copyright', 'specimen_imagery_media_copyright'),
-                ('specimen_imagery/media/image_file', 'specimen_imagery_media_image_file'),
-                ('tracefiles/read/read_id', 'tracefiles_read_read_id'),
-                ('tracefiles/read/run_date', 'tracefiles_read_run_date'),
-                ('tracefiles/read/sequencing_center', 'tracefiles_read_sequencing_center'),
-                ('tracefiles/read/direction', 'tracefiles_read_direction'),
-                ('tracefiles/read/seq_primer', 'tracefiles_read_seq_primer'),
-                ('tracefiles/read/trace_link', 'tracefiles_read_trace_link'),
-                ('tracefiles/read/markercode', 'tracefiles_read_marker_code'),
-                ('sequences/sequence/sequenceID', 'sequences_sequence_sequence_id'),
-                ('sequences/sequence/markercode', 'sequences_sequence_marker_code'),
-                ('sequences/sequence/genbank_accession', 'sequences_sequence_genbank_accession'),
-                ('sequences/sequence/nucleotides', 'sequences_sequence_nucleotides'),
-            ]
-            for field in fields:
-                if match.find(field[0]) is not None:
-                    key = field[1]
-                    matched = match.findall(field[0])
-                    if len(matched) == 0:
-                        item[key] = None
-                    elif len(matched) == 1:
-                        item[key] = match.find(field[0]).text
-                    elif len(matched) > 1:
-                        item[key] = [i.text for i in matched]
-            append(item)
+        extractor = self._xml_extractor()
+        for match in root.findall(extractor.tag):
+            append(extractor(match))
+        if self.compact is True:
+            items_from_bold = [SpecimenRecord.from_dict(item) for item in items_from_bold]
         self.items = items_from_bold
 
+    def _iter_xml(self, handle):
+        """Parses XML response from BOLD incrementally.
+
+        Records are parsed as they arrive from the socket and each element is
+        cleared after its dictionary has been yielded, so memory use does not
+        grow with the number of records returned by BOLD.
+
+        Args:
+            handle: File-like object with the XML returned from BOLD.
+
+        Yields:
+            One dictionary per item.
+
+        Raises:
+            ValueError: "BOLD did not return any result."
+
+        """
+        extractor = self._xml_extractor()
+        root = None
+        try:
+            for event, element in ET.iterparse(handle, events=('start', 'end')):
+                if root is None:
+                    root = element
+                elif event == 'end' and element.tag == extractor.tag:
+                    if self.compact is True:
+                        yield SpecimenRecord.from_dict(extractor(element))
+                    else:
+                        yield extractor(element)
+                    element.clear()
+                    root.clear()
+        except _XMLParseError:
+            if root is None:
+                raise ValueError("BOLD did not return any result.")
+            raise
+        finally:
+            handle.close()
+
+    def _xml_extractor(self):
+        """Field extractor used for the XML returned by this service."""
+        if self.method == 'call_id':
+            return _ID_EXTRACTOR
+        else:
+            return _RECORD_EXTRACTOR
+
     def _parse_fasta(self, result_string):
         """Parses string response from BOLD containing FASTA sequences.
 
@@ -236,24 +679,59 @@ class Response(object):
             List of all items as Biopython SeqRecord objects.
 
         """
-        filename = "tmp_" + str(randint(1, 1000000)) + ".fas"
-        with open(filename, "w") as handle:
-            handle.write(result_string)
-        generator = SeqIO.parse(filename, "fasta")
-        self.items = [i for i in generator]
-        os.remove(filename)
+        from Bio import SeqIO
+
+        self.items = list(SeqIO.parse(StringIO(result_string), "fasta"))
+
+    def _iter_fasta(self, handle):
+        """Parses FASTA sequences from BOLD while they are being downloaded.
+
+        Args:
+            handle: File-like object with the FASTA sequences returned from BOLD.
+
+        Yields:
+            Biopython SeqRecord objects.
+
+        Raises:
+            ValueError: "BOLD did not return any result."
+
+        """
+        from Bio import SeqIO
+
+        empty = True
+        try:
+            for seq_record in SeqIO.parse(_binary_to_string_handle(handle), "fasta"):
+                empty = False
+                yield seq_record
+        finally:
+            handle.close()
+        if empty is True:
+            raise ValueError("BOLD did not return any result.")
 
 
 class Request(object):
     """Constructs a :class:`Request <Request>`. Sends HTTP request.
 
+    Args:
+        session: Optional :class:`bold.session.Session` holding the pooled
+                 connections. The default session is used if not given.
+
     Returns:
         A :class:`Response <Response>` object.
 
     """
+    def __init__(self, session=None):
+        if session is None:
+            session = get_default_session()
+        self.session = session
+
     def get(self, service, **kwargs):
         """Does HTTP request to BOLD webservice.
 
+        Calls with the same service and parameters made at the same time
+        from several threads share one download and parse, and all get the
+        same Response object. Streamed and columnar calls are not shared.
+
         Args:
             service: The BOLD API alias to interact with.
             kwargs: Paramenters send by users.
@@ -263,6 +741,9 @@ class Request(object):
 
         """
         params = ''
+        stream = kwargs.pop('stream', False)
+        columnar = kwargs.pop('columnar', False)
+        compact = kwargs.pop('compact', False)
 
         if service == 'call_id':
             sequence = utils._prepare_sequence(kwargs['seq'])
@@ -299,19 +780,192 @@ class Request(object):
                     payload[k] = v
             params = _urlencode(payload)
 
+        from .cache import get_memory_cache
+
+        start = timer()
+        memory_cache = get_memory_cache()
+        memory_key = None
+        if stream is True:
+            # Items are only parsed while they are being read
+            memory_cache = None
+        if memory_cache is not None and service in memory_cache.services:
+            memory_key = memory_cache.make_key(service, dict((k, v) for k, v in kwargs.items()
+                                                             if k != 'url'))
+            items = memory_cache.get(memory_key)
+            if items is not None:
+                response = Response()
+                response.method = service
+                response.compact = compact
+                response.items = items
+                response._complete(start)
+                _add_to_taxonomy_index(service, response)
+                return response
+
         url = kwargs['url'] + "?" + params
-        req = _Request(url, headers={'User-Agent': 'BiopythonClient'})
-        handle = _urlopen(req)
-        response = Response()
+        if stream is True or columnar is True:
+            # Handles are read by one caller only
+            return self._fetch(service, url, params, stream, columnar, compact, memory_key)
+        flight_key = (service, kwargs['url'], '&'.join(sorted(params.split('&'))), compact)
+        return _coalesce(flight_key, lambda: self._fetch(service, url, params, stream,
+                                                         columnar, compact, memory_key))
 
-        if service == 'call_trace_files':
-            binary_result = handle.read()
-            response._parse_data(service, binary_result)
+    def _fetch(self, service, url, params, stream, columnar, compact, memory_key):
+        """Downloads and parses the response from BOLD or from the cache."""
+        from .cache import get_memory_cache
+
+        response = Response()
+        response.compact = compact
+        timings = response.timings
+        start = timer()
+
+        if columnar is True:
+            handle = self._open(service, url, params, response=response)
+            parse_start = timer()
+            response._parse_table(service, handle)
+            # Downloading and parsing overlap
+            timings['parse'] = timer() - parse_start
+            _count_bytes(response, handle)
+        elif stream is True:
+            handle = self._open(service, url, params, response=response)
+            response._parse_stream(service, handle)
+            if service != 'call_trace_files':
+                response.items = response._instrument(response.items, handle, start)
         else:
-            result = _as_string(handle.read())
+            result = self._open(service, url, params, read=True, response=response)
+            response.bytes_received = len(result)
+            if service != 'call_trace_files':
+                decode_start = timer()
+                result = _as_string(result)
+                timings['decode'] = timer() - decode_start
+            parse_start = timer()
             response._parse_data(service, result)
+            timings['parse'] = timer() - parse_start
+
+        if not stream or service == 'call_trace_files':
+            response._complete(start)
+
+        if not stream:
+            _add_to_taxonomy_index(service, response)
+
+        memory_cache = get_memory_cache()
+        if memory_key is not None and memory_cache is not None:
+            memory_cache.put(memory_key, response.items)
         return response
 
+    def _open(self, service, url, params, read=False, response=None):
+        """Opens the response from the cache, if enabled, or from BOLD.
+
+        Requests sent to BOLD go through the default scheduler, which paces
+        and retries them. If `read` is True the whole body is returned, so
+        that a download interrupted half-way is retried too. The network
+        timings are added to `response`.
+
+        """
+        from .cache import get_cache
+        from .scheduler import get_default_scheduler
+
+        timings = response.timings if response is not None else dict()
+        cache = get_cache()
+        key = None
+        if cache is not None:
+            key = cache.make_key(service, params)
+            handle = cache.get(service, key)
+            if handle is not None:
+                if response is not None:
+                    response.bytes_received = os.fstat(handle.fileno()).st_size
+                return _read_all(handle, timings) if read else handle
+
+        def fetch():
+            handle = self.session.open(url, headers={'User-Agent': 'BiopythonClient'})
+            timings['connect'] = getattr(handle, 'connect_time', None)
+            timings['first_byte'] = getattr(handle, 'first_byte_time', None)
+            if cache is not None:
+                handle = cache.wrap(service, key, handle)
+            return _read_all(handle, timings) if read else handle
+
+        return get_default_scheduler().run(service, fetch)
+
+
+class _Flight(object):
+    """A call to BOLD that identical concurrent calls wait for."""
+    def __init__(self):
+        self.done = threading.Event()
+        self.response = None
+        self.error = None
+
+
+_flights = dict()
+_flights_lock = threading.Lock()
+
+
+def _coalesce(key, function):
+    """Runs `function` once for all the threads calling with the same `key`
+    at the same time.
+
+    The first caller downloads and parses the response. Callers arriving
+    while it is in flight wait and get the same Response object, or a copy
+    of the exception caused by the one of the first caller.
+
+    """
+    with _flights_lock:
+        flight = _flights.get(key)
+        leader = flight is None
+        if leader:
+            flight = _flights[key] = _Flight()
+    if not leader:
+        flight.done.wait()
+        if flight.error is not None:
+            raise _copy_exception(flight.error)
+        return flight.response
+    try:
+        flight.response = function()
+    except Exception as e:
+        flight.error = e
+        raise
+    finally:
+        with _flights_lock:
+            del _flights[key]
+        flight.done.set()
+    return flight.response
+
+
+def _copy_exception(error):
+    """Copy of `error` for another caller to raise, with `error` as cause.
+
+    The copy is made without calling ``__init__``, whose arguments are not
+    always kept in ``args``, e.g. for ``HTTPError``.
+
+    """
+    copy = error.__class__.__new__(error.__class__, *error.args)
+    copy.__dict__.update(error.__dict__)
+    copy.args = error.args
+    copy.__cause__ = error
+    return copy
+
+
+def _add_to_taxonomy_index(service, response):
+    from .taxonomy import get_taxonomy_index
+
+    taxonomy_index = get_taxonomy_index()
+    if taxonomy_index is not None and \
+            (service == 'call_taxon_search' or service == 'call_taxon_data'):
+        taxonomy_index.add_items(response.items)
+
+
+def _read_all(handle, timings):
+    start = timer()
+    try:
+        return handle.read()
+    finally:
+        handle.close()
+        timings['download'] = timer() - start
+
+
+def _count_bytes(response, handle):
+    bytes_read = getattr(handle, 'bytes_read', None)
+    if bytes_read is not None:
+        response.bytes_received = bytes_read
+
 
 def request(service, **kwargs):
     """Builds our request based on given arguments. Used internally.
@@ -329,19 +983,19 @@ def request(service, **kwargs):
 
     if service == 'call_id':
         # User wants the service `call_id`. So we need to use this URL:
-        url = "http://boldsystems.org/index.php/Ids_xml"
+        url = _URLS['call_id']
         return req.get(service=service, url=url, **kwargs)
 
     if service == 'call_taxon_search':
-        url = "http://www.boldsystems.org/index.php/API_Tax/TaxonSearch"
+        url = _URLS['call_taxon_search']
         return req.get(service=service, url=url, **kwargs)
 
     if service == 'call_taxon_data':
-        url = "http://www.boldsystems.org/index.php/API_Tax/TaxonData"
+        url = _URLS['call_taxon_data']
         return req.get(service=service, url=url, **kwargs)
 
     if service == 'call_trace_files':
-        url = "http://www.boldsystems.org/index.php/API_Public/trace"
+        url = _URLS['call_trace_files']
 
         args_returning_lots_of_data = ['institutions', 'researchers', 'geo']
         for arg in args_returning_lots_of_data:
@@ -355,7 +1009,7 @@ def request(service, **kwargs):
         return req.get(service=service, url=url, **kwargs)
 
     if service == 'call_specimen_data':
-        url = "http://www.boldsystems.org/index.php/API_Public/specimen"
+        url = _URLS['call_specimen_data']
 
         args_returning_lots_of_data = ['institutions', 'researchers', 'geo']
         for arg in args_returning_lots_of_data:
@@ -369,9 +1023,9 @@ def request(service, **kwargs):
         return req.get(service=service, url=url, **kwargs)
 
     if service == 'call_sequence_data':
-        url = "http://www.boldsystems.org/index.php/API_Public/sequence"
+        url = _URLS['call_sequence_data']
     elif service == 'call_full_data':
-        url = "http://www.boldsystems.org/index.php/API_Public/combined"
+        url = _URLS['call_full_data']
 
     args_returning_lots_of_data = ['institutions', 'researchers', 'geo']
     for arg in args_returning_lots_of_data:
@@ -385,6 +1039,126 @@ def request(service, **kwargs):
     return req.get(service=service, url=url, **kwargs)
 
 
+def _call_sharded(function, kwargs, shard_by=None, partition=None, workers=4):
+    """Splits one big query into sub-queries that are fetched in parallel.
+
+    Args:
+        function: One of `call_specimen_data`, `call_sequence_data` or
+                  `call_full_data`.
+        kwargs: Arguments of the whole query.
+        shard_by: Name of the argument whose pipe-separated values are sent
+                  to BOLD as one sub-query each, e.g. ``'taxon'``.
+        partition: List of dictionaries with the arguments that replace those
+                   in `kwargs` for each sub-query.
+        workers: Maximum number of sub-queries sent to BOLD at the same time.
+
+    Returns:
+        A Response object with the merged and de-duplicated items.
+
+    Raises:
+        ValueError: If the arguments cannot be split or BOLD did not return
+                    any result for any sub-query.
+
+    """
+    if kwargs.get('stream') is True:
+        raise ValueError('``stream`` cannot be used when sharding a query.')
+    if workers < 1:
+        raise ValueError('Invalid value for ``workers``.')
+
+    if partition is None:
+        if kwargs.get(shard_by) is None:
+            raise ValueError('Cannot shard the query by ``' + str(shard_by) + '``.')
+        partition = [{shard_by: value} for value in kwargs[shard_by].split('|')
+                     if value.strip() != '']
+    sub_queries = []
+    for arguments in partition:
+        sub_query = dict(kwargs)
+        sub_query.update(arguments)
+        if kwargs.get('columnar') is True:
+            # TSV strings are merged first and then turned into columns
+            sub_query['columnar'] = False
+        sub_queries.append(sub_query)
+
+    results = [None] * len(sub_queries)
+    pending = Queue()
+    for position in range(len(sub_queries)):
+        pending.put(position)
+
+    def work():
+        while True:
+            try:
+                position = pending.get_nowait()
+            except Empty:
+                break
+            try:
+                results[position] = function(**sub_queries[position])
+            except Exception as e:
+                results[position] = e
+
+    threads = [threading.Thread(target=work) for i in range(min(workers, len(sub_queries)))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    responses = []
+    for result in results:
+        if isinstance(result, ValueError) and str(result) == "BOLD did not return any result.":
+            # Nothing found for this sub-query
+            continue
+        if isinstance(result, Exception):
+            raise result
+        responses.append(result)
+    if not responses:
+        raise ValueError("BOLD did not return any result.")
+    merged = _merge_responses(responses)
+    if kwargs.get('columnar') is True:
+        from .table import read_tsv
+        merged.items = read_tsv(merged.items.splitlines())
+    return merged
+
+
+def _merge_responses(responses):
+    """Joins the items of several responses without repeating records.
+
+    Records are identified by `record_id` or `process_id`, sequences by their
+    id and lines of TSV data by their contents.
+
+    """
+    merged = Response()
+    merged.method = responses[0].method
+
+    if isinstance(responses[0].items, basestring):
+        lines = []
+        seen = set()
+        for response in responses:
+            response_lines = response.items.splitlines()
+            if not lines:
+                lines.append(response_lines[0])  # header
+            for line in response_lines[1:]:
+                if line not in seen:
+                    seen.add(line)
+                    lines.append(line)
+        merged.items = '\n'.join(lines) + '\n'
+        return merged
+
+    items = []
+    seen = set()
+    for response in responses:
+        for item in response.items:
+            if hasattr(item, 'get'):
+                key = item.get('record_id') or item.get('process_id')
+            else:
+                key = item.id
+            if key is None:
+                items.append(item)
+            elif key not in seen:
+                seen.add(key)
+                items.append(item)
+    merged.items = items
+    return merged
+
+
 def call_id(seq, db):
     """Call the ID Engine API
     http://www.boldsystems.org/index.php/resources/api?type=idengine
@@ -410,13 +1184,164 @@ def call_id(seq, db):
     return request('call_id', seq=seq, db=db)
 
 
-def call_taxon_search(taxonomic_identification, fuzzy=None):
+def call_id_many(records, db, workers=4, progress=None, deduplicate=True, stats=None):
+    """Call the ID Engine API for many sequences in parallel.
+
+    Identical sequences, after :func:`bold.utils._prepare_sequence` removed
+    gaps and changed them to uppercase, are sent to BOLD only once and their
+    result is yielded for every input id that has that sequence. A failed
+    query is not reused: its exception is yielded for the input ids waiting
+    for it, and a later input id with the same sequence is sent again.
+
+    Args:
+        records: Iterable of DNA sequence strings or seq_record objects.
+        db: The BOLD database of available records. Choices: ``COX1_SPECIES``,'
+            ``COX1``, ``COX1_SPECIES_PUBLIC``, ``COX1_L640bp``.
+        workers: Maximum number of queries sent to BOLD at the same time.
+        progress: Optional function called as ``progress(done, total)`` every
+                  time a query finishes. ``total`` is None if the number of
+                  records is not known in advance.
+        deduplicate: Whether to send identical sequences only once. Their
+                     input ids then share the same result object.
+        stats: Optional dictionary that is updated with the number of
+               ``sequences`` read, the number of ``unique`` sequences sent to
+               BOLD and, once all results were yielded, their ``ratio``.
+
+    Yields:
+        Tuples of (input id, result) in the order in which the queries finish.
+        The input id is the ``id`` of a seq_record object or the position of
+        a string in `records`. The result is a Response object, or the
+        exception raised for that sequence, so that one failed query does not
+        abort the whole batch.
+
+    Raises:
+        ValueError: If `workers` is lower than 1.
+        Exception: Whatever reading `records` raised, e.g. for a malformed
+                   FASTA file. No more queries are sent after that.
+
+    Examples:
+
+        >>> import bold
+        >>> from Bio import SeqIO
+        >>> seq_records = SeqIO.parse('reads.fas', 'fasta')
+        >>> stats = dict()
+        >>> for input_id, res in bold.call_id_many(seq_records, db='COX1', workers=8,
+        ...                                        stats=stats):
+        ...     if isinstance(res, Exception):
+        ...         continue
+        ...     top_hit = res.items[0]
+        >>> stats
+        {'sequences': 12000, 'unique': 830, 'ratio': 14.46}
+
+    """
+    if workers < 1:
+        raise ValueError('Invalid value for ``workers``.')
+    try:
+        total = len(records)
+    except TypeError:
+        total = None
+    if stats is None:
+        stats = dict()
+    stats['sequences'] = stats['unique'] = 0
+
+    enumerated = enumerate(records)
+    lock = threading.Lock()
+    stop = threading.Event()
+    results = Queue()
+    finished = object()
+    failed = object()
+    # Sequence hash to the input ids waiting for its result, and to the
+    # successful results already received
+    waiting = dict()
+    received = dict()
+
+    def work():
+        try:
+            query()
+        finally:
+            results.put(finished)
+
+    def query():
+        while not stop.is_set():
+            with lock:
+                try:
+                    position, seq_record = next(enumerated)
+                except StopIteration:
+                    break
+                except Exception as e:
+                    stop.set()
+                    results.put((failed, e))
+                    break
+            input_id = getattr(seq_record, 'id', position)
+            key = None
+            if deduplicate:
+                try:
+                    sequence = utils._prepare_sequence(seq_record)
+                except Exception as e:
+                    with lock:
+                        stats['sequences'] += 1
+                    results.put((input_id, e))
+                    continue
+                key = hashlib.sha1(sequence.encode('utf-8')).digest()
+            with lock:
+                stats['sequences'] += 1
+                if key in received:
+                    results.put((input_id, received[key]))
+                    continue
+                if key in waiting:
+                    waiting[key].append(input_id)
+                    continue
+                stats['unique'] += 1
+                if key is not None:
+                    waiting[key] = [input_id]
+            try:
+                result = call_id(seq_record, db)
+            except Exception as e:
+                result = e
+            input_ids = [input_id]
+            if key is not None:
+                with lock:
+                    if not isinstance(result, Exception):
+                        received[key] = result
+                    input_ids = waiting.pop(key)
+            for input_id in input_ids:
+                results.put((input_id, result))
+
+    threads = [threading.Thread(target=work) for i in range(workers)]
+    for thread in threads:
+        thread.daemon = True
+        thread.start()
+
+    done = 0
+    running = workers
+    try:
+        while running > 0:
+            result = results.get()
+            if result is finished:
+                running -= 1
+                continue
+            if result[0] is failed:
+                raise result[1]
+            done += 1
+            if progress is not None:
+                progress(done, total)
+            yield result
+        if stats['unique']:
+            stats['ratio'] = round(float(stats['sequences']) / stats['unique'], 2)
+    finally:
+        stop.set()
+
+
+def call_taxon_search(taxonomic_identification, fuzzy=None, stream=False):
     """Call the TaxonSearch API
     http://www.boldsystems.org/index.php/resources/api?type=taxonomy#Ideasforwebservices-SequenceParameters
 
     Args:
         taxonomic_identification: species or any taxon name
         fuzzy: False by default
+        stream: If True, ``items`` is an iterator yielding each taxon while
+                the response is being downloaded, for fuzzy searches with
+                thousands of hits.
 
     Returns:
         List of dictionaries containing metadata. One dictionary per BOLD record.
@@ -443,11 +1368,12 @@ def call_taxon_search(taxonomic_identification, fuzzy=None):
 
     return request('call_taxon_search',
                    taxonomic_identification=taxonomic_identification,
-                   fuzzy=fuzzy
+                   fuzzy=fuzzy,
+                   stream=stream,
                    )
 
 
-def call_taxon_data(tax_id, data_type=None, include_tree=None):
+def call_taxon_data(tax_id, data_type=None, include_tree=None, stream=False):
     """Call the TaxonData API. It has several methods to get additional
     metadata.
 
@@ -456,6 +1382,8 @@ def call_taxon_data(tax_id, data_type=None, include_tree=None):
         data_type: ``basic|all|images``. Default is ``basic``.
         include_tree: Optional. Also returns information for parent taxa. True or
                   False (default).
+        stream: If True, ``items`` is an iterator yielding each taxon while
+                the response is being downloaded.
 
     Returns:
         List of dictionaries containing metadata for a given taxon.
@@ -487,12 +1415,13 @@ def call_taxon_data(tax_id, data_type=None, include_tree=None):
         raise ValueError('Invalid value for ``include_tree``. Use True or False.')
 
     return request('call_taxon_data', tax_id=tax_id, data_type=data_type,
-                   include_tree=include_tree)
+                   include_tree=include_tree, stream=stream)
 
 
 def call_specimen_data(taxon=None, ids=None, bin=None, container=None,
                        institutions=None, researchers=None, geo=None,
-                       format=None):
+                       format=None, stream=False, columnar=False, compact=False,
+                       shard_by=None, partition=None, workers=4):
     """Call the Specimen Data Retrieval API.
 
     Args:
@@ -512,9 +1441,26 @@ def call_specimen_data(taxon=None, ids=None, bin=None, container=None,
         format: Optional: ``format='tsv'`` will return results a string
                 containing data in tab-separated values. If not used, the
                 data will be returned as dictionary (default behaviour).
+        stream: Optional. If True, ``items`` will be an iterator that parses
+                records while they are being downloaded instead of a list.
+        columnar: Optional. If True, TSV data is requested and parsed while it
+                  is being downloaded into a :class:`bold.table.Table` with
+                  one sequence per column instead of a string.
+        compact: Optional. If True, records are :class:`SpecimenRecord`
+                 objects, which use much less memory than dictionaries. Their
+                 values can be read by key or as attributes.
+        shard_by: Optional. Name of an argument with pipe-separated values,
+                  e.g. ``shard_by='taxon'``. Each value is requested as a
+                  separate sub-query and the results are merged without
+                  repeated records.
+        partition: Optional. List of dictionaries with the arguments of each
+                   sub-query, e.g. ``[{'geo': 'Peru'}, {'geo': 'Bolivia'}]``.
+        workers: Number of sub-queries fetched in parallel when using
+                 `shard_by` or `partition`.
 
     Raises:
-        ValueError: If `format` is not None and not 'tsv'.
+        ValueError: If `format` is not None and not 'tsv', or if `stream` is
+                    used together with `format`.
 
     Returns:
         Matching specimen data records as string in TSV format or as list of
@@ -532,16 +1478,28 @@ def call_specimen_data(taxon=None, ids=None, bin=None, container=None,
     """
     if format is not None and format != 'tsv':
         raise ValueError('Invalid value for ``format``')
+    if columnar is True:
+        format = 'tsv'
+    if stream is True and format is not None:
+        raise ValueError('``stream`` can only be used with XML results.')
+    if shard_by is not None or partition is not None:
+        return _call_sharded(call_specimen_data, dict(
+            taxon=taxon, ids=ids, bin=bin, container=container,
+            institutions=institutions, researchers=researchers, geo=geo,
+            format=format, stream=stream, columnar=columnar,
+            compact=compact), shard_by, partition, workers)
 
     return request('call_specimen_data', taxon=taxon, ids=ids, bin=bin,
                    container=container, institutions=institutions,
-                   researchers=researchers, geo=geo, format=format
+                   researchers=researchers, geo=geo, format=format,
+                   stream=stream, columnar=columnar, compact=compact
                    )
 
 
 def call_sequence_data(taxon=None, ids=None, bin=None, container=None,
                        institutions=None, researchers=None, geo=None,
-                       marker=None):
+                       marker=None, stream=False, shard_by=None, partition=None,
+                       workers=4):
     """Call the Specimen Data Retrieval API.
 
     Args:
@@ -559,6 +1517,17 @@ def call_sequence_data(taxon=None, ids=None, bin=None, container=None,
         geo: Geographic sites such as countries, provinces and states. Example:
              `geo='Alaska'`.
         marker: Genetic marker code. Example: `marker='COI-5P'`.
+        stream: Optional. If True, ``items`` will be a generator of SeqRecord
+                objects parsed while they are being downloaded instead of a
+                list.
+        shard_by: Optional. Name of an argument with pipe-separated values,
+                  e.g. ``shard_by='taxon'``. Each value is requested as a
+                  separate sub-query and the results are merged without
+                  repeated records.
+        partition: Optional. List of dictionaries with the arguments of each
+                   sub-query, e.g. ``[{'geo': 'Peru'}, {'geo': 'Bolivia'}]``.
+        workers: Number of sub-queries fetched in parallel when using
+                 `shard_by` or `partition`.
 
     Returns:
         DNA sequences of matching records in FASTA format.
@@ -572,15 +1541,23 @@ def call_sequence_data(taxon=None, ids=None, bin=None, container=None,
         ['GBLN4477-14|Hermeuptychia', 'GBLN4478-14|Hermeuptychia', 'GBLN4479-14|Hermeuptychia']
 
     """
+    if shard_by is not None or partition is not None:
+        return _call_sharded(call_sequence_data, dict(
+            taxon=taxon, ids=ids, bin=bin, container=container,
+            institutions=institutions, researchers=researchers, geo=geo,
+            marker=marker, stream=stream), shard_by, partition, workers)
+
     return request('call_sequence_data', taxon=taxon, ids=ids, bin=bin,
                    container=container, institutions=institutions,
-                   researchers=researchers, geo=geo, marker=marker
+                   researchers=researchers, geo=geo, marker=marker,
+                   stream=stream
                    )
 
 
 def call_full_data(taxon=None, ids=None, bin=None, container=None,
                    institutions=None, researchers=None, geo=None,
-                   marker=None, format=None):
+                   marker=None, format=None, stream=False, columnar=False,
+                   compact=False, shard_by=None, partition=None, workers=4):
     """Call the Full Data Retrieval API (combined).
 
     Args:
@@ -599,13 +1576,30 @@ def call_full_data(taxon=None, ids=None, bin=None, container=None,
              `geo='Alaska'`.
         marker: Genetic marker code. Example: `marker='COI-5P'`.
         format: Optional. `format='tsv'`.
+        stream: Optional. If True, ``items`` will be an iterator that parses
+                records while they are being downloaded instead of a list.
+        columnar: Optional. If True, TSV data is requested and parsed while it
+                  is being downloaded into a :class:`bold.table.Table` with
+                  one sequence per column instead of a string.
+        compact: Optional. If True, records are :class:`SpecimenRecord`
+                 objects, which use much less memory than dictionaries. Their
+                 values can be read by key or as attributes.
+        shard_by: Optional. Name of an argument with pipe-separated values,
+                  e.g. ``shard_by='taxon'``. Each value is requested as a
+                  separate sub-query and the results are merged without
+                  repeated records.
+        partition: Optional. List of dictionaries with the arguments of each
+                   sub-query, e.g. ``[{'geo': 'Peru'}, {'geo': 'Bolivia'}]``.
+        workers: Number of sub-queries fetched in parallel when using
+                 `shard_by` or `partition`.
 
     Returns:
         The data is returned as a string in TSV format or list of dicts parsed
         from a XML file.
 
     Raises:
-        ValueError: If `format` is not None or 'tsv'.
+        ValueError: If `format` is not None or 'tsv', or if `stream` is used
+                    together with `format`.
 
     Examples:
 
@@ -618,16 +1612,28 @@ def call_full_data(taxon=None, ids=None, bin=None, container=None,
     """
     if format is not None and format != 'tsv':
         raise ValueError('Invalid value for ``format``')
+    if columnar is True:
+        format = 'tsv'
+    if stream is True and format is not None:
+        raise ValueError('``stream`` can only be used with XML results.')
+    if shard_by is not None or partition is not None:
+        return _call_sharded(call_full_data, dict(
+            taxon=taxon, ids=ids, bin=bin, container=container,
+            institutions=institutions, researchers=researchers, geo=geo,
+            marker=marker, format=format, stream=stream, columnar=columnar,
+            compact=compact),
+            shard_by, partition, workers)
 
     return request('call_full_data', taxon=taxon, ids=ids, bin=bin,
                    container=container, institutions=institutions,
-                   researchers=researchers, geo=geo, marker=marker, format=format
+                   researchers=researchers, geo=geo, marker=marker, format=format,
+                   stream=stream, columnar=columnar, compact=compact
                    )
 
 
 def call_trace_files(taxon=None, ids=None, bin=None, container=None,
                      institutions=None, researchers=None, geo=None,
-                     marker=None):
+                     marker=None, stream=False):
     """Trace files can be retrieved from BOLD by querying with several parameters.
 
     Args:
@@ -645,6 +1651,9 @@ def call_trace_files(taxon=None, ids=None, bin=None, container=None,
         geo: Geographic sites such as countries, provinces and states. Example:
              `geo='Alaska'`.
         marker: Genetic marker code. Example: `marker='COI-5P'`.
+        stream: Optional. If True, the archive is not downloaded into
+                ``file_contents`` but read from the network by
+                ``Response.save`` or ``Response.iter_traces``.
 
     Returns:
         A TAR file consisting of compressed Trace Files (traces in either
@@ -660,8 +1669,13 @@ def call_trace_files(taxon=None, ids=None, bin=None, container=None,
         ...     handle.write(res.file_contents)
         4106240
 
+        >>> res = bold.call_trace_files(taxon='Euptychia mollis', stream=True)
+        >>> res.save('trace_files.tar')
+        4106240
+
     """
     return request('call_trace_files', taxon=taxon, ids=ids, bin=bin,
                    container=container, institutions=institutions,
-                   researchers=researchers, geo=geo, marker=marker
+                   researchers=researchers, geo=geo, marker=marker,
+                   stream=stream
                    )
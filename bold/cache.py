@@ -0,0 +1,346 @@
+# -*- coding: utf-8 -*-
+import copy
+import hashlib
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+from Bio._py3k import OrderedDict
+
+
+class DiskCache(object):
+    """Keeps the raw responses from BOLD in a local directory.
+
+    Responses are keyed by service alias plus the normalized query parameters
+    and are stored exactly as downloaded, including the TAR archives of
+    ``call_trace_files``. Entries expire after a time to live that can be set
+    per service, and the least recently used entries are evicted once the
+    cache grows over ``max_bytes``.
+
+    Args:
+        directory: Folder where the payloads and their index are stored.
+        max_bytes: Maximum total size of the stored payloads.
+        ttl: Default time to live of an entry in seconds. Use None for entries
+             that never expire.
+        ttls: Optional dictionary of service alias to time to live, overriding
+              `ttl` for those services.
+
+    Attributes:
+        hits (int): Number of requests served from the cache.
+        misses (int): Number of requests that had to go to BOLD.
+
+    Examples:
+
+        >>> import bold
+        >>> from bold.cache import DiskCache, set_cache
+        >>> set_cache(DiskCache('bold_cache', ttls={'call_taxon_data': 7 * 86400}))
+        >>> res = bold.call_taxon_data(302603)  # from BOLD
+        >>> res = bold.call_taxon_data(302603)  # from bold_cache
+
+    """
+    def __init__(self, directory, max_bytes=1024 ** 3, ttl=86400, ttls=None):
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.ttls = ttls or dict()
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(os.path.join(directory, 'index.sqlite'),
+                                   check_same_thread=False)
+        self._db.execute('CREATE TABLE IF NOT EXISTS entries ('
+                         'key TEXT PRIMARY KEY, service TEXT, size INTEGER, '
+                         'created REAL, accessed REAL)')
+        self._db.commit()
+
+    @staticmethod
+    def make_key(service, params):
+        """Key of a request that does not depend on the order of parameters.
+
+        Args:
+            service: The BOLD API alias to interact with.
+            params: URL encoded query string.
+
+        """
+        return service + '?' + '&'.join(sorted(params.split('&')))
+
+    def get(self, service, key):
+        """Opens the stored payload for `key`.
+
+        Returns:
+            A binary file handle, or None if the entry is missing or expired.
+
+        """
+        now = time.time()
+        with self._lock:
+            row = self._db.execute('SELECT created FROM entries WHERE key = ?',
+                                   (key,)).fetchone()
+            ttl = self.ttls.get(service, self.ttl)
+            if row is None or (ttl is not None and now - row[0] > ttl):
+                self.misses += 1
+                if row is not None:
+                    self._delete(key)
+                    self._db.commit()
+                return None
+            try:
+                handle = open(self._path(key), 'rb')
+            except IOError:
+                self.misses += 1
+                self._delete(key)
+                self._db.commit()
+                return None
+            self.hits += 1
+            self._db.execute('UPDATE entries SET accessed = ? WHERE key = ?', (now, key))
+            self._db.commit()
+        return handle
+
+    def put(self, service, key, data):
+        """Stores the payload `data` (bytes) for `key`."""
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory)
+        with os.fdopen(fd, 'wb') as handle:
+            handle.write(data)
+        self._commit(service, key, tmp_path)
+
+    def wrap(self, service, key, handle):
+        """Wraps a response handle so that its payload is stored once read.
+
+        The payload is written to the cache while it is being read and is
+        only added to the cache once the end of the response is reached.
+
+        """
+        return _CachingHandle(self, service, key, handle)
+
+    def stats(self):
+        """Returns hits, misses, number of entries and total bytes stored."""
+        with self._lock:
+            entries, size = self._db.execute(
+                'SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries').fetchone()
+        return {'hits': self.hits, 'misses': self.misses, 'entries': entries,
+                'bytes': size}
+
+    def clear(self):
+        """Removes all entries."""
+        with self._lock:
+            for (key,) in self._db.execute('SELECT key FROM entries').fetchall():
+                self._delete(key)
+            self._db.commit()
+
+    def _path(self, key):
+        return os.path.join(self.directory, hashlib.sha1(key.encode('utf-8')).hexdigest())
+
+    def _delete(self, key):
+        self._db.execute('DELETE FROM entries WHERE key = ?', (key,))
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+
+    def _commit(self, service, key, tmp_path):
+        size = os.path.getsize(tmp_path)
+        now = time.time()
+        with self._lock:
+            self._delete(key)
+            os.rename(tmp_path, self._path(key))
+            self._db.execute('INSERT INTO entries VALUES (?, ?, ?, ?, ?)',
+                             (key, service, size, now, now))
+            self._evict()
+            self._db.commit()
+
+    def _evict(self):
+        total = self._db.execute('SELECT COALESCE(SUM(size), 0) FROM entries').fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        rows = self._db.execute('SELECT key, size FROM entries ORDER BY accessed').fetchall()
+        for key, size in rows:
+            if total <= self.max_bytes:
+                break
+            self._delete(key)
+            total -= size
+
+
+class _CachingHandle(object):
+    """File-like response that copies everything read into the cache.
+
+    """
+    def __init__(self, cache, service, key, handle):
+        self._cache = cache
+        self._service = service
+        self._key = key
+        self._handle = handle
+        fd, self._tmp_path = tempfile.mkstemp(dir=cache.directory)
+        self._copy = os.fdopen(fd, 'wb')
+
+    def read(self, amt=None):
+        if amt is None or amt < 0:
+            data = self._handle.read()
+            self._write(data)
+            self._finish()
+        else:
+            data = self._handle.read(amt)
+            self._write(data)
+            if not data:
+                self._finish()
+        return data
+
+    def readline(self):
+        line = self._handle.readline()
+        self._write(line)
+        if not line:
+            self._finish()
+        return line
+
+    def __iter__(self):
+        while True:
+            line = self.readline()
+            if not line:
+                break
+            yield line
+
+    @property
+    def bytes_read(self):
+        return getattr(self._handle, 'bytes_read', None)
+
+    def close(self):
+        self._handle.close()
+        if self._copy is not None:
+            # The response was not read completely, do not store it
+            self._copy.close()
+            self._copy = None
+            os.remove(self._tmp_path)
+
+    def _write(self, data):
+        if self._copy is not None:
+            self._copy.write(data)
+
+    def _finish(self):
+        if self._copy is not None:
+            self._copy.close()
+            self._copy = None
+            self._cache._commit(self._service, self._key, self._tmp_path)
+
+
+class MemoryCache(object):
+    """Keeps parsed taxonomy results in memory, evicting the least recently used.
+
+    Only ``call_taxon_search`` and ``call_taxon_data`` are memoized, since
+    their results hardly change while a program is running. Repeated lookups
+    skip both the HTTP request and the parsing of the JSON response. It is
+    safe to use from several threads.
+
+    Args:
+        capacity: Maximum number of results kept in memory.
+
+    Attributes:
+        hits (int): Number of lookups served from memory.
+        misses (int): Number of lookups that were not in memory.
+
+    Examples:
+
+        >>> import bold
+        >>> from bold.cache import MemoryCache, set_memory_cache
+        >>> cache = MemoryCache(capacity=5000)
+        >>> set_memory_cache(cache)
+        >>> res = bold.call_taxon_data(302603)
+        >>> cache.invalidate('call_taxon_data', tax_id=302603)
+
+    """
+    services = ('call_taxon_search', 'call_taxon_data')
+
+    def __init__(self, capacity=1000):
+        if capacity < 1:
+            raise ValueError('Invalid value for ``capacity``.')
+        self.capacity = capacity
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(service, params):
+        """Key of a call made with the arguments `params` (a dictionary)."""
+        return service, tuple(sorted(params.items()))
+
+    def get(self, key):
+        """Returns a copy of the stored items for `key`, or None."""
+        with self._lock:
+            items = self._entries.pop(key, None)
+            if items is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._entries[key] = items
+        return copy.deepcopy(items)
+
+    def put(self, key, items):
+        """Stores the parsed `items` for `key`."""
+        items = copy.deepcopy(items)
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = items
+            while len(self._entries) > self.capacity:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, service=None, **params):
+        """Removes stored results.
+
+        Without arguments everything is removed. Otherwise only the results
+        of `service` that were called with the given arguments are removed.
+
+        Args:
+            service: Optional service alias, e.g. ``call_taxon_data``.
+            params: Optional arguments of the call, e.g. ``tax_id=302603``.
+
+        """
+        with self._lock:
+            for key in list(self._entries):
+                key_service, key_params = key
+                if service is not None and key_service != service:
+                    continue
+                if all(item in key_params for item in params.items()):
+                    del self._entries[key]
+
+    def stats(self):
+        """Returns hits, misses, number of entries and capacity."""
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses,
+                    'entries': len(self._entries), 'capacity': self.capacity}
+
+
+_cache = None
+_memory_cache = None
+
+
+def get_cache():
+    """Cache used by the ``call_*`` functions, or None if caching is disabled."""
+    return _cache
+
+
+def set_cache(cache):
+    """Enables caching of the responses from BOLD.
+
+    Args:
+        cache: A :class:`DiskCache` instance, or None to disable caching.
+
+    """
+    global _cache
+    _cache = cache
+
+
+def get_memory_cache():
+    """In-memory cache of taxonomy results, or None if it is disabled."""
+    return _memory_cache
+
+
+def set_memory_cache(cache):
+    """Enables memoization of ``call_taxon_search`` and ``call_taxon_data``.
+
+    Args:
+        cache: A :class:`MemoryCache` instance, or None to disable it.
+
+    """
+    global _memory_cache
+    _memory_cache = cache
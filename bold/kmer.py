@@ -0,0 +1,252 @@
+# -*- coding: utf-8 -*-
+import bisect
+import heapq
+import json
+import mmap
+import os
+import re
+import struct
+import sys
+import tempfile
+from array import array
+from collections import Counter
+
+from . import utils
+
+
+_MAGIC = b'BOLDKMER'
+# magic, format version, k, byte order, number of k-mers, of postings and
+# length of the JSON with the records
+_HEADER = struct.Struct('<8sHBcQQQ')
+_VERSION = 2
+
+# Bases as digits of a number in base 4, anything else breaks a run of bases
+_TRANSLATION = str.maketrans('ACGT', '0123')
+_RUNS = re.compile('[0-3]+')
+
+
+class KmerIndex(object):
+    """Local index of DNA barcodes to identify sequences without BOLD.
+
+    Every sequence added is split in overlapping words of `k` bases. A query
+    is answered by counting the words it shares with each indexed sequence,
+    so the top hits are found in milliseconds instead of a round trip to the
+    ID engine. The similarity of a hit is estimated from the fraction ``c``
+    of the query words it contains as ``c ** (1 / k)``, which is close to the
+    identity of an alignment for barcodes of the same region, but is not an
+    alignment.
+
+    An index saved with :meth:`save` is opened memory-mapped, so that opening
+    it is instant and several processes share its pages. Opened indexes are
+    read-only. Needs Python 3.3 or later.
+
+    Args:
+        path: Optional file saved by :meth:`save` to open.
+        k: Length of the words. Ignored if `path` is given.
+
+    Examples:
+
+        >>> import bold
+        >>> from bold.kmer import KmerIndex
+        >>> index = KmerIndex()
+        >>> index.add(bold.call_sequence_data(taxon='Euptychia', stream=True).items)
+        >>> index.save('euptychia.kmer')
+        >>> index = KmerIndex('euptychia.kmer')
+        >>> res = index.call_id(seq, db='COX1', threshold=0.97)
+        >>> res.items[0]['similarity']
+        0.9948
+
+    """
+    def __init__(self, path=None, k=12):
+        if not 4 <= k <= 31:
+            raise ValueError('Invalid value for ``k``.')
+        self.path = path
+        self.k = k
+        self._records = []
+        self._postings = dict()
+        self._file = None
+        self._mmap = None
+        self._kmers = None
+        self._offsets = None
+        self._hits = None
+        if path is not None:
+            self._open(path)
+
+    def add(self, seq_records):
+        """Indexes sequences.
+
+        Args:
+            seq_records: Iterable of Biopython SeqRecord objects, such as the
+                         items of ``call_sequence_data``. The process ID
+                         and taxon are taken from the FASTA headers from
+                         BOLD, ``processid|taxon|marker|accession``.
+
+        Raises:
+            ValueError: If the index was opened from a file.
+
+        """
+        if self._kmers is not None:
+            raise ValueError('Indexes opened from a file are read-only.')
+        for seq_record in seq_records:
+            fields = (getattr(seq_record, 'description', '') or '').split('|')
+            kmers = _kmers(utils._prepare_sequence(seq_record), self.k)
+            record = len(self._records)
+            self._records.append([
+                seq_record.id.split('|')[0],
+                fields[1].strip() if len(fields) > 1 else None,
+                len(kmers),
+            ])
+            postings = self._postings
+            for kmer in kmers:
+                if kmer in postings:
+                    postings[kmer].append(record)
+                else:
+                    postings[kmer] = array('I', [record])
+
+    def __len__(self):
+        return len(self._records)
+
+    def search(self, seq, top=25):
+        """Finds the indexed sequences most similar to `seq`.
+
+        Args:
+            seq: DNA sequence string or seq_record object.
+            top: Maximum number of hits returned.
+
+        Returns:
+            List of dictionaries with the keys ``bold_id``, ``database``,
+            ``taxonomic_identification`` and ``similarity`` of the items of
+            ``call_id``, best hit first.
+
+        """
+        query = _kmers(utils._prepare_sequence(seq), self.k)
+        if not query:
+            return []
+        shared = Counter()
+        for kmer in query:
+            shared.update(self._lookup(kmer))
+
+        hits = heapq.nsmallest(top, shared.items(), key=lambda hit: (-hit[1], hit[0]))
+        items = []
+        exponent = 1.0 / self.k
+        for record, count in hits:
+            bold_id, taxon, size = self._records[record]
+            items.append({
+                'bold_id': bold_id,
+                'database': 'Local',
+                'taxonomic_identification': taxon,
+                'similarity': round((float(count) / len(query)) ** exponent, 4),
+            })
+        return items
+
+    def call_id(self, seq, db=None, threshold=None, top=25):
+        """Identifies `seq` like ``bold.call_id`` does, using the index.
+
+        Args:
+            seq: DNA sequence string or seq_record object.
+            db: The BOLD database to ask if the local hits are not good
+                enough, see ``bold.call_id``.
+            threshold: Optional similarity, e.g. 0.97. If the best local hit
+                       is less similar, `seq` is sent to the ID engine of
+                       BOLD instead.
+            top: Maximum number of local hits returned.
+
+        Returns:
+            A Response object, with ``method`` ``call_id``.
+
+        Raises:
+            ValueError: If `threshold` is given without `db`.
+
+        """
+        from .api import Response, call_id
+
+        if threshold is not None and db is None:
+            raise ValueError('A ``db`` is needed to fall back to BOLD.')
+        items = self.search(seq, top)
+        if threshold is not None and (not items or items[0]['similarity'] < threshold):
+            return call_id(seq, db)
+        response = Response()
+        response.method = 'call_id'
+        response.items = items
+        response.record_count = len(items)
+        return response
+
+    def save(self, path=None):
+        """Writes the index to `path` or to the path it was opened from."""
+        path = path or self.path
+        if path is None:
+            raise ValueError('No path to save the k-mer index to.')
+        if self._kmers is not None:
+            raise ValueError('The index was opened from a file and is already saved.')
+        kmers = array('Q', sorted(self._postings))
+        offsets = array('Q', [0])
+        hits = array('I')
+        for kmer in kmers:
+            hits.extend(self._postings[kmer])
+            offsets.append(len(hits))
+        records = json.dumps(self._records).encode('utf-8')
+
+        directory = os.path.dirname(os.path.abspath(path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory)
+        with os.fdopen(fd, 'wb') as handle:
+            handle.write(_HEADER.pack(_MAGIC, _VERSION, self.k, sys.byteorder[0].encode('ascii'),
+                                      len(kmers), len(hits), len(records)))
+            for values in (kmers, offsets, hits):
+                handle.write(values.tobytes())
+            handle.write(records)
+        # Replace the old file only once the new one is complete
+        os.replace(tmp_path, path)
+
+    def close(self):
+        """Unmaps an index opened from a file."""
+        for name in ('_kmers', '_offsets', '_hits'):
+            values = getattr(self, name)
+            if hasattr(values, 'release'):
+                values.release()
+            setattr(self, name, None)
+        if self._mmap is not None:
+            self._mmap.close()
+            self._file.close()
+            self._mmap = self._file = None
+
+    def _lookup(self, kmer):
+        if self._kmers is None:
+            return self._postings.get(kmer, ())
+        i = bisect.bisect_left(self._kmers, kmer)
+        if i == len(self._kmers) or self._kmers[i] != kmer:
+            return ()
+        return self._hits[self._offsets[i]:self._offsets[i + 1]]
+
+    def _open(self, path):
+        self._file = open(path, 'rb')
+        header = self._file.read(_HEADER.size)
+        if len(header) < _HEADER.size or header[:8] != _MAGIC:
+            self._file.close()
+            raise ValueError('%s is not a k-mer index.' % path)
+        magic, version, k, byteorder, n_kmers, n_hits, records_size = _HEADER.unpack(header)
+        if version != _VERSION or byteorder != sys.byteorder[0].encode('ascii'):
+            self._file.close()
+            raise ValueError('%s was written by another version or platform.' % path)
+        self.k = k
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        start = _HEADER.size
+        sizes = (('_kmers', 'Q', n_kmers), ('_offsets', 'Q', n_kmers + 1), ('_hits', 'I', n_hits))
+        for name, typecode, count in sizes:
+            stop = start + count * array(typecode).itemsize
+            setattr(self, name, memoryview(self._mmap)[start:stop].cast(typecode))
+            start = stop
+        self._records = json.loads(self._mmap[start:start + records_size].decode('utf-8'))
+
+
+def _kmers(seq, k):
+    """Set of the words of `k` bases of `seq` as integers, skipping those
+    with gaps or ambiguous bases.
+
+    """
+    digits = re.sub(r'[\s-]', '', seq.upper()).translate(_TRANSLATION)
+    kmers = set()
+    for run in _RUNS.findall(digits):
+        for i in range(len(run) - k + 1):
+            kmers.add(int(run[i:i + k], 4))
+    return kmers
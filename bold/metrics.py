@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+import threading
+import time
+
+
+# Highest resolution clock available
+timer = getattr(time, 'perf_counter', time.time)
+
+# Upper bounds in seconds of the latency histogram buckets
+LATENCY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, float('inf'))
+
+_hooks = []
+
+
+class ServiceMetrics(object):
+    """Counts and latency histogram of the calls to one BOLD service.
+
+    Attributes:
+        count (int): Number of responses.
+        bytes (int): Bytes received from BOLD or from the disk cache.
+        records (int): Records parsed.
+        seconds (float): Total time of all responses.
+        histogram (list): Number of responses for each of `LATENCY_BUCKETS`.
+
+    """
+    def __init__(self):
+        self.count = 0
+        self.bytes = 0
+        self.records = 0
+        self.seconds = 0.0
+        self.histogram = [0] * len(LATENCY_BUCKETS)
+
+    def add(self, response):
+        total = response.timings.get('total') or 0.0
+        self.count += 1
+        self.bytes += response.bytes_received or 0
+        self.records += response.record_count or 0
+        self.seconds += total
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if total <= bound:
+                self.histogram[i] += 1
+                break
+
+    def to_dict(self):
+        return {
+            'count': self.count,
+            'bytes': self.bytes,
+            'records': self.records,
+            'seconds': self.seconds,
+            'histogram': list(zip(LATENCY_BUCKETS, self.histogram)),
+        }
+
+
+class Metrics(object):
+    """Aggregate of the responses of all calls, per service alias.
+
+    Examples:
+
+        >>> import bold
+        >>> from bold.metrics import get_metrics
+        >>> res = bold.call_taxon_search('Euptychia ordinata')
+        >>> get_metrics().summary()['call_taxon_search']['count']
+        1
+
+    """
+    def __init__(self):
+        self._services = dict()
+        self._lock = threading.Lock()
+
+    def add(self, response):
+        with self._lock:
+            metrics = self._services.get(response.method)
+            if metrics is None:
+                metrics = self._services[response.method] = ServiceMetrics()
+            metrics.add(response)
+
+    def summary(self):
+        """Returns a dictionary of service alias to its counts, total time
+        and latency histogram as a list of (upper bound, count) pairs.
+
+        """
+        with self._lock:
+            return dict((service, metrics.to_dict())
+                        for service, metrics in self._services.items())
+
+    def reset(self):
+        with self._lock:
+            self._services = dict()
+
+
+_metrics = Metrics()
+
+
+def get_metrics():
+    """Aggregate of all the responses received so far."""
+    return _metrics
+
+
+def add_hook(hook):
+    """Calls `hook` with every :class:`bold.api.Response` once it is complete.
+
+    The response has the attributes ``timings``, ``bytes_received`` and
+    ``record_count``, so hooks can forward them to a metrics system.
+    Responses from ``stream=True`` calls are complete once all their items
+    have been read.
+
+    Args:
+        hook: Callable taking a response.
+
+    """
+    _hooks.append(hook)
+
+
+def remove_hook(hook):
+    _hooks.remove(hook)
+
+
+def emit(response):
+    """Adds a complete response to the aggregate and passes it to the hooks."""
+    _metrics.add(response)
+    if _hooks:
+        for hook in list(_hooks):
+            hook(response)
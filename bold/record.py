@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+import sys
+
+
+class Record(object):
+    """Compact, read-only record sharing its field names with all other records.
+
+    Only the fields present in the record are stored, as a tuple of values and
+    a bit mask telling which fields of the schema they belong to, so absent
+    fields take no memory. Values can be read as keys or as attributes and a
+    record can be converted back to a dictionary.
+
+    Use :func:`record_class` to create the class for a list of field names.
+
+    Examples:
+
+        >>> res = bold.call_specimen_data(bin='BOLD:AAE2777', compact=True)
+        >>> record = res.items[0]
+        >>> record['process_id'] == record.process_id
+        True
+        >>> item = record.to_dict()
+
+    """
+    __slots__ = ('_mask', '_values')
+    fields = ()
+    _positions = {}
+
+    def __init__(self, mask, values):
+        self._mask = mask
+        self._values = values
+
+    @classmethod
+    def from_dict(cls, item):
+        """Creates a record from a dictionary using the fields of this class.
+
+        Raises:
+            KeyError: If `item` has a key that is not a field of this class.
+
+        """
+        positions = cls._positions
+        keys = sorted(item, key=positions.__getitem__)
+        mask = 0
+        for key in keys:
+            mask |= 1 << positions[key]
+        return cls(mask, tuple([item[key] for key in keys]))
+
+    def _index(self, key):
+        position = self._positions.get(key)
+        if position is None or not self._mask & (1 << position):
+            return None
+        return bin(self._mask & ((1 << position) - 1)).count('1')
+
+    def __getitem__(self, key):
+        index = self._index(key)
+        if index is None:
+            raise KeyError(key)
+        return self._values[index]
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        index = self._index(name)
+        if index is None:
+            raise AttributeError(name)
+        return self._values[index]
+
+    def get(self, key, default=None):
+        index = self._index(key)
+        if index is None:
+            return default
+        return self._values[index]
+
+    def keys(self):
+        mask = self._mask
+        return [field for i, field in enumerate(self.fields) if mask & (1 << i)]
+
+    def values(self):
+        return list(self._values)
+
+    def items(self):
+        return list(zip(self.keys(), self._values))
+
+    def to_dict(self):
+        """Returns the record as a dictionary, as used without ``compact``."""
+        return dict(zip(self.keys(), self._values))
+
+    def __contains__(self, key):
+        return self._index(key) is not None
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __len__(self):
+        return len(self._values)
+
+    def __eq__(self, other):
+        if isinstance(other, Record):
+            other = other.to_dict()
+        return self.to_dict() == other
+
+    def __ne__(self, other):
+        return not self == other
+
+    __hash__ = None
+
+    def __getstate__(self):
+        return self._mask, self._values
+
+    def __setstate__(self, state):
+        self._mask, self._values = state
+
+    def __repr__(self):
+        return '%s(%r)' % (self.__class__.__name__, self.to_dict())
+
+
+def record_class(name, fields):
+    """Creates a :class:`Record` subclass for the given field names.
+
+    Args:
+        name: Name of the new class.
+        fields: Field names shared by all records of the class.
+
+    """
+    positions = dict((field, i) for i, field in enumerate(fields))
+    cls = type(name, (Record,), {'__slots__': (), 'fields': tuple(fields),
+                                 '_positions': positions})
+    # Like namedtuple, so that records can be pickled
+    cls.__module__ = sys._getframe(1).f_globals.get('__name__', '__main__')
+    return cls
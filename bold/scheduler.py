@@ -0,0 +1,219 @@
+# -*- coding: utf-8 -*-
+import random
+import socket
+import threading
+import time
+
+try:
+    from http.client import HTTPException
+    from urllib.error import HTTPError, URLError
+except ImportError:
+    from httplib import HTTPException
+    from urllib2 import HTTPError, URLError
+
+
+# Each BOLD end-point is throttled separately
+ENDPOINTS = {
+    'call_id': 'id_engine',
+    'call_taxon_search': 'taxonomy',
+    'call_taxon_data': 'taxonomy',
+    'call_specimen_data': 'public',
+    'call_sequence_data': 'public',
+    'call_full_data': 'public',
+    'call_trace_files': 'public',
+}
+
+# Requests per second and burst size for each end-point
+DEFAULT_RATES = {
+    'id_engine': (5.0, 10),
+    'taxonomy': (10.0, 20),
+    'public': (5.0, 10),
+}
+
+# HTTP status codes meaning that BOLD is overloaded or failed temporarily
+RETRY_STATUS_CODES = (408, 429, 500, 502, 503, 504)
+
+
+class TokenBucket(object):
+    """Allows on average `rate` calls per second, with bursts of `burst` calls.
+
+    """
+    def __init__(self, rate, burst):
+        self.rate = float(rate)
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.time()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Blocks until a call is allowed."""
+        while True:
+            with self._lock:
+                now = time.time()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class AdaptiveLimiter(object):
+    """Limits concurrent calls, adapting the limit with AIMD.
+
+    The limit grows by one after a full window of successful calls (additive
+    increase) and is halved after an error or when a call takes much longer
+    than usual (multiplicative decrease).
+
+    Args:
+        initial: Concurrency limit to start with.
+        minimum: Lowest concurrency limit.
+        maximum: Highest concurrency limit.
+        slow_factor: A call slower than this many times the average latency
+                     counts as a sign of congestion.
+
+    """
+    def __init__(self, initial=4, minimum=1, maximum=32, slow_factor=3.0):
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.slow_factor = slow_factor
+        self.in_flight = 0
+        self.average_latency = None
+        self._condition = threading.Condition()
+
+    def acquire(self):
+        """Blocks until there is room for one more concurrent call."""
+        with self._condition:
+            while self.in_flight >= int(self.limit):
+                self._condition.wait()
+            self.in_flight += 1
+
+    def release(self, latency, error=False):
+        """Records the outcome of a call and frees its place.
+
+        Args:
+            latency: Duration of the call in seconds.
+            error: True if the call failed because BOLD was overloaded.
+
+        """
+        with self._condition:
+            self.in_flight -= 1
+            slow = (self.average_latency is not None and
+                    latency > self.slow_factor * self.average_latency)
+            if error or slow:
+                self.limit = max(self.minimum, self.limit / 2)
+            else:
+                self.limit = min(self.maximum, self.limit + 1 / self.limit)
+            if not error:
+                if self.average_latency is None:
+                    self.average_latency = latency
+                else:
+                    self.average_latency = 0.8 * self.average_latency + 0.2 * latency
+            self._condition.notify_all()
+
+
+class Scheduler(object):
+    """Paces, limits and retries the requests sent to BOLD.
+
+    Every end-point (ID engine, taxonomy and public data) has its own token
+    bucket and its own adaptive concurrency limit. Requests that fail because
+    of timeouts, dropped connections or status codes such as 503 are retried
+    after an exponential backoff with random jitter.
+
+    Args:
+        rates: Optional dictionary of end-point to (requests per second,
+               burst size), see `DEFAULT_RATES`.
+        concurrency: Initial concurrency limit of each end-point.
+        max_concurrency: Highest concurrency limit of each end-point.
+        retries: Number of times a failed request is retried.
+        backoff: Base delay in seconds before the first retry.
+        max_backoff: Longest delay in seconds between retries.
+
+    Examples:
+
+        >>> from bold.scheduler import Scheduler, set_default_scheduler
+        >>> set_default_scheduler(Scheduler(rates={'id_engine': (20, 40)}, retries=5))
+
+    """
+    def __init__(self, rates=None, concurrency=4, max_concurrency=32, retries=3,
+                 backoff=0.5, max_backoff=30):
+        all_rates = dict(DEFAULT_RATES)
+        all_rates.update(rates or dict())
+        self.buckets = dict()
+        self.limiters = dict()
+        for endpoint, (rate, burst) in all_rates.items():
+            self.buckets[endpoint] = TokenBucket(rate, burst)
+            self.limiters[endpoint] = AdaptiveLimiter(concurrency, maximum=max_concurrency)
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+
+    def run(self, service, function):
+        """Calls `function` for `service` once the rate and concurrency allow.
+
+        Args:
+            service: The BOLD API alias, e.g. ``call_id``.
+            function: Callable doing the request.
+
+        Returns:
+            The result of `function`.
+
+        Raises:
+            The last error if all retries failed, or any error that is not
+            worth retrying at once.
+
+        """
+        endpoint = ENDPOINTS[service]
+        bucket = self.buckets[endpoint]
+        limiter = self.limiters[endpoint]
+        attempt = 0
+        while True:
+            bucket.acquire()
+            limiter.acquire()
+            start = time.time()
+            try:
+                result = function()
+            except Exception as e:
+                retry = _is_retryable(e)
+                limiter.release(time.time() - start, error=retry)
+                if not retry or attempt >= self.retries:
+                    raise
+            else:
+                limiter.release(time.time() - start)
+                return result
+            delay = min(self.max_backoff, self.backoff * 2 ** attempt)
+            time.sleep(random.uniform(0, delay))
+            attempt += 1
+
+
+def _is_retryable(error):
+    if isinstance(error, HTTPError):
+        return error.code in RETRY_STATUS_CODES
+    return isinstance(error, (URLError, socket.error, socket.timeout, HTTPException))
+
+
+_default_scheduler = None
+_default_scheduler_lock = threading.Lock()
+
+
+def get_default_scheduler():
+    """Scheduler used by the ``call_*`` functions. Created on first use."""
+    global _default_scheduler
+    with _default_scheduler_lock:
+        if _default_scheduler is None:
+            _default_scheduler = Scheduler()
+        return _default_scheduler
+
+
+def set_default_scheduler(scheduler):
+    """Replaces the scheduler used by the ``call_*`` functions.
+
+    Args:
+        scheduler: A :class:`Scheduler` instance.
+
+    """
+    global _default_scheduler
+    with _default_scheduler_lock:
+        _default_scheduler = scheduler
@@ -0,0 +1,209 @@
+# -*- coding: utf-8 -*-
+import itertools
+import json
+import mmap
+import os
+import re
+import sqlite3
+import threading
+
+from . import utils
+
+
+# Every byte holds 4 bases, the first one in the highest bits
+_UNPACK = [''.join(bases) for bases in itertools.product('ACGT', repeat=4)]
+_PACK = dict((bases, i) for i, bases in enumerate(_UNPACK))
+
+# Runs of the same character that is not one of the 4 bases, e.g. NNNN
+_EXCEPTIONS = re.compile(r'([^ACGT])\1*')
+
+
+class SequenceStore(object):
+    """Compact file of DNA sequences, packed at 2 bits per base.
+
+    Bases other than A, C, G and T, like the ambiguity code N, are kept in a
+    short list of exceptions for each sequence, so sequences are read back
+    exactly as they were added (uppercase and without gaps). The packed
+    sequences are appended to ``sequences.2bit`` in `directory`, which is
+    memory-mapped for reading, and an SQLite index maps each ID to its
+    offset. Opening a store does not read the sequences, and several
+    processes can open the same store to read it.
+
+    Args:
+        directory: Folder where the sequences and their index are stored.
+        readonly: Open an existing store for reading only, e.g. on a
+                  read-only mount or one owned by another user. Nothing is
+                  created and :meth:`add` raises ValueError.
+
+    Examples:
+
+        >>> import bold
+        >>> from bold.seqstore import SequenceStore
+        >>> store = SequenceStore('barcodes')
+        >>> store.add(bold.call_sequence_data(taxon='Euptychia', stream=True).items)
+        1203
+        >>> store.sequence('GBLN3590-14')[:20]
+        'TTTTTGGTATTTGAGCAGGA'
+
+    """
+    def __init__(self, directory, readonly=False):
+        if not readonly and not os.path.isdir(directory):
+            os.makedirs(directory)
+        self.directory = directory
+        self.readonly = readonly
+        self._path = os.path.join(directory, 'sequences.2bit')
+        self._lock = threading.Lock()
+        self._mmap = None
+        self._mapped_size = 0
+        index_path = os.path.join(directory, 'index.sqlite')
+        if readonly:
+            self._file = open(self._path, 'rb')
+            self._db = _connect_readonly(index_path)
+            return
+        self._file = open(self._path, 'ab+')
+        self._db = sqlite3.connect(index_path, check_same_thread=False)
+        self._db.execute('CREATE TABLE IF NOT EXISTS sequences ('
+                         'id TEXT PRIMARY KEY, offset INTEGER, length INTEGER, '
+                         'exceptions TEXT, description TEXT)')
+        self._db.commit()
+
+    def add(self, seq_records):
+        """Packs and appends sequences, replacing those with the same ID.
+
+        Args:
+            seq_records: Iterable of Biopython SeqRecord objects, such as the
+                         items of ``call_sequence_data``. They are stored
+                         under the part of their ``id`` before the first
+                         ``|``, the process ID for FASTA files from BOLD.
+
+        Returns:
+            Number of sequences added.
+
+        Raises:
+            ValueError: If the store was opened read-only.
+
+        """
+        if self.readonly:
+            raise ValueError('The sequence store was opened read-only.')
+        rows = []
+        with self._lock:
+            self._file.seek(0, os.SEEK_END)
+            offset = self._file.tell()
+            for seq_record in seq_records:
+                packed, length, exceptions = _pack(utils._prepare_sequence(seq_record))
+                self._file.write(packed)
+                rows.append((seq_record.id.split('|')[0], offset, length,
+                             json.dumps(exceptions) if exceptions else None,
+                             getattr(seq_record, 'description', None)))
+                offset += len(packed)
+            # The index only points to sequences once they are on disk
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._db.executemany('INSERT OR REPLACE INTO sequences VALUES (?, ?, ?, ?, ?)', rows)
+            self._db.commit()
+        return len(rows)
+
+    def sequence(self, seq_id):
+        """Returns the sequence with the given ID as a string.
+
+        Raises:
+            KeyError: If there is no sequence with that ID.
+
+        """
+        return self._read(seq_id)[0]
+
+    def get(self, seq_id):
+        """Returns the sequence with the given ID as a SeqRecord object."""
+        from Bio.Seq import Seq
+        from Bio.SeqRecord import SeqRecord
+
+        seq, description = self._read(seq_id)
+        return SeqRecord(Seq(seq), id=seq_id, description=description or '')
+
+    def ids(self):
+        """IDs of the stored sequences, sorted."""
+        with self._lock:
+            return [row[0] for row in self._db.execute('SELECT id FROM sequences ORDER BY id')]
+
+    def __len__(self):
+        with self._lock:
+            return self._db.execute('SELECT COUNT(*) FROM sequences').fetchone()[0]
+
+    def __contains__(self, seq_id):
+        with self._lock:
+            return self._db.execute('SELECT 1 FROM sequences WHERE id = ?',
+                                    (seq_id,)).fetchone() is not None
+
+    def close(self):
+        with self._lock:
+            if self._mmap is not None:
+                self._mmap.close()
+                self._mmap = None
+            self._file.close()
+            self._db.close()
+
+    def _read(self, seq_id):
+        with self._lock:
+            row = self._db.execute('SELECT offset, length, exceptions, description '
+                                   'FROM sequences WHERE id = ?', (seq_id,)).fetchone()
+            if row is None:
+                raise KeyError(seq_id)
+            offset, length, exceptions, description = row
+            end = offset + (length + 3) // 4
+            if end > self._mapped_size:
+                self._remap()
+            data = self._mmap[offset:end] if end > offset else b''
+        return _unpack(data, length, json.loads(exceptions) if exceptions else ()), description
+
+    def _remap(self):
+        # Map again to see what was appended since, by this or another process
+        if self._mmap is not None:
+            self._mmap.close()
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._mapped_size = len(self._mmap)
+
+
+def _connect_readonly(path):
+    try:
+        from urllib.request import pathname2url
+    except ImportError:
+        from urllib import pathname2url
+    try:
+        return sqlite3.connect('file:%s?mode=ro' % pathname2url(os.path.abspath(path)),
+                               uri=True, check_same_thread=False)
+    except TypeError:
+        # No URI file names before Python 3.4, the index is only read anyway
+        return sqlite3.connect(path, check_same_thread=False)
+
+
+def _pack(seq):
+    """Packs `seq` at 2 bits per base.
+
+    Returns:
+        The packed bytes, the length of `seq` and the list of exceptions as
+        ``[position, length, character]`` runs.
+
+    """
+    exceptions = [[match.start(), len(match.group()), match.group(1)]
+                  for match in _EXCEPTIONS.finditer(seq)]
+    if exceptions:
+        seq = _EXCEPTIONS.sub(lambda match: 'A' * len(match.group()), seq)
+    padded = seq + 'A' * (-len(seq) % 4)
+    pack = _PACK
+    packed = bytearray([pack[padded[i:i + 4]] for i in range(0, len(padded), 4)])
+    return bytes(packed), len(seq), exceptions
+
+
+def _unpack(data, length, exceptions=()):
+    unpack = _UNPACK
+    seq = ''.join([unpack[byte] for byte in bytearray(data)])[:length]
+    if not exceptions:
+        return seq
+    pieces = []
+    position = 0
+    for start, run, character in exceptions:
+        pieces.append(seq[position:start])
+        pieces.append(character * run)
+        position = start + run
+    pieces.append(seq[position:])
+    return ''.join(pieces)
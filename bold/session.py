@@ -0,0 +1,415 @@
+# -*- coding: utf-8 -*-
+import base64
+import io
+import socket
+import threading
+import time
+import zlib
+
+try:
+    from http.client import HTTPConnection, HTTPSConnection, HTTPException
+except ImportError:
+    from httplib import HTTPConnection, HTTPSConnection, HTTPException
+try:
+    from urllib.error import URLError
+    from urllib.parse import unquote, urljoin, urlsplit
+    from urllib.request import getproxies, proxy_bypass
+except ImportError:
+    from urllib import getproxies, proxy_bypass, unquote
+    from urllib2 import URLError
+    from urlparse import urljoin, urlsplit
+
+from Bio._py3k import HTTPError
+
+from .metrics import timer
+
+
+REDIRECT_CODES = (301, 302, 303, 307, 308)
+MAX_REDIRECTS = 5
+
+
+class Session(object):
+    """Keeps persistent HTTP connections to BOLD and reuses them between calls.
+
+    Connections are kept alive after a response has been completely read and
+    are handed to the next request for the same host, which saves a TCP
+    handshake per call. Idle connections are kept in one pool per host.
+
+    Proxies are taken from the environment like ``urlopen`` does, from
+    ``http_proxy``, ``https_proxy`` and ``no_proxy``. HTTPS requests go
+    through the proxy in a tunnel.
+
+    Args:
+        pool_size: Maximum number of idle connections kept per host.
+        host_pool_sizes: Optional dictionary of host name to the maximum
+                         number of idle connections kept for that host,
+                         overriding `pool_size`, e.g.
+                         ``{'v4.boldsystems.org': 16}``.
+        idle_timeout: Seconds an idle connection is kept before it is
+                      discarded. Use None to keep them forever.
+        timeout: Socket timeout in seconds for every connection, so that a
+                 stalled request fails and can be retried. Use None to wait
+                 forever.
+        compress: Whether to ask for gzip or deflate compressed responses.
+                  They are decompressed while they are being read.
+
+    Attributes:
+        connections_opened (int): Number of TCP connections opened so far.
+
+    Examples:
+
+        >>> import bold
+        >>> from bold.session import Session, set_default_session
+        >>> set_default_session(Session(pool_size=8, idle_timeout=60))
+
+    """
+    def __init__(self, pool_size=4, idle_timeout=30, timeout=300, compress=True,
+                 host_pool_sizes=None):
+        if pool_size < 1:
+            raise ValueError('Invalid value for ``pool_size``.')
+        host_pool_sizes = dict(host_pool_sizes or ())
+        if any(size < 1 for size in host_pool_sizes.values()):
+            raise ValueError('Invalid value for ``host_pool_sizes``.')
+        self.pool_size = pool_size
+        self.host_pool_sizes = host_pool_sizes
+        self.idle_timeout = idle_timeout
+        self.timeout = timeout
+        self.compress = compress
+        self.connections_opened = 0
+        self._pools = dict()
+        self._lock = threading.Lock()
+
+    def open(self, url, headers=None):
+        """Does a GET request and returns the response as a file-like object.
+
+        Redirects are followed. The connection goes back to the pool once the
+        response body has been completely read or the response is closed.
+
+        Args:
+            url: Full URL including the query string.
+            headers: Optional dictionary of HTTP headers.
+
+        Returns:
+            A file-like object with the body of the response.
+
+        Raises:
+            HTTPError: If BOLD replies with an error status code, or with
+                       too many redirects.
+            URLError: If the connection to BOLD failed.
+
+        """
+        headers = dict(headers or ())
+        if self.compress and 'Accept-Encoding' not in headers:
+            headers['Accept-Encoding'] = 'gzip, deflate'
+
+        connect_time = first_byte_time = 0.0
+        for i in range(MAX_REDIRECTS + 1):
+            handle = self._get(url, headers)
+            handle.connect_time += connect_time
+            handle.first_byte_time += first_byte_time
+            if handle.status not in REDIRECT_CODES:
+                break
+            location = handle.getheader('Location')
+            handle.read()
+            handle.close()
+            if location is None:
+                raise HTTPError(url, handle.status, 'Redirect without a location',
+                                handle.info(), io.BytesIO())
+            connect_time, first_byte_time = handle.connect_time, handle.first_byte_time
+            url = urljoin(url, location)
+        else:
+            raise HTTPError(url, handle.status, 'Too many redirects', handle.info(), io.BytesIO())
+
+        if handle.status >= 400:
+            # Read the error page so that the connection goes back to the pool
+            body = io.BytesIO(handle.read())
+            handle.close()
+            raise HTTPError(url, handle.status, handle.reason, handle.info(), body)
+        return handle
+
+    def close(self):
+        """Closes all idle connections."""
+        with self._lock:
+            pools = self._pools
+            self._pools = dict()
+        for pool in pools.values():
+            for connection, last_used in pool:
+                connection.close()
+
+    def _get(self, url, headers):
+        parts = urlsplit(url)
+        proxy = _get_proxy(parts)
+        key = (parts.scheme, parts.hostname, parts.port, proxy)
+        path = parts.path or '/'
+        if parts.query:
+            path += '?' + parts.query
+        if proxy is not None and parts.scheme != 'https':
+            # Plain HTTP proxies expect the absolute URL in the request line
+            path = '%s://%s%s' % (parts.scheme, parts.netloc, path)
+            headers = dict(headers, **_proxy_headers(proxy))
+
+        connection = self._acquire(key)
+        if connection is not None:
+            try:
+                start = timer()
+                connection.request('GET', path, headers=headers)
+                response = connection.getresponse()
+                handle = _PooledResponse(self, key, connection, response, url)
+                handle.first_byte_time = timer() - start
+                return handle
+            except (socket.error, HTTPException):
+                # The server dropped this idle connection, retry on a new one
+                connection.close()
+
+        connection = self._connect(key)
+        try:
+            start = timer()
+            connection.connect()
+            connected = timer()
+            connection.request('GET', path, headers=headers)
+            response = connection.getresponse()
+        except socket.error as e:
+            connection.close()
+            # Same error as raised by urlopen
+            raise URLError(e)
+        handle = _PooledResponse(self, key, connection, response, url)
+        handle.connect_time = connected - start
+        handle.first_byte_time = timer() - connected
+        return handle
+
+    def _connect(self, key):
+        scheme, host, port, proxy = key
+        if scheme == 'https':
+            connection_class = HTTPSConnection
+        else:
+            connection_class = HTTPConnection
+        address = (host, port)
+        if proxy is not None:
+            proxy_parts = urlsplit(proxy)
+            address = (proxy_parts.hostname, proxy_parts.port)
+        if self.timeout is None:
+            connection = connection_class(*address)
+        else:
+            connection = connection_class(*address, timeout=self.timeout)
+        if proxy is not None and scheme == 'https':
+            connection.set_tunnel(host, port, headers=_proxy_headers(proxy))
+        with self._lock:
+            self.connections_opened += 1
+        return connection
+
+    def _acquire(self, key):
+        now = time.time()
+        stale = []
+        connection = None
+        with self._lock:
+            pool = self._pools.get(key, [])
+            while pool:
+                candidate, last_used = pool.pop()
+                if self.idle_timeout is not None and now - last_used > self.idle_timeout:
+                    stale.append(candidate)
+                else:
+                    connection = candidate
+                    break
+        for candidate in stale:
+            candidate.close()
+        return connection
+
+    def _release(self, key, connection):
+        with self._lock:
+            pool = self._pools.setdefault(key, [])
+            if len(pool) < self.host_pool_sizes.get(key[1], self.pool_size):
+                pool.append((connection, time.time()))
+                return
+        connection.close()
+
+
+def _get_proxy(parts):
+    """URL of the proxy to use for a URL split by ``urlsplit``, or None."""
+    proxy = getproxies().get(parts.scheme)
+    if not proxy or proxy_bypass(parts.hostname or ''):
+        return None
+    if '://' not in proxy:
+        proxy = 'http://' + proxy
+    return proxy
+
+
+def _proxy_headers(proxy):
+    parts = urlsplit(proxy)
+    if parts.username is None:
+        return {}
+    credentials = '%s:%s' % (unquote(parts.username), unquote(parts.password or ''))
+    token = base64.b64encode(credentials.encode('utf-8')).decode('ascii')
+    return {'Proxy-Authorization': 'Basic ' + token}
+
+
+class _PooledResponse(object):
+    """File-like body of a response that gives its connection back to the pool.
+
+    Attributes:
+        connect_time (float): Seconds spent resolving the host name and
+                              connecting, 0 for a reused connection.
+        first_byte_time (float): Seconds between sending the request and
+                                 receiving the status line and headers.
+        bytes_read (int): Bytes of the body read so far, after
+                          decompression.
+        content_encoding (str): ``gzip`` or ``deflate`` if the body is
+                                compressed, None otherwise.
+
+    """
+    connect_time = 0.0
+    first_byte_time = 0.0
+
+    def __init__(self, session, key, connection, response, url):
+        self._session = session
+        self._key = key
+        self._connection = connection
+        self._response = response
+        self._buffer = b''
+        self._position = 0
+        self.bytes_read = 0
+        self.url = url
+        self.status = response.status
+        self.reason = response.reason
+        self.headers = response.msg
+        self.content_encoding = None
+        self._decompressor = None
+        encoding = (response.getheader('Content-Encoding') or '').strip().lower()
+        if encoding in ('gzip', 'x-gzip'):
+            self.content_encoding = 'gzip'
+            self._decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        elif encoding == 'deflate':
+            self.content_encoding = 'deflate'
+            self._decompressor = zlib.decompressobj()
+        self._decompressed_any = False
+
+    def read(self, amt=None):
+        buffered = self._buffer[self._position:]
+        self._buffer = b''
+        self._position = 0
+        if amt is None or amt < 0:
+            return buffered + self._read(None)
+        if len(buffered) >= amt:
+            self._buffer = buffered
+            self._position = amt
+            return buffered[:amt]
+        return buffered + self._read(amt - len(buffered))
+
+    def readline(self):
+        while True:
+            end = self._buffer.find(b'\n', self._position)
+            if end >= 0:
+                line = self._buffer[self._position:end + 1]
+                self._position = end + 1
+                return line
+            chunk = self._read(8192)
+            if not chunk:
+                line = self._buffer[self._position:]
+                self._buffer = b''
+                self._position = 0
+                return line
+            self._buffer = self._buffer[self._position:] + chunk
+            self._position = 0
+
+    def __iter__(self):
+        while True:
+            line = self.readline()
+            if not line:
+                break
+            yield line
+
+    def _read(self, amt):
+        if self._decompressor is None:
+            data = self._read_raw(amt)
+        else:
+            data = self._read_decompressed(amt)
+        self.bytes_read += len(data)
+        return data
+
+    def _read_raw(self, amt):
+        if self._response is None:
+            return b''
+        if amt is None:
+            data = self._response.read()
+        else:
+            data = self._response.read(amt)
+        if not data or self._response.isclosed():
+            self.close()
+        return data
+
+    def _read_decompressed(self, amt):
+        # Only one compressed chunk is held at a time, and at most `amt`
+        # bytes are decompressed from it, the rest waits in unconsumed_tail
+        chunks = []
+        size = 0
+        while amt is None or size < amt:
+            compressed = self._decompressor.unconsumed_tail
+            if not compressed:
+                compressed = self._read_raw(65536)
+            if not compressed:
+                chunks.append(self._decompressor.flush())
+                break
+            data = self._decompress(compressed, 0 if amt is None else amt - size)
+            chunks.append(data)
+            size += len(data)
+        return b''.join(chunks)
+
+    def _decompress(self, data, max_length):
+        try:
+            data = self._decompressor.decompress(data, max_length)
+        except zlib.error:
+            if self.content_encoding != 'deflate' or self._decompressed_any:
+                raise
+            # Some servers send deflate without the zlib header
+            self._decompressor = zlib.decompressobj(-zlib.MAX_WBITS)
+            data = self._decompressor.decompress(data, max_length)
+        self._decompressed_any = True
+        return data
+
+    def getheader(self, name, default=None):
+        return self.headers.get(name, default)
+
+    def info(self):
+        return self.headers
+
+    def getcode(self):
+        return self.status
+
+    def geturl(self):
+        return self.url
+
+    def close(self):
+        response = self._response
+        if response is None:
+            return
+        self._response = None
+        if response.isclosed() and not response.will_close:
+            self._session._release(self._key, self._connection)
+        else:
+            response.close()
+            self._connection.close()
+
+
+_default_session = None
+_default_session_lock = threading.Lock()
+
+
+def get_default_session():
+    """Session used by the ``call_*`` functions. Created on first use."""
+    global _default_session
+    with _default_session_lock:
+        if _default_session is None:
+            _default_session = Session()
+        return _default_session
+
+
+def set_default_session(session):
+    """Replaces the session used by the ``call_*`` functions.
+
+    Args:
+        session: A :class:`Session` instance, for example with a bigger
+                 ``pool_size`` for bulk jobs.
+
+    """
+    global _default_session
+    with _default_session_lock:
+        _default_session = session
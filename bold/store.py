@@ -0,0 +1,306 @@
+# -*- coding: utf-8 -*-
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+
+
+# Indexed columns of the store and the keys of the parsed records they
+# are taken from
+_COLUMNS = (
+    ('process_id', 'process_id'),
+    ('record_id', 'record_id'),
+    ('bin_uri', 'bin_uri'),
+    ('sample_id', 'specimen_identifiers_sample_id'),
+    ('catalog_num', 'specimen_identifiers_catalog_num'),
+    ('field_num', 'specimen_identifiers_field_num'),
+    ('institution', 'specimen_identifiers_institution_storing'),
+    ('identified_by', 'taxonomy_identification_provided_by'),
+    ('phylum', 'taxonomy_phylum_taxon_name'),
+    ('class_name', 'taxonomy_class_taxon_name'),
+    ('order_name', 'taxonomy_order_taxon_name'),
+    ('family', 'taxonomy_family_taxon_name'),
+    ('genus', 'taxonomy_genus_taxon_name'),
+    ('species', 'taxonomy_species_taxon_name'),
+    ('collectors', 'collection_event_collectors'),
+    ('country', 'collection_event_country'),
+    ('province', 'collection_event_province'),
+)
+
+_INDEXED = ('bin_uri', 'sample_id', 'institution', 'phylum', 'class_name', 'order_name',
+            'family', 'genus', 'species', 'country', 'province')
+
+# Columns matched by each filter of ``call_specimen_data``
+_FILTERS = {
+    'taxon': ('phylum', 'class_name', 'order_name', 'family', 'genus', 'species'),
+    'ids': ('process_id', 'sample_id', 'catalog_num', 'field_num'),
+    'bin': ('bin_uri',),
+    'institutions': ('institution',),
+    'geo': ('country', 'province'),
+}
+
+# Matched as substrings, as names are lists such as "Carlos Pena, Jane Doe"
+_SUBSTRING_FILTERS = {
+    'researchers': ('collectors', 'identified_by'),
+}
+
+
+class SpecimenStore(object):
+    """Local SQLite database of specimen records from BOLD.
+
+    Records parsed from ``call_full_data`` or ``call_specimen_data`` are
+    stored whole, with indexes on process ID, BIN, taxon names, country and
+    the other fields the ``call_specimen_data`` filters use, so they can be
+    queried with the same filters without going to BOLD.
+
+    :meth:`sync` refreshes the store for a container, BIN, etc.: it gets the
+    light-weight TSV listing of the specimens and then downloads the full
+    records, with sequences, only for those that are new or changed. Listed
+    specimens that ``call_full_data`` does not return are remembered as
+    missing and only requested again when their listing changes.
+
+    Args:
+        path: SQLite database file. Use ``':memory:'`` for a temporary store.
+
+    Examples:
+
+        >>> from bold.store import SpecimenStore
+        >>> store = SpecimenStore('specimens.sqlite')
+        >>> store.sync(container='ACRJP')
+        {'listed': 312, 'new': 310, 'changed': 0, 'unchanged': 0, 'missing': 2}
+        >>> store.sync(container='ACRJP')  # later
+        {'listed': 315, 'new': 3, 'changed': 1, 'unchanged': 309, 'missing': 2}
+        >>> records = store.query(taxon='Euptychia', geo='Peru|Bolivia')
+
+    """
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        columns = ', '.join(['%s TEXT' % column for column, key in _COLUMNS[1:]])
+        self._db.execute('CREATE TABLE IF NOT EXISTS specimens ('
+                         'process_id TEXT PRIMARY KEY, %s, listing_checksum TEXT, '
+                         'checksum TEXT, data TEXT, updated REAL)' % columns)
+        for column in _INDEXED:
+            self._db.execute('CREATE INDEX IF NOT EXISTS specimens_%s ON specimens (%s)' %
+                             (column, column))
+        self._db.execute('CREATE TABLE IF NOT EXISTS containers ('
+                         'container TEXT, process_id TEXT, PRIMARY KEY (container, process_id))')
+        self._db.execute('CREATE INDEX IF NOT EXISTS containers_process_id '
+                         'ON containers (process_id)')
+        self._db.execute('CREATE TABLE IF NOT EXISTS missing ('
+                         'process_id TEXT PRIMARY KEY, listing_checksum TEXT, checked REAL)')
+        self._db.commit()
+
+    def add_items(self, items, container=None, listing_checksums=None):
+        """Inserts new records and updates the changed ones.
+
+        Args:
+            items: Parsed records as dictionaries or ``SpecimenRecord``
+                   objects, e.g. ``Response.items``. Records without
+                   ``process_id`` are ignored.
+            container: Optional project or dataset code the records belong to.
+            listing_checksums: Used by :meth:`sync`.
+
+        Returns:
+            Dictionary with the number of records ``new``, ``changed`` and
+            ``unchanged``.
+
+        """
+        counts = {'new': 0, 'changed': 0, 'unchanged': 0}
+        listing_checksums = listing_checksums or dict()
+        now = time.time()
+        with self._lock:
+            for item in items:
+                if hasattr(item, 'to_dict'):
+                    item = item.to_dict()
+                process_id = item.get('process_id')
+                if process_id is None:
+                    continue
+                data = json.dumps(item, sort_keys=True)
+                checksum = hashlib.sha1(data.encode('utf-8')).hexdigest()
+                row = self._db.execute('SELECT checksum FROM specimens WHERE process_id = ?',
+                                       (process_id,)).fetchone()
+                listing_checksum = listing_checksums.get(process_id)
+                if row is None:
+                    counts['new'] += 1
+                elif row[0] != checksum:
+                    counts['changed'] += 1
+                else:
+                    counts['unchanged'] += 1
+                    if listing_checksum is not None:
+                        self._db.execute('UPDATE specimens SET listing_checksum = ? '
+                                         'WHERE process_id = ?', (listing_checksum, process_id))
+                if row is None or row[0] != checksum:
+                    values = [_column_value(item.get(key)) for column, key in _COLUMNS]
+                    self._db.execute(
+                        'INSERT OR REPLACE INTO specimens VALUES (%s)' %
+                        ', '.join(['?'] * (len(_COLUMNS) + 4)),
+                        values + [listing_checksum, checksum, data, now])
+                if container is not None:
+                    self._db.execute('INSERT OR IGNORE INTO containers VALUES (?, ?)',
+                                     (container, process_id))
+            self._db.commit()
+        return counts
+
+    def get(self, process_id):
+        """Returns the record with the given process ID, or None."""
+        with self._lock:
+            row = self._db.execute('SELECT data FROM specimens WHERE process_id = ?',
+                                   (process_id,)).fetchone()
+        if row is None:
+            return None
+        return json.loads(row[0])
+
+    def query(self, taxon=None, ids=None, bin=None, container=None,
+              institutions=None, researchers=None, geo=None):
+        """Finds stored records with the filters of ``call_specimen_data``.
+
+        Several values of a filter are separated by ``|``, e.g.
+        ``geo='Peru|Bolivia'``, and all given filters must match.
+
+        Returns:
+            List of records as dictionaries.
+
+        """
+        filters = {'taxon': taxon, 'ids': ids, 'bin': bin, 'institutions': institutions,
+                   'researchers': researchers, 'geo': geo}
+        conditions = []
+        params = []
+        for name, value in filters.items():
+            if value is None:
+                continue
+            values = value.split('|')
+            alternatives = []
+            if name in _SUBSTRING_FILTERS:
+                for column in _SUBSTRING_FILTERS[name]:
+                    for v in values:
+                        alternatives.append('%s LIKE ?' % column)
+                        params.append('%' + v + '%')
+            else:
+                for column in _FILTERS[name]:
+                    alternatives.append('%s IN (%s)' % (column, ', '.join(['?'] * len(values))))
+                    params.extend(values)
+            conditions.append('(' + ' OR '.join(alternatives) + ')')
+        if container is not None:
+            values = container.split('|')
+            conditions.append('process_id IN (SELECT process_id FROM containers '
+                              'WHERE container IN (%s))' % ', '.join(['?'] * len(values)))
+            params.extend(values)
+
+        sql = 'SELECT data FROM specimens'
+        if conditions:
+            sql += ' WHERE ' + ' AND '.join(conditions)
+        sql += ' ORDER BY process_id'
+        with self._lock:
+            rows = self._db.execute(sql, params).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def sync(self, taxon=None, ids=None, bin=None, container=None,
+             institutions=None, researchers=None, geo=None, batch_size=100):
+        """Downloads the records that are new or changed since the last sync.
+
+        The TSV listing of the specimens matching the filters is downloaded
+        and compared with what was stored. Only the process IDs whose
+        specimen data changed are fetched again with ``call_full_data``, in
+        batches of `batch_size` IDs. The IDs that BOLD lists but does not
+        return full data for are recorded as missing, and are not requested
+        again until their listing changes.
+
+        Returns:
+            Dictionary with the number of records ``listed`` by BOLD, the
+            number of ``new``, ``changed`` and ``unchanged`` records and the
+            number of listed records ``missing`` from ``call_full_data``.
+
+        """
+        from . import api
+
+        filters = {'taxon': taxon, 'ids': ids, 'bin': bin, 'container': container,
+                   'institutions': institutions, 'researchers': researchers, 'geo': geo}
+        try:
+            listing = api.call_specimen_data(columnar=True, **filters).items
+        except ValueError:
+            # BOLD did not return any result
+            return {'listed': 0, 'new': 0, 'changed': 0, 'unchanged': 0, 'missing': 0}
+        if 'processid' not in listing:
+            raise ValueError('The listing from BOLD has no processid column.')
+
+        listing_checksums = dict()
+        for row in listing.rows():
+            text = repr(sorted(row.items()))
+            listing_checksums[row['processid']] = hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+        with self._lock:
+            stored = dict()
+            missing = dict()
+            process_ids = list(listing_checksums)
+            for start in range(0, len(process_ids), 500):
+                batch = process_ids[start:start + 500]
+                placeholders = ', '.join(['?'] * len(batch))
+                stored.update(self._db.execute(
+                    'SELECT process_id, listing_checksum FROM specimens WHERE process_id IN (%s)' %
+                    placeholders, batch).fetchall())
+                missing.update(self._db.execute(
+                    'SELECT process_id, listing_checksum FROM missing WHERE process_id IN (%s)' %
+                    placeholders, batch).fetchall())
+            if container is not None:
+                self._db.executemany('INSERT OR IGNORE INTO containers VALUES (?, ?)',
+                                     [(container, process_id) for process_id in process_ids])
+                self._db.commit()
+
+        outdated = []
+        still_missing = 0
+        for process_id, checksum in listing_checksums.items():
+            if missing.get(process_id) == checksum:
+                still_missing += 1
+            elif stored.get(process_id) != checksum:
+                outdated.append(process_id)
+        counts = {'listed': len(listing_checksums), 'new': 0, 'changed': 0,
+                  'unchanged': len(listing_checksums) - len(outdated) - still_missing,
+                  'missing': still_missing}
+        for start in range(0, len(outdated), batch_size):
+            batch = sorted(outdated[start:start + batch_size])
+            try:
+                items = api.call_full_data(ids='|'.join(batch)).items
+            except ValueError:
+                # BOLD did not return any result for this batch
+                items = []
+            if not isinstance(items, list):
+                raise ValueError('Unexpected response from BOLD for ids=' + batch[0])
+            added = self.add_items(items, container, listing_checksums)
+            for key in added:
+                counts[key] += added[key]
+            counts['missing'] += self._update_missing(batch, items, listing_checksums)
+        return counts
+
+    def _update_missing(self, process_ids, items, listing_checksums):
+        """Records which of the requested `process_ids` are not in `items`."""
+        returned = set(item.get('process_id') for item in items)
+        now = time.time()
+        with self._lock:
+            self._db.executemany('DELETE FROM missing WHERE process_id = ?',
+                                 [(process_id,) for process_id in process_ids
+                                  if process_id in returned])
+            not_returned = [process_id for process_id in process_ids
+                            if process_id not in returned]
+            self._db.executemany('INSERT OR REPLACE INTO missing VALUES (?, ?, ?)',
+                                 [(process_id, listing_checksums[process_id], now)
+                                  for process_id in not_returned])
+            self._db.commit()
+        return len(not_returned)
+
+    def __len__(self):
+        with self._lock:
+            return self._db.execute('SELECT COUNT(*) FROM specimens').fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+def _column_value(value):
+    if isinstance(value, list):
+        # Several elements share this path, index the first one
+        value = value[0] if value else None
+    return value
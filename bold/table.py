@@ -0,0 +1,164 @@
+# -*- coding: utf-8 -*-
+from array import array
+
+
+# Columns of BOLD's TSV output that are stored as numbers
+_INTEGER_COLUMNS = ('recordID',)
+_INTEGER_SUFFIXES = ('_taxID',)
+_FLOAT_COLUMNS = ('lat', 'lon', 'elev', 'depth', 'coord_accuracy')
+
+NAN = float('nan')
+
+
+class Table(object):
+    """Column-oriented table with the TSV data returned by BOLD.
+
+    Every column is kept as one sequence. Coordinates are arrays of floats
+    (missing values are NaN) and numeric identifiers such as ``recordID`` and
+    the ``*_taxID`` columns are arrays of integers. The other columns are lists
+    of strings in which repeated values, such as country or institution, are
+    shared instead of being stored once per record.
+
+    Attributes:
+        names (list): Column names in the order used by BOLD.
+        columns (dict): Sequence of values for each column name.
+
+    Examples:
+
+        >>> import bold
+        >>> res = bold.call_specimen_data(geo='Iceland', format='tsv', columnar=True)
+        >>> table = res.items
+        >>> len(table)
+        2052
+        >>> table['country'][0]
+        'Iceland'
+
+    """
+    def __init__(self, names):
+        self.names = names
+        self.columns = dict()
+        self._kinds = []
+        for name in names:
+            if name in _INTEGER_COLUMNS or name.endswith(_INTEGER_SUFFIXES):
+                kind = 'l'
+            elif name in _FLOAT_COLUMNS:
+                kind = 'd'
+            else:
+                kind = None
+            self._kinds.append(kind)
+            self.columns[name] = array(kind) if kind else []
+        self._interned = [dict() for name in names]
+        # Text of the numbers that does not match how they are formatted,
+        # by row, to read them back if a column turns out not to be numeric
+        self._originals = [dict() for name in names]
+        self._length = 0
+
+    def __len__(self):
+        return self._length
+
+    def __getitem__(self, name):
+        return self.columns[name]
+
+    def __contains__(self, name):
+        return name in self.columns
+
+    def rows(self):
+        """Yields each record as a dictionary."""
+        columns = [self.columns[name] for name in self.names]
+        for i in range(self._length):
+            yield dict(zip(self.names, [column[i] for column in columns]))
+
+    def append(self, values):
+        """Adds one record given as a list of strings, one per column."""
+        if len(values) < len(self.names):
+            values = values + [''] * (len(self.names) - len(values))
+        row = self._length
+        for i, name in enumerate(self.names):
+            value = values[i]
+            kind = self._kinds[i]
+            if kind is None:
+                self.columns[name].append(self._interned[i].setdefault(value, value))
+            elif kind == 'd':
+                try:
+                    number = float(value) if value != '' else NAN
+                except ValueError:
+                    self._to_strings(i)
+                    self.columns[name].append(self._interned[i].setdefault(value, value))
+                    continue
+                self.columns[name].append(number)
+                if _format_float(number) != value:
+                    self._originals[i][row] = value
+            else:
+                try:
+                    self.columns[name].append(int(value))
+                except (ValueError, OverflowError):
+                    if value == '':
+                        # Integers with missing values are kept as floats
+                        self._to_floats(i)
+                        self.columns[name].append(NAN)
+                    else:
+                        self._to_strings(i)
+                        self.columns[name].append(self._interned[i].setdefault(value, value))
+                    continue
+                if str(self.columns[name][-1]) != value:
+                    self._originals[i][row] = value
+        self._length += 1
+
+    def _to_floats(self, i):
+        name = self.names[i]
+        originals = self._originals[i]
+        for row, number in enumerate(self.columns[name]):
+            if float(number) != number:
+                # Too big to be exact as a float
+                originals.setdefault(row, str(number))
+        self._kinds[i] = 'd'
+        self.columns[name] = array('d', self.columns[name])
+
+    def _to_strings(self, i):
+        # Numbers are turned back into the text they were read from
+        name = self.names[i]
+        interned = self._interned[i]
+        originals = self._originals[i]
+        to_text = _format_float if self._kinds[i] == 'd' else str
+        strings = []
+        for row, number in enumerate(self.columns[name]):
+            value = originals.get(row)
+            if value is None:
+                value = to_text(number)
+            strings.append(interned.setdefault(value, value))
+        self._kinds[i] = None
+        self.columns[name] = strings
+        self._originals[i] = dict()
+
+
+def _format_float(number):
+    """Text of a float as usually written in BOLD's TSV files, ``''`` for
+    NaN.
+
+    """
+    if number != number:
+        return ''
+    if number.is_integer():
+        return '%d' % number
+    return repr(number)
+
+
+def read_tsv(lines):
+    """Builds a :class:`Table` from lines of TSV data.
+
+    Args:
+        lines: Iterable of lines as strings, e.g. a text file handle. The first
+               line holds the column names.
+
+    Returns:
+        A Table, or None if there were no lines.
+
+    """
+    table = None
+    for line in lines:
+        line = line.rstrip('\r\n')
+        if table is None:
+            table = Table(line.split('\t'))
+        elif line != '':
+            table.append(line.split('\t'))
+    return table
@@ -0,0 +1,243 @@
+# -*- coding: utf-8 -*-
+import json
+import os
+import tempfile
+import threading
+
+
+class TaxonomyIndex(object):
+    """Local tree of the taxa seen in taxonomy responses from BOLD.
+
+    Keeps the ``tax_id``, ``parent_id``, ``taxon`` and ``tax_rank`` of every
+    taxon added, so that lineages, common ancestors and subtrees can be
+    answered in memory. Queries walk the tree through parent links and take
+    time proportional to the depth of the taxa involved.
+
+    Args:
+        path: Optional JSON file the index is loaded from, if it exists, and
+              saved to by :meth:`save`.
+
+    Examples:
+
+        >>> import bold
+        >>> from bold.taxonomy import TaxonomyIndex, set_taxonomy_index
+        >>> index = TaxonomyIndex('taxonomy.json')
+        >>> set_taxonomy_index(index)  # every taxonomy response is added
+        >>> res = bold.call_taxon_data(302603, include_tree=True)
+        >>> [index.taxon(tax_id) for tax_id in index.lineage(302603)][-2:]
+        ['Euptychia', 'Euptychia ordinata']
+        >>> index.save()
+
+    """
+    def __init__(self, path=None):
+        self.path = path
+        self._parents = dict()
+        self._taxa = dict()
+        self._ranks = dict()
+        self._children = dict()
+        self._names = dict()
+        self._lock = threading.RLock()
+        if path is not None and os.path.exists(path):
+            self.load(path)
+
+    def add(self, tax_id, parent_id=None, taxon=None, tax_rank=None):
+        """Adds a taxon or updates what is known about it."""
+        tax_id = int(tax_id)
+        with self._lock:
+            old_parent = self._parents.get(tax_id)
+            if parent_id is not None:
+                parent_id = int(parent_id)
+                if parent_id == tax_id:
+                    # The root is its own parent in some responses
+                    parent_id = None
+            if parent_id is not None and parent_id != old_parent:
+                if old_parent is not None:
+                    self._children[old_parent].discard(tax_id)
+                self._children.setdefault(parent_id, set()).add(tax_id)
+                self._parents.setdefault(parent_id, None)
+                self._parents[tax_id] = parent_id
+            else:
+                self._parents.setdefault(tax_id, None)
+            if taxon is not None and self._taxa.get(tax_id) != taxon:
+                old_taxon = self._taxa.get(tax_id)
+                if old_taxon is not None:
+                    self._names[old_taxon].discard(tax_id)
+                self._taxa[tax_id] = taxon
+                self._names.setdefault(taxon, set()).add(tax_id)
+            if tax_rank is not None:
+                self._ranks[tax_id] = tax_rank
+
+    def add_items(self, items):
+        """Adds the taxa of parsed items from ``call_taxon_search`` or
+        ``call_taxon_data``. Items without ``tax_id`` are ignored.
+
+        Args:
+            items: Iterable of dictionaries, like ``Response.items``.
+
+        """
+        with self._lock:
+            for item in items:
+                if not hasattr(item, 'get') or item.get('tax_id') is None:
+                    continue
+                self.add(item['tax_id'], item.get('parent_id'), item.get('taxon'),
+                         item.get('tax_rank'))
+                parent_id = item.get('parent_id')
+                parent_name = item.get('parent_name')
+                if parent_id is not None and parent_name is not None and \
+                        int(parent_id) not in self._taxa:
+                    self.add(parent_id, taxon=parent_name)
+
+    def __len__(self):
+        return len(self._parents)
+
+    def __contains__(self, tax_id):
+        return int(tax_id) in self._parents
+
+    def taxon(self, tax_id):
+        """Name of a taxon, or None if unknown."""
+        return self._taxa.get(int(tax_id))
+
+    def rank(self, tax_id):
+        """Rank of a taxon, e.g. ``species``, or None if unknown."""
+        return self._ranks.get(int(tax_id))
+
+    def parent(self, tax_id):
+        """Parent of a taxon, or None for a root or unknown taxon."""
+        return self._parents.get(int(tax_id))
+
+    def find(self, taxon):
+        """IDs of the taxa with the given name, sorted."""
+        return sorted(self._names.get(taxon, ()))
+
+    def ancestors(self, tax_id):
+        """IDs of the parent, grand-parent and so on up to the root."""
+        return self._path(int(tax_id))[1:]
+
+    def lineage(self, tax_id):
+        """IDs from the root down to and including `tax_id`."""
+        path = self._path(int(tax_id))
+        path.reverse()
+        return path
+
+    def lineages(self, tax_ids):
+        """Lineages of many taxa, sharing the work for common ancestors.
+
+        Returns:
+            Dictionary of tax ID to the list of IDs from the root down to it.
+
+        """
+        lineages = dict()
+        parents = self._parents
+        for tax_id in tax_ids:
+            tax_id = int(tax_id)
+            path = []
+            node = tax_id
+            while node is not None and node not in lineages:
+                path.append(node)
+                node = parents.get(node)
+                if len(path) > len(parents):
+                    raise ValueError('Cycle in the taxonomy at tax_id %s.' % tax_id)
+            lineage = list(lineages[node]) if node is not None else []
+            for node in reversed(path):
+                lineage.append(node)
+                lineages[node] = list(lineage)
+        return dict((int(tax_id), lineages[int(tax_id)]) for tax_id in tax_ids)
+
+    def ancestor_at_rank(self, tax_id, rank):
+        """ID of the taxon of the given rank in the lineage, e.g. the family
+        of a species, or None if there is none.
+
+        """
+        for node in self._path(int(tax_id)):
+            if self._ranks.get(node) == rank:
+                return node
+        return None
+
+    def lowest_common_ancestor(self, *tax_ids):
+        """Deepest taxon that is an ancestor of, or equal to, all `tax_ids`.
+
+        Returns:
+            The tax ID, or None if the taxa are not in the same tree.
+
+        """
+        if not tax_ids:
+            raise ValueError('At least one tax_id is needed.')
+        common = self._path(int(tax_ids[0]))
+        for tax_id in tax_ids[1:]:
+            ancestors = set(self._path(int(tax_id)))
+            # The path goes upwards, so the first shared taxon is the lowest
+            for i, node in enumerate(common):
+                if node in ancestors:
+                    common = common[i:]
+                    break
+            else:
+                return None
+        return common[0]
+
+    def subtree(self, tax_id, rank=None):
+        """Yields `tax_id` and all its descendants, optionally only those of
+        the given rank.
+
+        """
+        stack = [int(tax_id)]
+        while stack:
+            node = stack.pop()
+            if rank is None or self._ranks.get(node) == rank:
+                yield node
+            stack.extend(self._children.get(node, ()))
+
+    def _path(self, tax_id):
+        if tax_id not in self._parents:
+            raise KeyError(tax_id)
+        parents = self._parents
+        path = [tax_id]
+        node = parents[tax_id]
+        while node is not None:
+            path.append(node)
+            if len(path) > len(parents):
+                raise ValueError('Cycle in the taxonomy at tax_id %s.' % tax_id)
+            node = parents.get(node)
+        return path
+
+    def save(self, path=None):
+        """Writes the index as JSON to `path` or to the path it was created with."""
+        path = path or self.path
+        if path is None:
+            raise ValueError('No path to save the taxonomy index to.')
+        with self._lock:
+            rows = [[tax_id, parent_id, self._taxa.get(tax_id), self._ranks.get(tax_id)]
+                    for tax_id, parent_id in self._parents.items()]
+        directory = os.path.dirname(os.path.abspath(path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory)
+        with os.fdopen(fd, 'w') as handle:
+            json.dump({'taxa': rows}, handle)
+        # Replace the old file only once the new one is complete
+        getattr(os, 'replace', os.rename)(tmp_path, path)
+
+    def load(self, path):
+        """Adds the taxa saved in `path` to the index."""
+        with open(path) as handle:
+            rows = json.load(handle)['taxa']
+        with self._lock:
+            for tax_id, parent_id, taxon, tax_rank in rows:
+                self.add(tax_id, parent_id, taxon, tax_rank)
+
+
+_taxonomy_index = None
+
+
+def get_taxonomy_index():
+    """Index fed with every taxonomy response, or None if it is disabled."""
+    return _taxonomy_index
+
+
+def set_taxonomy_index(index):
+    """Adds the taxa of every ``call_taxon_search`` and ``call_taxon_data``
+    response to `index`.
+
+    Args:
+        index: A :class:`TaxonomyIndex` instance, or None to stop.
+
+    """
+    global _taxonomy_index
+    _taxonomy_index = index
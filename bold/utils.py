@@ -1,17 +1,154 @@
 # -*- coding: utf-8 -*-
+import re
+
 from Bio._py3k import basestring
 
 
+# Gaps of alignments and whitespace, removed before sending a sequence. The
+# same characters as ``\s`` in Latin-1, so that ``prepare_sequences`` can
+# look them up one byte at a time
+_GAP_CHARACTERS = '-. \t\n\r\x0b\x0c\x1c\x1d\x1e\x1f\x85\xa0'
+_GAPS = re.compile('[%s]+' % re.escape(_GAP_CHARACTERS))
+
+NUCLEOTIDES = 'ACGT'
+AMBIGUITY_CODES = 'RYSWKMBDHVN'
+
+# BOLD only accepts barcodes of at least 640 bp with at most 1% of ambiguous
+# bases in the ``COX1_L640bp`` database
+COX1_L640BP_MIN_LENGTH = 640
+COX1_L640BP_MAX_AMBIGUITY = 0.01
+
+
 def _prepare_sequence(seq_record):
-    """Outputs a DNA sequence as string.
+    """Outputs a DNA sequence as string, uppercase and without gaps or
+    whitespace.
 
     :param seq_record: Either sequence as string or sequence object
     :return: sequence as string
     """
     if isinstance(seq_record, basestring):
-        return seq_record
+        seq = seq_record
     else:
         try:
-            return str(seq_record.seq)
+            seq = str(seq_record.seq)
         except AttributeError:
             raise AttributeError("No valid sequence was found for %s." % seq_record)
+    return _GAPS.sub('', seq).upper()
+
+
+def prepare_sequences(seq_records):
+    """Normalizes and checks many DNA sequences before they are sent to BOLD.
+
+    All sequences are processed together as one NumPy byte array: they are
+    uppercased, gaps (``-`` and ``.``) and whitespace are removed, and every
+    base is checked against the IUPAC nucleotide codes.
+
+    Args:
+        seq_records: Iterable of DNA sequence strings or seq_record objects.
+
+    Returns:
+        List with one dictionary per sequence, in the input order, with keys:
+        ``id`` (the ``id`` of a seq_record object or the position of a
+        string), ``sequence`` (the normalized sequence), ``length``,
+        ``ambiguous`` (number of ambiguity codes, ``N`` included),
+        ``invalid`` (sorted list of the characters that are not IUPAC codes),
+        ``valid`` (whether the sequence is not empty and has no invalid
+        characters) and ``cox1_l640bp`` (whether it is valid and long and
+        unambiguous enough for the ``COX1_L640bp`` database).
+
+    Raises:
+        MissingPythonDependencyError: If NumPy is not installed.
+
+    Examples:
+
+        >>> from bold.utils import prepare_sequences
+        >>> prepared = prepare_sequences(SeqIO.parse('reads.fas', 'fasta'))
+        >>> good = [item['sequence'] for item in prepared if item['valid']]
+
+    """
+    try:
+        import numpy
+    except ImportError:
+        from Bio import MissingPythonDependencyError
+        raise MissingPythonDependencyError(
+            "Install NumPy if you want to use bold.utils.prepare_sequences.")
+
+    ids = []
+    sequences = []
+    for position, seq_record in enumerate(seq_records):
+        ids.append(getattr(seq_record, 'id', position))
+        if isinstance(seq_record, basestring):
+            sequences.append(seq_record)
+        else:
+            try:
+                sequences.append(str(seq_record.seq))
+            except AttributeError:
+                raise AttributeError("No valid sequence was found for %s." % seq_record)
+    if not sequences:
+        return []
+
+    # One character per byte, anything that is not Latin-1 becomes "?"
+    data = numpy.frombuffer(''.join(sequences).encode('latin-1', 'replace'), dtype=numpy.uint8)
+    raw_lengths = [len(seq) for seq in sequences]
+    owner = numpy.repeat(numpy.arange(len(sequences), dtype=numpy.int32), raw_lengths)
+
+    def count_per_sequence(mask):
+        # Plain lists, indexing NumPy arrays one element at a time is slow
+        return numpy.bincount(owner[mask], minlength=len(sequences)).tolist()
+
+    uppercase, kind_of = _tables()
+    kinds = kind_of[data]
+    kept = kinds != _GAP
+    text = uppercase[data[kept]].tobytes().decode('latin-1')
+    gaps = count_per_sequence(~kept)
+    ambiguous = count_per_sequence(kinds == _AMBIGUOUS)
+    invalid = count_per_sequence(kinds == _INVALID)
+
+    prepared = []
+    start = 0
+    for i in range(len(sequences)):
+        length = raw_lengths[i] - gaps[i]
+        end = start + length
+        item = {
+            'id': ids[i],
+            'sequence': text[start:end],
+            'length': length,
+            'ambiguous': ambiguous[i],
+            'invalid': [],
+        }
+        if invalid[i]:
+            # Rare, report the original characters
+            item['sequence'] = _prepare_sequence(sequences[i])
+            item['invalid'] = sorted(set(item['sequence']) - _IUPAC)
+            length = item['length'] = len(item['sequence'])
+        item['valid'] = length > 0 and not item['invalid']
+        item['cox1_l640bp'] = (item['valid'] and length >= COX1_L640BP_MIN_LENGTH and
+                               item['ambiguous'] <= COX1_L640BP_MAX_AMBIGUITY * length)
+        prepared.append(item)
+        start = end
+    return prepared
+
+
+_IUPAC = frozenset(NUCLEOTIDES + AMBIGUITY_CODES)
+_BASE, _AMBIGUOUS, _GAP, _INVALID = range(4)
+_TABLES = []
+
+
+def _tables():
+    """Lookup tables from byte to uppercase byte and to kind of character,
+    built on first use so that NumPy is not imported with ``bold``.
+
+    """
+    if _TABLES:
+        return _TABLES
+    import numpy
+
+    uppercase = numpy.arange(256, dtype=numpy.uint8)
+    uppercase[ord('a'):ord('z') + 1] -= 32
+    kinds = numpy.zeros(256, dtype=numpy.uint8) + _INVALID
+    for characters, kind in ((NUCLEOTIDES, _BASE), (AMBIGUITY_CODES, _AMBIGUOUS),
+                             (_GAP_CHARACTERS, _GAP)):
+        for character in characters + characters.lower():
+            kinds[ord(character)] = kind
+    _TABLES[:] = [uppercase, kinds]
+    return _TABLES
@@ -0,0 +1,159 @@
+# -*- coding: utf-8 -*-
+"""Payloads shaped like responses recorded from BOLD, shared by the tests and
+the benchmarks. The ``make_*`` functions scale them up synthetically.
+
+"""
+import gzip
+import io
+import os
+import tarfile
+
+
+ID_ENGINE_MATCH = (
+    '<match><ID>SYNTH%(i)d-14</ID><sequencedescription>COI-5P</sequencedescription>'
+    '<database>Published</database><citation>Pena C, Ortiz-Acevedo E</citation>'
+    '<taxonomicidentification>Euptychia ordinata</taxonomicidentification>'
+    '<similarity>0.99</similarity>'
+    '<specimen><url>http://www.boldsystems.org/index.php/Public_RecordView?processid=SYNTH%(i)d-14</url>'
+    '<collectionlocation><country>Peru</country>'
+    '<coord><lat>-12.5</lat><lon>-69.2</lon></coord></collectionlocation></specimen>'
+    '</match>'
+)
+TAXON_SEARCH_JSON = b'{"302603":{"taxid":302603,"taxon":"Euptychia ordinata","tax_rank":"species",' \
+                    b'"tax_division":"Animals","parentid":7044,"parentname":"Euptychia"}}'
+TAXON_DATA_JSON = b'{"taxid":891,"taxon":"Fabaceae","tax_rank":"family","tax_division":"Plants",' \
+                  b'"parentid":187,"parentname":"Fabales","taxonrep":"Fabaceae"}'
+NUCLEOTIDES = 'AACATTATATTTTATTTTTGGAATTTGAGCAGGAATAGTAGGAACTTCTCTCAGTTTAATTATTCGAATAGAATTAGG' * 8
+
+SPECIMEN_RECORD = (
+    '<record>'
+    '<record_id>%(i)d</record_id>'
+    '<processid>SYNTH%(i)d-14</processid>'
+    '<bin_uri>BOLD:AAA%(i)04d</bin_uri>'
+    '<specimen_identifiers><sampleid>S%(i)d</sampleid>'
+    '<catalognum>C%(i)d</catalognum><fieldnum>F%(i)d</fieldnum>'
+    '<institution_storing>Biodiversity Institute of Ontario</institution_storing>'
+    '</specimen_identifiers>'
+    '<taxonomy><identification_provided_by>Carlos Pena</identification_provided_by>'
+    '<phylum><taxon><taxID>20</taxID><name>Arthropoda</name></taxon></phylum>'
+    '<class><taxon><taxID>82</taxID><name>Insecta</name></taxon></class>'
+    '<order><taxon><taxID>113</taxID><name>Lepidoptera</name></taxon></order>'
+    '<family><taxon><taxID>7044</taxID><name>Nymphalidae</name></taxon></family>'
+    '<genus><taxon><taxID>50</taxID><name>Hermeuptychia</name></taxon></genus>'
+    '</taxonomy>'
+    '<specimen_details><voucher_type>Vouchered</voucher_type></specimen_details>'
+    '<collection_event><collectors>Carlos Pena</collectors>'
+    '<coordinates><lat>-12.5</lat><long>-69.2</long></coordinates>'
+    '<country>Peru</country><province>Madre de Dios</province>'
+    '</collection_event>'
+    '<tracefiles>'
+    '<read><read_id>%(i)d1</read_id><direction>F</direction><markercode>COI-5P</markercode></read>'
+    '<read><read_id>%(i)d2</read_id><direction>R</direction><markercode>COI-5P</markercode></read>'
+    '</tracefiles>'
+    '<sequences><sequence><sequenceID>%(i)d</sequenceID><markercode>COI-5P</markercode>'
+    '<genbank_accession>KF%(i)06d</genbank_accession>'
+    '<nucleotides>AACATTATATTTTATTTTTGGAATTTGAGCAGGAATAGTAGG</nucleotides>'
+    '</sequence></sequences>'
+    '</record>'
+)
+
+
+def make_specimen_xml(number_of_records):
+    """Builds a synthetic ``API_Public/combined`` document."""
+    records = [SPECIMEN_RECORD % {'i': i} for i in range(number_of_records)]
+    return '<?xml version="1.0" encoding="UTF-8"?><bold_records>' + \
+        ''.join(records) + '</bold_records>'
+
+
+def iter_specimen_xml(number_of_records, chunk_size=1000):
+    """Same document as :func:`make_specimen_xml`, as chunks of bytes."""
+    yield b'<?xml version="1.0" encoding="UTF-8"?><bold_records>'
+    for start in range(0, number_of_records, chunk_size):
+        stop = min(number_of_records, start + chunk_size)
+        yield ''.join([SPECIMEN_RECORD % {'i': i} for i in range(start, stop)]).encode('utf-8')
+    yield b'</bold_records>'
+
+
+def make_id_engine_xml(number_of_matches):
+    """Builds a synthetic ``Ids_xml`` document."""
+    matches = [ID_ENGINE_MATCH % {'i': i} for i in range(number_of_matches)]
+    return '<?xml version="1.0" encoding="UTF-8"?><matches>' + ''.join(matches) + '</matches>'
+
+
+def make_fasta(number_of_sequences):
+    """Builds a synthetic ``API_Public/sequence`` response."""
+    return ''.join(['>SYNTH%d-14|Euptychia ordinata|COI-5P|KF%06d\n%s\n' % (i, i, NUCLEOTIDES)
+                    for i in range(number_of_sequences)])
+
+
+def make_tsv(number_of_records):
+    """Builds a synthetic ``API_Public/specimen`` response with ``format=tsv``."""
+    header = 'processid\tsampleid\trecordID\tcatalognum\tinstitution_storing\tbin_uri\t' \
+             'phylum_taxID\tphylum_name\tfamily_taxID\tfamily_name\tspecies_name\t' \
+             'lat\tlon\tcountry\tprovince_state\n'
+    row = 'SYNTH%(i)d-14\tS%(i)d\t%(i)d\tC%(i)d\tBiodiversity Institute of Ontario\t' \
+          'BOLD:AAA%(i)04d\t20\tArthropoda\t7044\tNymphalidae\tEuptychia ordinata\t' \
+          '-12.5\t-69.2\tPeru\tMadre de Dios\n'
+    return header + ''.join([row % {'i': i} for i in range(number_of_records)])
+
+
+def make_trace_archive(megabytes=None, traces=None):
+    """Builds a TAR archive of trace files, as returned by ``API_Public/trace``.
+
+    Args:
+        megabytes: Approximate size of the archive, made of synthetic forward
+                   reads of 256 kB.
+        traces: Instead of `megabytes`, list of (process ID, taxon, marker,
+                file name, contents). Traces whose marker is None are left
+                out of ``TRACE_FILE_INFO.txt``, and the contents of files
+                ending in ``.gz`` are gzipped.
+
+    """
+    if traces is None:
+        contents = os.urandom(256 * 1024)
+        traces = [('SYNTH%d-14' % i, 'Euptychia ordinata', 'COI-5P', 'SYNTH%d-14[LepF1]_F.ab1' % i,
+                   contents) for i in range(megabytes * 4)]
+    listing = ['PROCESSID\tTAXON\tMARKER\tTRACEFILE']
+    members = []
+    for process_id, taxon, marker, name, contents in traces:
+        if marker is not None:
+            listing.append('\t'.join([process_id, taxon, marker, name]))
+        if name.endswith('.gz'):
+            contents = _gzip(contents)
+        members.append((taxon + '/' + name, contents))
+    members.insert(0, ('TRACE_FILE_INFO.txt', ('\n'.join(listing) + '\n').encode('utf-8')))
+    output = io.BytesIO()
+    archive = tarfile.open(fileobj=output, mode='w')
+    for name, data in members:
+        info = tarfile.TarInfo(name)
+        info.size = len(data)
+        archive.addfile(info, io.BytesIO(data))
+    archive.close()
+    return output.getvalue()
+
+
+def _gzip(data):
+    output = io.BytesIO()
+    handle = gzip.GzipFile(fileobj=output, mode='wb')
+    handle.write(data)
+    handle.close()
+    return output.getvalue()
+
+
+def make_taxon_search_json(number_of_taxa):
+    """Builds a synthetic ``TaxonSearch`` response with many hits."""
+    taxon = '"%(i)d":{"taxid":%(i)d,"taxon":"Euptychia sp. %(i)d","tax_rank":"species",' \
+            '"tax_division":"Animals","parentid":7044,"parentname":"Euptychia"}'
+    return '{' + ','.join([taxon % {'i': i} for i in range(number_of_taxa)]) + '}'
+
+
+JSON_DOCUMENTS = [
+    make_taxon_search_json(3),
+    '{"taxid":891,"taxon":"Fabaceae","tax_rank":"family","tax_division":"Plants",'
+    '"parentid":187,"parentname":"Fabales","taxonrep":"Fabaceae"}',
+    '{"stats":{"publicspecies":2,"publicbins":3,"publicmarkersequences":{"COI-5P":6}},'
+    '"images":[{"photographer":"Oscar Lopez","aspectratio":1.608}]}',
+    '{"1":{"taxid":1,"taxon":"Animalia"},"2":[1, 2], "3":{"taxid":-3.5e2,"a":[true,false,null]}}',
+    '{"302603":{"taxid":302603},"taxon":"mixed"}',
+    '{}',
+]
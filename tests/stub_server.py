@@ -0,0 +1,188 @@
+# -*- coding: utf-8 -*-
+"""Local stand-in for boldsystems.org used by the offline tests."""
+import socket
+import sys
+import threading
+import time
+import unittest
+import zlib
+
+try:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+    from socketserver import ThreadingMixIn
+except ImportError:
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+    from SocketServer import ThreadingMixIn
+try:
+    from urllib.parse import urlsplit
+except ImportError:
+    from urlparse import urlsplit
+
+from bold import api
+from bold import scheduler
+from bold import session
+
+
+class _ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # Clients dropping idle pooled connections are not errors
+        if not isinstance(sys.exc_info()[1], socket.error):
+            HTTPServer.handle_error(self, request, client_address)
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # Headers and body are written separately, like a real server would not
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        BaseHTTPRequestHandler.setup(self)
+        self.server.stub._count('connections')
+
+    def do_GET(self):
+        stub = self.server.stub
+        stub._count('requests')
+        stub.paths.append(self.path)
+        route = stub.routes.get(urlsplit(self.path).path)
+        if route is None:
+            status, headers, body = 404, {}, b'Not found'
+        else:
+            status, headers, body = route(self) if callable(route) else route
+        encoding = (stub.compression or '').replace('raw-', '')
+        if encoding and encoding in self.headers.get('Accept-Encoding', '') and body:
+            headers = dict(headers, **{'Content-Encoding': encoding})
+            body = _compress(body, stub.compression)
+        if stub.latency:
+            time.sleep(stub.latency)
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        if isinstance(body, bytes):
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            stub._count('bytes_sent', len(body))
+            self._write(body)
+        else:
+            # Iterable of chunks, for payloads too big to build in memory
+            self.send_header('Transfer-Encoding', 'chunked')
+            self.end_headers()
+            for chunk in body:
+                if chunk:
+                    stub._count('bytes_sent', len(chunk))
+                    self._write(('%x\r\n' % len(chunk)).encode('ascii') + chunk + b'\r\n')
+            self._write(b'0\r\n\r\n')
+
+    def _write(self, data):
+        bandwidth = self.server.stub.bandwidth
+        if not bandwidth:
+            self.wfile.write(data)
+            return
+        block_size = max(1, int(bandwidth / 100))
+        for start in range(0, len(data), block_size):
+            self.wfile.write(data[start:start + block_size])
+            time.sleep(float(len(data[start:start + block_size])) / bandwidth)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def _compress(body, encoding):
+    if encoding == 'gzip':
+        compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    elif encoding == 'raw-deflate':
+        compressor = zlib.compressobj(6, zlib.DEFLATED, -zlib.MAX_WBITS)
+    else:
+        compressor = zlib.compressobj(6)
+    if isinstance(body, bytes):
+        return compressor.compress(body) + compressor.flush()
+    return _compress_chunks(body, compressor)
+
+
+def _compress_chunks(body, compressor):
+    for chunk in body:
+        yield compressor.compress(chunk)
+    yield compressor.flush()
+
+
+class StubServer(object):
+    """Serves canned responses on 127.0.0.1 and counts TCP connections.
+
+    Args:
+        routes: Dictionary of URL path to ``(status, headers, body)`` or to a
+                callable taking the request handler and returning that tuple.
+                The body is bytes, or an iterable of bytes sent chunked.
+        latency: Seconds to wait before answering each request.
+        bandwidth: Optional limit in bytes per second for each response.
+        compression: Optional ``gzip`` or ``deflate`` encoding of the bodies
+                     sent to clients that accept it. Use ``raw-deflate`` for
+                     deflate without the zlib header, as some servers send it.
+
+    """
+    def __init__(self, routes=None, latency=0, bandwidth=None, compression=None):
+        self.routes = routes or dict()
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.compression = compression
+        self.paths = []
+        self.connections = 0
+        self.requests = 0
+        self.bytes_sent = 0
+        self._lock = threading.Lock()
+        self._server = _ThreadingHTTPServer(('127.0.0.1', 0), _StubHandler)
+        self._server.stub = self
+        self._thread = threading.Thread(target=self._server.serve_forever)
+        self._thread.daemon = True
+
+    @property
+    def url(self):
+        return 'http://127.0.0.1:%d' % self._server.server_address[1]
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _count(self, attribute, amount=1):
+        with self._lock:
+            setattr(self, attribute, getattr(self, attribute) + amount)
+
+
+class StubServerTestCase(unittest.TestCase):
+    """Test case calling the BOLD services of a :class:`StubServer`.
+
+    The service URLs, the default scheduler and the default session changed
+    by the helpers below are restored after each test.
+
+    """
+    def start_server(self, routes, urls=None, **kwargs):
+        """Starts a StubServer stopped after the test.
+
+        Args:
+            routes: Routes of the server, see :class:`StubServer`.
+            urls: Optional dictionary of service alias, e.g. ``call_id``, to
+                  the path on the server that answers it.
+            kwargs: Other arguments of :class:`StubServer`.
+
+        """
+        server = StubServer(routes, **kwargs).start()
+        self.addCleanup(server.stop)
+        self.addCleanup(api._URLS.update, api._URLS.copy())
+        for service, path in (urls or dict()).items():
+            api._URLS[service] = server.url + path
+        return server
+
+    def use_scheduler(self, new_scheduler):
+        """Makes `new_scheduler` the default scheduler during the test."""
+        self.addCleanup(scheduler.set_default_scheduler, scheduler.get_default_scheduler())
+        scheduler.set_default_scheduler(new_scheduler)
+
+    def use_session(self, new_session):
+        """Makes `new_session` the default session during the test."""
+        self.addCleanup(session.set_default_session, session.get_default_session())
+        self.addCleanup(new_session.close)
+        session.set_default_session(new_session)
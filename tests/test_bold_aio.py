@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+import sys
+import threading
+import time
+import unittest
+
+from Bio._py3k import HTTPError
+
+from bold import scheduler
+
+from .fixtures import TAXON_SEARCH_JSON
+from .stub_server import StubServerTestCase
+
+if sys.version_info >= (3, 5):
+    # bold.aio uses async def, a syntax error in older versions
+    import asyncio
+    from bold import aio
+
+
+@unittest.skipIf(sys.version_info < (3, 5), 'bold.aio needs Python 3.5 or later')
+class TestAio(StubServerTestCase):
+
+    def setUp(self):
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.lock = threading.Lock()
+        # Cleared to hold the responses until every caller is waiting
+        self.release = threading.Event()
+        self.release.set()
+
+        def slow_taxon_search(handler):
+            self.release.wait(5)
+            if 'Nowhere' in handler.path:
+                return 500, {}, b'Internal error'
+            with self.lock:
+                self.in_flight += 1
+                self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            time.sleep(0.05)
+            with self.lock:
+                self.in_flight -= 1
+            return 200, {}, TAXON_SEARCH_JSON
+
+        self.server = self.start_server({'/TaxonSearch': slow_taxon_search},
+                                        {'call_taxon_search': '/TaxonSearch'})
+        self.loop = asyncio.new_event_loop()
+
+    def test_call_taxon_search(self):
+        res = self.loop.run_until_complete(aio.call_taxon_search('Euptychia ordinata'))
+        self.assertEqual(302603, res.items[0]['tax_id'])
+
+    def test_max_concurrency(self):
+        # The scheduler alone would let all 12 calls run at once
+        self.use_scheduler(scheduler.Scheduler(concurrency=32))
+        aio.set_max_concurrency(3)
+        results = self.gather([aio.call_taxon_search('Euptychia ordinata %d' % i)
+                               for i in range(12)])
+        self.assertEqual(12, len(results))
+        self.assertEqual(3, self.max_in_flight)
+
+    def test_identical_calls_are_coalesced(self):
+        calls = [aio.call_taxon_search('Euptychia ordinata') for i in range(12)]
+        calls.append(aio.call_taxon_search('Euptychia mollis'))
+        results = self.gather_held(calls, 2)
+        self.assertEqual(13, len(results))
+        self.assertTrue(all(res is results[0] for res in results[:12]))
+        self.assertEqual(2, self.server.requests)
+        self.assertEqual({}, aio._pending)
+
+    def test_identical_failing_calls(self):
+        self.use_scheduler(scheduler.Scheduler(retries=0))
+        calls = [aio.call_taxon_search('Nowhere') for i in range(4)]
+        results = self.gather_held(calls, 1, return_exceptions=True)
+        self.assertEqual(1, self.server.requests)
+        self.assertTrue(all(isinstance(res, HTTPError) for res in results))
+        # Each caller but the first raises its own copy of the error
+        self.assertEqual(4, len(set(id(res) for res in results)))
+        self.assertTrue(all(res.__cause__ is results[0] for res in results[1:]))
+
+    def test_invalid_arguments(self):
+        self.assertRaises(ValueError, self.loop.run_until_complete,
+                          aio.call_taxon_search('Fabaceae', 'true'))
+        self.assertRaises(ValueError, aio.set_max_concurrency, 0)
+
+    def gather(self, calls):
+        tasks = [self.loop.create_task(call) for call in calls]
+        return self.loop.run_until_complete(asyncio.gather(*tasks))
+
+    def gather_held(self, calls, requests, **kwargs):
+        """Runs `calls`, holding the responses until all of them wait for
+        one of the `requests` in flight.
+
+        """
+        self.release.clear()
+        tasks = [self.loop.create_task(call) for call in calls]
+
+        async def release():
+            # The tasks created before run up to their first await first
+            await asyncio.sleep(0)
+            self.assertEqual(requests, len(aio._pending))
+            self.release.set()
+
+        self.loop.run_until_complete(release())
+        return self.loop.run_until_complete(asyncio.gather(*tasks, **kwargs))
+
+    def tearDown(self):
+        self.release.set()
+        aio.set_max_concurrency(aio.DEFAULT_MAX_CONCURRENCY)
+        self.loop.close()
+
+
+if __name__ == '__main__':
+    runner = unittest.TextTestRunner(verbosity=2)
+    unittest.main(testRunner=runner)
@@ -1,13 +1,26 @@
 # -*- coding: utf-8 -*-
+import io
+import threading
 import unittest
 import warnings
 
 from Bio import BiopythonWarning
+from Bio.Seq import Seq
+from Bio.SeqRecord import SeqRecord
 from Bio._py3k import HTTPError
 from Bio import MissingExternalDependencyError
 
 import bold
 from bold import api
+from bold import scheduler
+
+from .fixtures import JSON_DOCUMENTS, TAXON_DATA_JSON, make_trace_archive
+from .stub_server import StubServerTestCase
+
+
+ID_ENGINE_XML = '<?xml version="1.0" encoding="UTF-8"?><matches><match><ID>%s</ID>' \
+                '<taxonomicidentification>Euptychia ordinata</taxonomicidentification>' \
+                '<similarity>1</similarity></match></matches>'
 
 
 class TestApi(unittest.TestCase):
@@ -243,6 +256,67 @@ class TestApi(unittest.TestCase):
         item = res.items[0]
         self.assertTrue('wikipedia_summary' in item.keys())
 
+    def test_iter_xml(self):
+        xml_string = b'<?xml version="1.0" encoding="UTF-8"?><bold_records>' \
+                     b'<record><processid>GBLN4477-14</processid><taxonomy><genus><taxon>' \
+                     b'<name>Hermeuptychia</name></taxon></genus></taxonomy></record>' \
+                     b'<record><processid>GBLN4478-14</processid></record></bold_records>'
+        res = api.Response()
+        res._parse_stream('call_full_data', io.BytesIO(xml_string))
+        items = list(res.items)
+        self.assertEqual(2, len(items))
+        self.assertEqual('Hermeuptychia', items[0]['taxonomy_genus_taxon_name'])
+        self.assertEqual('GBLN4478-14', items[1]['process_id'])
+
+        res.method = 'call_full_data'
+        res._parse_xml(xml_string)
+        self.assertEqual(res.items, items)
+
+    def test_iter_xml_empty(self):
+        res = api.Response()
+        res._parse_stream('call_specimen_data', io.BytesIO(b''))
+        self.assertRaises(ValueError, list, res.items)
+
+    def test_parse_fasta(self):
+        fasta_string = '>GBLN4477-14|Hermeuptychia\nAACATTATATTTTATTTTTGG\n' \
+                       '>GBLN4478-14|Hermeuptychia\nAACATTATAT\nTTTATTTTTGG\n'
+        res = api.Response()
+        res._parse_data('call_sequence_data', fasta_string)
+        self.assertEqual(['GBLN4477-14|Hermeuptychia', 'GBLN4478-14|Hermeuptychia'],
+                         [item.id for item in res.items])
+        self.assertEqual('AACATTATATTTTATTTTTGG', str(res.items[1].seq))
+
+        res._parse_stream('call_sequence_data', io.BytesIO(fasta_string.encode('utf-8')))
+        self.assertEqual(['GBLN4477-14|Hermeuptychia', 'GBLN4478-14|Hermeuptychia'],
+                         [item.id for item in res.items])
+
+    def test_iter_fasta_empty(self):
+        res = api.Response()
+        res._parse_stream('call_sequence_data', io.BytesIO(b''))
+        self.assertRaises(ValueError, list, res.items)
+
+    def test_iter_json(self):
+        # All but the document mixing taxon IDs and other keys
+        for document in JSON_DOCUMENTS[:4] + JSON_DOCUMENTS[5:]:
+            res = api.Response()
+            res._parse_json(document)
+            items = res.items
+            for chunk_size in (1, 3, 7, 65536):
+                self.assertEqual(items, list(res._iter_json(io.BytesIO(document.encode('utf-8')),
+                                                            chunk_size=chunk_size)))
+            res._parse_stream('call_taxon_data', io.BytesIO(document.encode('utf-8')))
+            self.assertEqual(items, list(res.items))
+
+    def test_iter_json_invalid(self):
+        res = api.Response()
+        for document in ['', '[1, 2]', '{"1":{"taxid":1},"taxon":"mixed"}', '{"1":{"taxid":1}']:
+            res._parse_stream('call_taxon_search', io.BytesIO(document.encode('utf-8')))
+            self.assertRaises(ValueError, list, res.items)
+
+    def test_call_specimen_data_stream_format_tsv(self):
+        self.assertRaises(ValueError, bold.call_specimen_data, geo='Iceland',
+                          format='tsv', stream=True)
+
     def test_parse_data_empty(self):
         result_string = ''
         response = api.Response()
@@ -252,6 +326,245 @@ class TestApi(unittest.TestCase):
         pass
 
 
+class TestCallIdMany(StubServerTestCase):
+
+    def setUp(self):
+        def id_engine(handler):
+            if 'sequence=NNNN' in handler.path:
+                return 500, {}, b'Internal error'
+            sequence = handler.path.split('sequence=')[1]
+            return 200, {}, (ID_ENGINE_XML % sequence).encode('utf-8')
+
+        self.server = self.start_server({'/Ids_xml': id_engine}, {'call_id': '/Ids_xml'})
+        self.use_scheduler(scheduler.Scheduler(retries=1, backoff=0.01))
+
+    def test_call_id_many(self):
+        records = ['ACGT', SeqRecord(Seq('TTGG'), id='read_2'), 'NNNN', 'GGCC']
+        progress = []
+        results = dict(bold.call_id_many(
+            records, db='COX1', workers=2,
+            progress=lambda done, total: progress.append((done, total))))
+        self.assertEqual([0, 2, 3, 'read_2'], sorted(results, key=str))
+        self.assertEqual('ACGT', results[0].items[0]['bold_id'])
+        self.assertEqual('TTGG', results['read_2'].items[0]['bold_id'])
+        self.assertTrue(isinstance(results[2], HTTPError))
+        self.assertEqual(2, len([path for path in self.server.paths if 'NNNN' in path]))
+        self.assertEqual([(1, 4), (2, 4), (3, 4), (4, 4)], progress)
+
+    def test_call_id_many_failing_records(self):
+        def records():
+            yield 'ACGT'
+            yield 'GGCC'
+            raise ValueError('Malformed FASTA file')
+
+        results = []
+        with self.assertRaises(ValueError):
+            for result in bold.call_id_many(records(), db='COX1', workers=2):
+                results.append(result)
+        self.assertTrue(len(results) <= 2)
+
+    def test_call_id_many_deduplicates(self):
+        records = ['ACGT', SeqRecord(Seq('acg-t'), id='read_2'), 'GGCC', 'AC GT', 'ggcc', 'TTAA']
+        stats = dict()
+        results = dict(bold.call_id_many(records, db='COX1', workers=3, stats=stats))
+        self.assertEqual(6, len(results))
+        self.assertTrue(results[0] is results['read_2'] is results[3])
+        self.assertEqual('GGCC', results[4].items[0]['bold_id'])
+        self.assertEqual(3, self.server.requests)
+        self.assertEqual({'sequences': 6, 'unique': 3, 'ratio': 2.0}, stats)
+
+        # One at a time, identical calls in flight are shared anyway
+        results = list(bold.call_id_many(records, db='COX1', workers=1, deduplicate=False))
+        self.assertEqual(6, len(results))
+        self.assertEqual(9, self.server.requests)
+
+    def test_call_id_many_failures_are_not_reused(self):
+        records = ['NNNN', 1234, 'nnnn']
+        stats = dict()
+        results = list(bold.call_id_many(records, db='COX1', workers=1, stats=stats))
+        self.assertEqual([0, 1, 2], [input_id for input_id, result in results])
+        self.assertTrue(isinstance(results[1][1], AttributeError))
+        self.assertTrue(isinstance(results[2][1], HTTPError))
+        self.assertFalse(results[0][1] is results[2][1])
+        # retried once for each of the two queries
+        self.assertEqual(4, len([path for path in self.server.paths if 'NNNN' in path]))
+        self.assertEqual({'sequences': 3, 'unique': 2, 'ratio': 1.5}, stats)
+
+    def test_call_id_many_generator(self):
+        records = (seq for seq in ['ACGT', 'GGCC'])
+        results = list(bold.call_id_many(records, db='COX1', workers=8))
+        self.assertEqual(2, len(results))
+
+    def test_call_id_many_invalid_workers(self):
+        self.assertRaises(ValueError, list, bold.call_id_many(['ACGT'], db='COX1', workers=0))
+
+
+class TestCoalescing(StubServerTestCase):
+
+    def setUp(self):
+        # Set once every caller but the first ones is waiting for a call in
+        # flight, so that BOLD only answers then
+        self.all_waiting = threading.Event()
+        self.followers = 0
+        self.expected_followers = 0
+        self.lock = threading.Lock()
+        test = self
+
+        class WaitingEvent(threading.Event):
+            def wait(self, timeout=None):
+                with test.lock:
+                    test.followers += 1
+                    if test.followers == test.expected_followers:
+                        test.all_waiting.set()
+                return threading.Event.wait(self, timeout)
+
+        class Flight(api._Flight):
+            def __init__(self):
+                super(Flight, self).__init__()
+                self.done = WaitingEvent()
+
+        self.addCleanup(setattr, api, '_Flight', api._Flight)
+        api._Flight = Flight
+
+        def taxon_data(handler):
+            self.all_waiting.wait(5)
+            if 'taxId=0' in handler.path:
+                return 500, {}, b'Internal error'
+            return 200, {}, TAXON_DATA_JSON
+
+        self.server = self.start_server({'/TaxonData': taxon_data},
+                                        {'call_taxon_data': '/TaxonData'})
+        self.use_scheduler(scheduler.Scheduler(retries=0))
+
+    def call_concurrently(self, tax_ids):
+        self.expected_followers = len(tax_ids) - len(set(tax_ids))
+        results = [None] * len(tax_ids)
+
+        def call(i):
+            try:
+                results[i] = bold.call_taxon_data(tax_ids[i], data_type='basic')
+            except Exception as e:
+                results[i] = e
+
+        threads = [threading.Thread(target=call, args=(i,)) for i in range(len(tax_ids))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertTrue(self.all_waiting.is_set())
+        return results
+
+    def test_identical_calls_share_one_request(self):
+        results = self.call_concurrently([891] * 8 + [892])
+        self.assertEqual(2, self.server.requests)
+        self.assertTrue(all(res is results[0] for res in results[:8]))
+        self.assertFalse(results[8] is results[0])
+        self.assertEqual(891, results[0].items[0]['tax_id'])
+        self.assertEqual({}, api._flights)
+
+        # Only calls in flight are shared
+        bold.call_taxon_data(891, data_type='basic')
+        self.assertEqual(3, self.server.requests)
+
+    def test_error_is_raised_in_every_caller(self):
+        results = self.call_concurrently([0] * 4)
+        self.assertEqual(1, self.server.requests)
+        self.assertTrue(all(isinstance(res, HTTPError) for res in results))
+        # Each follower raises its own copy, caused by the error of the first call
+        self.assertEqual(4, len(set(id(res) for res in results)))
+        first = [res for res in results if res.__cause__ is None]
+        self.assertEqual(1, len(first))
+        self.assertTrue(all(res.__cause__ is first[0] for res in results if res is not first[0]))
+        self.assertEqual(500, results[0].code)
+
+    def tearDown(self):
+        self.all_waiting.set()
+
+
+class TestSharding(StubServerTestCase):
+
+    def setUp(self):
+        records = {
+            'Euptychia': ['1', '2'],
+            'Mycalesis': ['2', '3'],
+            'Peru': ['1'],
+        }
+
+        def specimen(handler):
+            query = handler.path.split('?')[1]
+            value = [v for k, v in [i.split('=') for i in query.split('&')] if k in ('taxon', 'geo')][0]
+            if value not in records:
+                return 200, {}, b''
+            xml_string = '<?xml version="1.0" encoding="UTF-8"?><bold_records>'
+            for record_id in records[value]:
+                xml_string += '<record><record_id>%s</record_id><processid>P%s</processid></record>' % (
+                    record_id, record_id)
+            return 200, {}, (xml_string + '</bold_records>').encode('utf-8')
+
+        def sequence(handler):
+            taxon = handler.path.split('taxon=')[1].split('&')[0]
+            fasta = ''.join('>P%s|%s\nACGT\n' % (i, taxon) for i in records[taxon])
+            return 200, {}, fasta.encode('utf-8')
+
+        self.server = self.start_server({'/specimen': specimen, '/sequence': sequence}, {
+            'call_specimen_data': '/specimen',
+            'call_sequence_data': '/sequence',
+        })
+
+    def test_shard_by(self):
+        res = bold.call_specimen_data(taxon='Euptychia|Mycalesis|Fake', shard_by='taxon', workers=2)
+        self.assertEqual(['1', '2', '3'], [item['record_id'] for item in res.items])
+        self.assertEqual(3, self.server.requests)
+
+    def test_partition(self):
+        res = bold.call_specimen_data(taxon='Euptychia', partition=[{}, {'taxon': None, 'geo': 'Peru'}])
+        self.assertEqual(['1', '2'], [item['record_id'] for item in res.items])
+        self.assertEqual(2, self.server.requests)
+
+    def test_shard_sequences(self):
+        res = bold.call_sequence_data(taxon='Euptychia|Mycalesis', shard_by='taxon')
+        self.assertEqual(4, len(res.items))
+
+    def test_shard_empty(self):
+        self.assertRaises(ValueError, bold.call_specimen_data, taxon='Fake|Fake2', shard_by='taxon')
+
+    def test_shard_invalid(self):
+        self.assertRaises(ValueError, bold.call_specimen_data, taxon='Euptychia', shard_by='geo')
+        self.assertRaises(ValueError, bold.call_specimen_data, taxon='Euptychia', shard_by='taxon',
+                          stream=True)
+
+
+class TestTraceFiles(StubServerTestCase):
+
+    def setUp(self):
+        self.archive = make_trace_archive(traces=[
+            ('EUPT001-14', 'Euptychia mollis', 'COI-5P', 'EUPT001-14[LepF1]_F.ab1.gz', b'ABIF forward'),
+            ('EUPT002-14', 'Euptychia mollis', None, 'EUPT002-14[LepR1]_R.scf', b'.scf reverse'),
+        ])
+        self.server = self.start_server({'/trace': (200, {}, self.archive)},
+                                        {'call_trace_files': '/trace'})
+
+    def test_save_stream(self):
+        res = bold.call_trace_files(taxon='Euptychia mollis', stream=True)
+        self.assertEqual(None, res.file_contents)
+        output = io.BytesIO()
+        progress = []
+        written = res.save(output, chunk_size=1024, progress=progress.append)
+        self.assertEqual(self.archive, output.getvalue())
+        self.assertEqual(len(self.archive), written)
+        self.assertEqual(written, progress[-1])
+        self.assertEqual(1024, progress[0])
+        self.assertRaises(ValueError, res.save, io.BytesIO())
+
+    def test_iter_traces(self):
+        expected = [('EUPT001-14', 'COI-5P', b'ABIF forward'), ('EUPT002-14', None, b'.scf reverse')]
+        res = bold.call_trace_files(taxon='Euptychia mollis', stream=True)
+        self.assertEqual(expected, list(res.iter_traces()))
+
+        res = bold.call_trace_files(taxon='Euptychia mollis')
+        self.assertEqual(expected, list(res.iter_traces()))
+
+
 if __name__ == '__main__':
     runner = unittest.TextTestRunner(verbosity=2)
     unittest.main(testRunner=runner)
@@ -0,0 +1,692 @@
+# -*- coding: utf-8 -*-
+"""Offline benchmarks for the parsers and the transport in ``bold.api``.
+
+The timings run only when the environment variable ``BOLD_BENCHMARKS`` is set,
+for example::
+
+    BOLD_BENCHMARKS=1 python -m unittest -v tests.test_bold_benchmarks
+
+The service benchmarks call the ``call_*`` functions against a local stub
+server answering with the payloads of ``tests/fixtures.py``, scaled up
+synthetically. The number of specimen records is taken from
+``BOLD_BENCHMARK_SCALES`` (default ``1000,100000``; add ``1000000`` for the
+largest run) and the stub latency and bandwidth from
+``BOLD_BENCHMARK_LATENCY`` (seconds) and ``BOLD_BENCHMARK_BANDWIDTH`` (bytes
+per second). Each benchmark prints a line with its latency percentiles,
+throughput and peak memory.
+
+"""
+import gc
+import io
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import unittest
+import warnings
+import xml.etree.ElementTree as ET
+
+try:
+    from urllib.parse import urlsplit
+except ImportError:
+    from urlparse import urlsplit
+
+from Bio import BiopythonWarning
+
+import bold
+from bold import api
+from bold import scheduler
+from bold import utils
+from bold.kmer import KmerIndex
+from bold.seqstore import SequenceStore
+from bold.taxonomy import TaxonomyIndex
+
+from .fixtures import (JSON_DOCUMENTS, NUCLEOTIDES, TAXON_DATA_JSON, TAXON_SEARCH_JSON,
+                       iter_specimen_xml, make_fasta, make_id_engine_xml, make_specimen_xml,
+                       make_taxon_search_json, make_trace_archive, make_tsv)
+from .stub_server import StubServer
+
+
+RUN_BENCHMARKS = os.environ.get('BOLD_BENCHMARKS') is not None
+SCALES = [int(i) for i in os.environ.get('BOLD_BENCHMARK_SCALES', '1000,100000').split(',')]
+LATENCY = float(os.environ.get('BOLD_BENCHMARK_LATENCY', 0.02))
+BANDWIDTH = os.environ.get('BOLD_BENCHMARK_BANDWIDTH')
+if BANDWIDTH is not None:
+    BANDWIDTH = float(BANDWIDTH)
+try:
+    import numpy  # noqa: F401
+    HAS_NUMPY = True
+except ImportError:
+    HAS_NUMPY = False
+
+
+def legacy_parse_record(match):
+    """Per-field ``find``/``findall`` evaluation used before the extractor."""
+    item = dict()
+    for field in api._XML_FIELDS:
+        if match.find(field[0]) is not None:
+            key = field[1]
+            matched = match.findall(field[0])
+            if len(matched) == 1:
+                item[key] = match.find(field[0]).text
+            elif len(matched) > 1:
+                item[key] = [i.text for i in matched]
+    return item
+
+
+def legacy_parse_json(result_string):
+    """``_parse_json`` before the key lookup table."""
+    import json
+    import re
+
+    items_from_bold = []
+    response = json.loads(result_string)
+    if not hasattr(response, 'items'):
+        raise ValueError("BOLD did not return any result.")
+    simple_json = False
+    for i in response.keys():
+        if re.search('^[0-9]+', i) is None:
+            simple_json = True
+    if simple_json is True:
+        response = [response]
+    for string_id in response:
+        item = dict()
+        try:
+            json_obj = response[string_id]
+        except TypeError:
+            json_obj = string_id
+        if hasattr(json_obj, 'items'):
+            for k, v in json_obj.items():
+                if k == 'taxid':
+                    item['tax_id'] = v
+                elif k == 'parentid':
+                    item['parent_id'] = v
+                elif k == 'parentname':
+                    item['parent_name'] = v
+                elif k == 'taxonrep':
+                    item['taxon_rep'] = v
+                else:
+                    item[k] = v
+            items_from_bold.append(item)
+    return items_from_bold
+
+
+class TestXMLExtractor(unittest.TestCase):
+
+    def test_same_items_as_legacy_parser(self):
+        root = ET.fromstring(make_specimen_xml(20))
+        for record in root.findall('record'):
+            self.assertEqual(legacy_parse_record(record), api._RECORD_EXTRACTOR(record))
+
+    @unittest.skipUnless(RUN_BENCHMARKS, 'set BOLD_BENCHMARKS to run benchmarks')
+    def test_benchmark_100k_records(self):
+        number_of_records = 100000
+        records = ET.fromstring(make_specimen_xml(number_of_records)).findall('record')
+
+        start = time.time()
+        for record in records:
+            legacy_parse_record(record)
+        legacy = time.time() - start
+
+        start = time.time()
+        for record in records:
+            api._RECORD_EXTRACTOR(record)
+        compiled = time.time() - start
+
+        print('\n_parse_xml per record: legacy %.2f us, compiled %.2f us (%.1fx)' % (
+            legacy / number_of_records * 1e6, compiled / number_of_records * 1e6,
+            legacy / compiled))
+        self.assertTrue(compiled < legacy)
+
+
+class TestJSONParser(unittest.TestCase):
+
+    def test_same_items_as_legacy_parser(self):
+        res = api.Response()
+        for document in JSON_DOCUMENTS:
+            res._parse_json(document)
+            self.assertEqual(legacy_parse_json(document), res.items)
+
+    @unittest.skipUnless(RUN_BENCHMARKS, 'set BOLD_BENCHMARKS to run benchmarks')
+    def test_benchmark_100k_taxa(self):
+        number_of_taxa = 100000
+        document = make_taxon_search_json(number_of_taxa)
+        res = api.Response()
+
+        def best_of_three(function):
+            times = []
+            for i in range(3):
+                gc.collect()
+                start = time.time()
+                function()
+                times.append(time.time() - start)
+            return min(times)
+
+        def stream():
+            res._parse_stream('call_taxon_search', io.BytesIO(document.encode('utf-8')))
+            for item in res.items:
+                pass
+
+        legacy = best_of_three(lambda: legacy_parse_json(document))
+        table = best_of_three(lambda: res._parse_json(document))
+        streamed = best_of_three(stream)
+
+        print('\n_parse_json 100k taxa: legacy %.3f s, table %.3f s (%.1fx), streamed %.3f s' % (
+            legacy, table, legacy / table, streamed))
+        self.assertTrue(table < legacy)
+
+
+def peak_memory(function):
+    """Runs `function` and returns its result, the memory it still holds and
+    the highest memory it allocated.
+
+    """
+    import tracemalloc
+    gc.collect()
+    tracemalloc.start()
+    try:
+        result = function()
+        current, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return result, current, peak
+
+
+class TestCompactRecords(unittest.TestCase):
+
+    @unittest.skipUnless(RUN_BENCHMARKS, 'set BOLD_BENCHMARKS to run benchmarks')
+    def test_benchmark_memory_100k_records(self):
+        number_of_records = 100000
+        items = [api._RECORD_EXTRACTOR(record) for record in
+                 ET.fromstring(make_specimen_xml(number_of_records)).findall('record')]
+
+        dicts, dicts_size, peak = peak_memory(lambda: [dict(item) for item in items])
+        records, records_size, peak = peak_memory(
+            lambda: [api.SpecimenRecord.from_dict(item) for item in items])
+
+        print('\nmemory per record: dict %d bytes, SpecimenRecord %d bytes (%.1fx)' % (
+            dicts_size / number_of_records, records_size / number_of_records,
+            float(dicts_size) / records_size))
+        self.assertTrue(records_size < dicts_size)
+
+
+def percentile(values, q):
+    """Nearest-rank percentile of `values`, with `q` between 0 and 100."""
+    values = sorted(values)
+    index = max(0, int(round(q / 100.0 * len(values))) - 1)
+    return values[index]
+
+
+class BenchmarkServer(object):
+    """Points every ``call_*`` URL at a local stub answering with `payloads`.
+
+    Args:
+        payloads: Dictionary of service to body, as bytes or as a callable
+                  returning an iterable of bytes for each request.
+        latency: Seconds to wait before each answer.
+        bandwidth: Optional limit in bytes per second.
+        compression: Optional ``gzip`` or ``deflate`` encoding of the answers.
+
+    """
+    def __init__(self, payloads, latency=0, bandwidth=None, compression=None):
+        routes = dict()
+        for service, body in payloads.items():
+            if callable(body):
+                route = (lambda body: lambda handler: (200, {}, body()))(body)
+            else:
+                route = (200, {}, body)
+            routes[urlsplit(api._URLS[service]).path] = route
+        self.payloads = payloads
+        self.server = StubServer(routes, latency=latency, bandwidth=bandwidth,
+                                 compression=compression)
+
+    def __enter__(self):
+        self.server.start()
+        self.urls = api._URLS.copy()
+        for service in self.payloads:
+            api._URLS[service] = self.server.url + urlsplit(api._URLS[service]).path
+        # Measure BOLD's own pace, not the rate limits of the client
+        self.scheduler = scheduler.get_default_scheduler()
+        rates = dict((endpoint, (1e9, 1e9)) for endpoint in scheduler.DEFAULT_RATES)
+        scheduler.set_default_scheduler(scheduler.Scheduler(rates=rates, retries=0))
+        return self.server
+
+    def __exit__(self, *exc_info):
+        api._URLS.update(self.urls)
+        scheduler.set_default_scheduler(self.scheduler)
+        self.server.stop()
+
+
+def run_benchmark(name, function, repeat=1, workers=1):
+    """Calls `function` `repeat` times and prints timings and memory.
+
+    Args:
+        name: Label of the benchmark.
+        function: Callable doing one call to BOLD, returning the number of
+                  records it got.
+        repeat: Number of timed calls.
+        workers: Number of threads sharing the calls.
+
+    Returns:
+        Dictionary with the latency percentiles in seconds, the records per
+        second and the peak memory in bytes of one extra, traced call.
+
+    """
+    latencies = []
+    counts = []
+    lock = threading.Lock()
+    calls = list(range(repeat))
+
+    def work():
+        while True:
+            with lock:
+                if not calls:
+                    return
+                calls.pop()
+            start = time.time()
+            count = function()
+            elapsed = time.time() - start
+            with lock:
+                latencies.append(elapsed)
+                counts.append(count)
+
+    gc.collect()
+    start = time.time()
+    threads = [threading.Thread(target=work) for i in range(workers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    total = time.time() - start
+
+    try:
+        peak = peak_memory(function)[2]
+    except ImportError:
+        peak = None
+
+    result = {
+        'p50': percentile(latencies, 50),
+        'p95': percentile(latencies, 95),
+        'p99': percentile(latencies, 99),
+        'records_per_second': sum(counts) / total,
+        'calls_per_second': repeat / total,
+        'peak_memory': peak,
+    }
+    print('\n%-40s p50 %8.1f ms  p95 %8.1f ms  p99 %8.1f ms  %10.0f records/s  '
+          '%7.1f calls/s  peak %s' % (
+              name, result['p50'] * 1e3, result['p95'] * 1e3, result['p99'] * 1e3,
+              result['records_per_second'], result['calls_per_second'],
+              '%.1f MB' % (peak / 1e6) if peak is not None else 'n/a'))
+    return result
+
+
+def count_items(response):
+    return len(response.items)
+
+
+def consume_items(response):
+    return sum(1 for item in response.items)
+
+
+class TestBenchmarkHarness(unittest.TestCase):
+    """Runs every service benchmark once at a tiny scale."""
+
+    def setUp(self):
+        warnings.simplefilter('ignore', BiopythonWarning)
+
+    def test_services(self):
+        payloads = {
+            'call_id': make_id_engine_xml(5).encode('utf-8'),
+            'call_taxon_search': TAXON_SEARCH_JSON,
+            'call_full_data': lambda: iter_specimen_xml(10, chunk_size=3),
+            'call_sequence_data': make_fasta(10).encode('utf-8'),
+            'call_specimen_data': make_tsv(10).encode('utf-8'),
+        }
+        with BenchmarkServer(payloads) as server:
+            self.assertEqual(5, len(bold.call_id('ACGT', db='COX1').items))
+            self.assertEqual(302603, bold.call_taxon_search('Euptychia ordinata').items[0]['tax_id'])
+            self.assertEqual(10, len(bold.call_full_data(geo='Peru').items))
+            self.assertEqual(10, consume_items(bold.call_full_data(geo='Peru', stream=True)))
+            self.assertEqual(10, len(bold.call_sequence_data(geo='Peru').items))
+            self.assertEqual(10, len(bold.call_specimen_data(geo='Peru', columnar=True).items))
+            self.assertEqual(6, server.requests)
+
+    def test_latency_and_bandwidth(self):
+        payloads = {'call_sequence_data': make_fasta(50).encode('utf-8')}
+        with BenchmarkServer(payloads, latency=0.05, bandwidth=len(payloads['call_sequence_data']) * 5):
+            start = time.time()
+            bold.call_sequence_data(geo='Peru')
+            # 50 ms of latency and 200 ms of transfer
+            self.assertTrue(time.time() - start >= 0.25)
+
+
+@unittest.skipUnless(RUN_BENCHMARKS, 'set BOLD_BENCHMARKS to run benchmarks')
+class TestServiceBenchmarks(unittest.TestCase):
+
+    def setUp(self):
+        warnings.simplefilter('ignore', BiopythonWarning)
+
+    def test_call_id(self):
+        payloads = {'call_id': make_id_engine_xml(100).encode('utf-8')}
+        with BenchmarkServer(payloads, LATENCY, BANDWIDTH):
+            run_benchmark('call_id', lambda: count_items(bold.call_id(NUCLEOTIDES, db='COX1')),
+                          repeat=200, workers=8)
+
+    def test_call_id_many_duplicates(self):
+        # An amplicon run: 2000 reads of 100 distinct sequences
+        reads = [NUCLEOTIDES + ''.join(['ACGT'[(i >> shift) & 3] for shift in (0, 2, 4, 6)])
+                 for i in range(100)] * 20
+        payloads = {'call_id': make_id_engine_xml(25).encode('utf-8')}
+        for deduplicate in (False, True):
+            with BenchmarkServer(payloads, LATENCY, BANDWIDTH) as server:
+                stats = dict()
+                start = time.time()
+                for input_id, res in bold.call_id_many(reads, db='COX1', workers=8,
+                                                       deduplicate=deduplicate, stats=stats):
+                    self.assertFalse(isinstance(res, Exception))
+                print('\n%-40s %8.2f s  %d requests' % (
+                    'call_id_many 2000 reads deduplicate=%s' % deduplicate,
+                    time.time() - start, server.requests))
+
+    def test_call_taxon_search(self):
+        payloads = {'call_taxon_search': TAXON_SEARCH_JSON, 'call_taxon_data': TAXON_DATA_JSON}
+        with BenchmarkServer(payloads, LATENCY, BANDWIDTH):
+            run_benchmark('call_taxon_search',
+                          lambda: count_items(bold.call_taxon_search('Euptychia ordinata')),
+                          repeat=200, workers=8)
+            run_benchmark('call_taxon_data',
+                          lambda: count_items(bold.call_taxon_data(891, data_type='basic')),
+                          repeat=200, workers=8)
+
+    def test_concurrent_identical_calls(self):
+        # A web service asking for the same taxon from many threads
+        payloads = {'call_taxon_data': TAXON_DATA_JSON}
+        with BenchmarkServer(payloads, max(LATENCY, 0.05), BANDWIDTH) as server:
+            run_benchmark('call_taxon_data x32 identical',
+                          lambda: count_items(bold.call_taxon_data(891, data_type='basic')),
+                          repeat=640, workers=32)
+            print('%d requests for 640 calls' % server.requests)
+
+    def test_call_full_data_xml(self):
+        for scale in SCALES:
+            payloads = {'call_full_data': lambda: iter_specimen_xml(scale)}
+            repeat = max(1, min(20, 100000 // scale))
+            with BenchmarkServer(payloads, LATENCY, BANDWIDTH):
+                if scale <= 100000:
+                    run_benchmark('call_full_data xml %d' % scale,
+                                  lambda: count_items(bold.call_full_data(geo='Peru')),
+                                  repeat=repeat)
+                run_benchmark('call_full_data xml stream %d' % scale,
+                              lambda: consume_items(bold.call_full_data(geo='Peru', stream=True,
+                                                                        compact=True)),
+                              repeat=repeat)
+
+    def test_call_sequence_data_fasta(self):
+        payloads = {'call_sequence_data': make_fasta(100000).encode('utf-8')}
+        with BenchmarkServer(payloads, LATENCY, BANDWIDTH):
+            run_benchmark('call_sequence_data fasta 100000',
+                          lambda: count_items(bold.call_sequence_data(geo='Peru')))
+            run_benchmark('call_sequence_data fasta stream 100000',
+                          lambda: consume_items(bold.call_sequence_data(geo='Peru', stream=True)))
+
+    def test_call_specimen_data_tsv(self):
+        payloads = {'call_specimen_data': make_tsv(100000).encode('utf-8')}
+        with BenchmarkServer(payloads, LATENCY, BANDWIDTH):
+            run_benchmark('call_specimen_data tsv 100000',
+                          lambda: count_items(bold.call_specimen_data(geo='Peru', columnar=True)))
+
+    def test_call_trace_files_tar(self):
+        payloads = {'call_trace_files': make_trace_archive(50)}
+        directory = tempfile.mkdtemp()
+        destination = os.path.join(directory, 'traces.tar')
+        try:
+            def save():
+                bold.call_trace_files(geo='Peru', stream=True).save(destination)
+                return 1
+
+            with BenchmarkServer(payloads, LATENCY, BANDWIDTH):
+                run_benchmark('call_trace_files save 50MB', save, repeat=5)
+                run_benchmark('call_trace_files iter_traces 50MB',
+                              lambda: sum(1 for trace in bold.call_trace_files(
+                                  geo='Peru', stream=True).iter_traces()), repeat=5)
+        finally:
+            shutil.rmtree(directory)
+
+    def test_compression(self):
+        # Compression pays off once the link, not the parser, is the bottleneck
+        payloads = {'call_full_data': lambda: iter_specimen_xml(10000)}
+        bandwidth = BANDWIDTH or 2e6
+        for compression in (None, 'gzip'):
+            with BenchmarkServer(payloads, LATENCY, bandwidth, compression) as server:
+                run_benchmark('call_full_data xml 10000 %s' % (compression or 'uncompressed'),
+                              lambda: consume_items(bold.call_full_data(geo='Peru', stream=True,
+                                                                        compact=True)),
+                              repeat=3)
+                print('%.2f MB sent per call' % (server.bytes_sent / 1e6 / server.requests))
+
+
+def run_python(code):
+    """Runs `code` in a fresh interpreter and returns what it printed."""
+    output = subprocess.check_output([sys.executable, '-c', code],
+                                     cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    return output.decode('utf-8').strip()
+
+
+class TestImport(unittest.TestCase):
+
+    @unittest.skipIf(sys.version_info < (3, 7), 'needs module level __getattr__')
+    def test_import_is_lazy(self):
+        output = run_python(
+            'import logging, sys, bold\n'
+            'print(sorted(name for name in ("bold.api", "Bio.SeqIO") if name in sys.modules))\n'
+            'print(len(logging.getLogger().handlers))\n'
+            'bold.call_taxon_search\n'
+            'print("bold.api" in sys.modules and "Bio.SeqIO" not in sys.modules)\n'
+            'print("sqlite3" in sys.modules, bold.utils.__name__)')
+        self.assertEqual(['[]', '0', 'True', 'False bold.utils'], output.splitlines())
+
+    @unittest.skipUnless(RUN_BENCHMARKS, 'set BOLD_BENCHMARKS to run benchmarks')
+    def test_benchmark_import_time(self):
+        for statement in ['import bold', 'import bold.api', 'from bold import call_id']:
+            times = []
+            for i in range(5):
+                times.append(float(run_python(
+                    'import time\nstart = time.time()\n%s\nprint(time.time() - start)' % statement)))
+            print('\n%-40s %8.1f ms' % (statement, min(times) * 1e3))
+
+
+class TestTaxonomyIndexBenchmark(unittest.TestCase):
+
+    @unittest.skipUnless(RUN_BENCHMARKS, 'set BOLD_BENCHMARKS to run benchmarks')
+    def test_benchmark_100k_lineages(self):
+        # kingdom > 10 phyla > 100 classes > 1000 orders > 10k families > 100k species
+        index = TaxonomyIndex()
+        items = [{'tax_id': 1, 'taxon': 'Animalia', 'tax_rank': 'kingdom'}]
+        ranks = ['phylum', 'class', 'order', 'family', 'species']
+        tax_id = 1
+        parents = [1]
+        for rank in ranks:
+            children = []
+            for parent in parents:
+                for i in range(10):
+                    tax_id += 1
+                    items.append({'tax_id': tax_id, 'parent_id': parent, 'tax_rank': rank,
+                                  'taxon': '%s %d' % (rank, tax_id)})
+                    children.append(tax_id)
+            parents = children
+
+        start = time.time()
+        index.add_items(items)
+        ingest = time.time() - start
+
+        start = time.time()
+        lineages = index.lineages(parents)
+        bulk = time.time() - start
+
+        start = time.time()
+        for species in parents:
+            index.lineage(species)
+        single = time.time() - start
+
+        start = time.time()
+        for i in range(0, len(parents) - 1):
+            index.lowest_common_ancestor(parents[i], parents[i + 1])
+        lca = time.time() - start
+
+        print('\ntaxonomy index, %d species: ingest %.2f s, lineages %.2f s, lineage x%d %.2f s, '
+              'lowest_common_ancestor x%d %.2f s' % (
+                  len(parents), ingest, bulk, len(parents), single, len(parents) - 1, lca))
+        self.assertEqual(6, len(lineages[parents[0]]))
+        self.assertTrue(bulk < 10)
+
+
+def make_barcodes(genera, species, specimens, length=650):
+    """Synthetic COI library: genera differ at random, species of a genus in
+    15% of the bases and specimens of a species in 1%.
+
+    """
+    from Bio.Seq import Seq
+    from Bio.SeqRecord import SeqRecord
+
+    def mutate(seq, rate):
+        return ''.join([random.choice('ACGT') if random.random() < rate else base
+                        for base in seq])
+
+    rng_state = random.getstate()
+    random.seed(0)
+    seq_records = []
+    for g in range(genera):
+        genus = mutate('A' * length, 1)
+        for s in range(species):
+            species_seq = mutate(genus, 0.15)
+            for i in range(specimens):
+                description = 'SYNTH%d-14|Genus%d species%d|COI-5P|' % (len(seq_records), g, s)
+                seq_records.append(SeqRecord(Seq(mutate(species_seq, 0.01)),
+                                             id=description.split('|')[0],
+                                             description=description))
+    random.setstate(rng_state)
+    return seq_records
+
+
+class TestKmerIndexBenchmark(unittest.TestCase):
+
+    @unittest.skipUnless(RUN_BENCHMARKS, 'set BOLD_BENCHMARKS to run benchmarks')
+    def test_benchmark_20k_barcodes(self):
+        seq_records = make_barcodes(50, 20, 20)
+        directory = tempfile.mkdtemp()
+        try:
+            path = os.path.join(directory, 'barcodes.kmer')
+            start = time.time()
+            index = KmerIndex()
+            index.add(seq_records)
+            index.save(path)
+            build = time.time() - start
+
+            start = time.time()
+            index = KmerIndex(path)
+            opening = time.time() - start
+
+            queries = [str(seq_record.seq) for seq_record in seq_records[::100]]
+            latencies = []
+            for seq in queries:
+                start = time.time()
+                items = index.search(seq)
+                latencies.append(time.time() - start)
+            index.close()
+        finally:
+            shutil.rmtree(directory)
+        print('\nk-mer index, %d barcodes: build %.1f s, open %.1f ms, search p50 %.1f ms '
+              'p95 %.1f ms' % (len(seq_records), build, opening * 1e3,
+                               percentile(latencies, 50) * 1e3, percentile(latencies, 95) * 1e3))
+        self.assertEqual(1.0, items[0]['similarity'])
+
+
+class TestSequenceStoreBenchmark(unittest.TestCase):
+
+    @unittest.skipUnless(RUN_BENCHMARKS, 'set BOLD_BENCHMARKS to run benchmarks')
+    def test_benchmark_100k_barcodes(self):
+        from Bio import SeqIO
+
+        fasta = make_fasta(100000)
+        seq_records, held, peak = peak_memory(lambda: list(SeqIO.parse(io.StringIO(fasta), 'fasta')))
+        directory = tempfile.mkdtemp()
+        try:
+            store = SequenceStore(directory)
+            start = time.time()
+            store.add(seq_records)
+            add = time.time() - start
+            store.close()
+            size = os.path.getsize(os.path.join(directory, 'sequences.2bit'))
+
+            start = time.time()
+            store = SequenceStore(directory)
+            opening = time.time() - start
+            ids = [seq_record.id.split('|')[0] for seq_record in seq_records[::10]]
+            start = time.time()
+            for seq_id in ids:
+                store.sequence(seq_id)
+            lookup = (time.time() - start) / len(ids)
+            store.close()
+        finally:
+            shutil.rmtree(directory)
+        print('\nsequence store, 100000 barcodes: SeqRecords %.1f MB, packed %.1f MB, '
+              'add %.1f s, open %.1f ms, sequence() %.0f us' % (
+                  held / 1e6, size / 1e6, add, opening * 1e3, lookup * 1e6))
+        self.assertTrue(size * 4 < held)
+
+
+def prepare_one_by_one(seq_records):
+    """Same results as ``utils.prepare_sequences``, one sequence at a time."""
+    iupac = set(utils.NUCLEOTIDES + utils.AMBIGUITY_CODES)
+    prepared = []
+    for position, seq_record in enumerate(seq_records):
+        seq = utils._prepare_sequence(seq_record)
+        ambiguous = sum(1 for base in seq if base in utils.AMBIGUITY_CODES)
+        invalid = sorted(set(seq) - iupac)
+        valid = len(seq) > 0 and not invalid
+        prepared.append({
+            'id': getattr(seq_record, 'id', position),
+            'sequence': seq,
+            'length': len(seq),
+            'ambiguous': ambiguous,
+            'invalid': invalid,
+            'valid': valid,
+            'cox1_l640bp': (valid and len(seq) >= utils.COX1_L640BP_MIN_LENGTH and
+                            ambiguous <= utils.COX1_L640BP_MAX_AMBIGUITY * len(seq)),
+        })
+    return prepared
+
+
+class TestPrepareSequences(unittest.TestCase):
+
+    def setUp(self):
+        if not HAS_NUMPY:
+            self.skipTest('needs NumPy')
+        reads = ['aacattatattttattttt-ggaatttgagc', NUCLEOTIDES, 'N' * 10 + NUCLEOTIDES,
+                 NUCLEOTIDES[:300], 'ACGT XZ--']
+        self.reads = [reads[i % len(reads)] for i in range(10000)]
+
+    def test_same_items_as_one_by_one(self):
+        self.assertEqual(prepare_one_by_one(self.reads[:50]),
+                         utils.prepare_sequences(self.reads[:50]))
+
+    @unittest.skipUnless(RUN_BENCHMARKS, 'set BOLD_BENCHMARKS to run benchmarks')
+    def test_benchmark_10k_reads(self):
+        for name, function in [('one by one', prepare_one_by_one),
+                               ('prepare_sequences', utils.prepare_sequences)]:
+            times = []
+            for i in range(3):
+                start = time.time()
+                function(self.reads)
+                times.append(time.time() - start)
+            print('\n%-40s %8.1f ms' % ('%d reads %s' % (len(self.reads), name),
+                                        min(times) * 1e3))
+
+
+if __name__ == '__main__':
+    runner = unittest.TextTestRunner(verbosity=2)
+    unittest.main(testRunner=runner)
@@ -0,0 +1,149 @@
+# -*- coding: utf-8 -*-
+import io
+import shutil
+import tempfile
+import time
+import unittest
+
+import bold
+from bold import metrics
+from bold.cache import DiskCache, MemoryCache, set_cache, set_memory_cache
+from bold.taxonomy import TaxonomyIndex, set_taxonomy_index
+
+from .fixtures import TAXON_SEARCH_JSON
+from .stub_server import StubServerTestCase
+
+
+TAR_CONTENTS = b'\x00\x01binary trace files\xff' * 100
+
+
+class TestDiskCache(StubServerTestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.server = self.start_server({
+            '/TaxonData': (200, {}, TAXON_SEARCH_JSON),
+            '/trace': (200, {}, TAR_CONTENTS),
+        }, {'call_taxon_data': '/TaxonData', 'call_trace_files': '/trace'})
+
+    def test_repeated_calls_are_served_locally(self):
+        cache = DiskCache(self.directory)
+        set_cache(cache)
+        for i in range(3):
+            res = bold.call_taxon_data(302603)
+            self.assertEqual(7044, res.items[0]['parent_id'])
+        self.assertEqual(1, self.server.requests)
+        self.assertEqual({'hits': 2, 'misses': 1, 'entries': 1, 'bytes': len(TAXON_SEARCH_JSON)},
+                         cache.stats())
+
+    def test_binary_payload(self):
+        set_cache(DiskCache(self.directory))
+        bold.call_trace_files(taxon='Euptychia mollis')
+        res = bold.call_trace_files(taxon='Euptychia mollis')
+        self.assertEqual(TAR_CONTENTS, res.file_contents)
+        self.assertEqual(1, self.server.requests)
+
+    def test_ttl_per_service(self):
+        set_cache(DiskCache(self.directory, ttl=None, ttls={'call_taxon_data': 0.05}))
+        bold.call_taxon_data(302603)
+        time.sleep(0.1)
+        bold.call_taxon_data(302603)
+        self.assertEqual(2, self.server.requests)
+
+    def test_key_ignores_parameter_order(self):
+        self.assertEqual(DiskCache.make_key('call_taxon_data', 'taxId=1&dataTypes=basic'),
+                         DiskCache.make_key('call_taxon_data', 'dataTypes=basic&taxId=1'))
+
+    def test_lru_eviction(self):
+        cache = DiskCache(self.directory, max_bytes=25)
+        cache.put('call_id', 'a', b'0123456789')
+        cache.put('call_id', 'b', b'0123456789')
+        cache.get('call_id', 'a').close()
+        cache.put('call_id', 'c', b'0123456789')
+        self.assertEqual(None, cache.get('call_id', 'b'))
+        self.assertEqual(b'0123456789', cache.get('call_id', 'a').read())
+        self.assertEqual(20, cache.stats()['bytes'])
+
+    def test_incomplete_response_is_not_stored(self):
+        cache = DiskCache(self.directory)
+        handle = cache.wrap('call_id', 'a', io.BytesIO(b'0123456789'))
+        handle.read(5)
+        handle.close()
+        self.assertEqual(None, cache.get('call_id', 'a'))
+
+    def tearDown(self):
+        set_cache(None)
+        shutil.rmtree(self.directory)
+
+
+class TestMemoryCache(StubServerTestCase):
+
+    def setUp(self):
+        self.server = self.start_server({
+            '/TaxonSearch': (200, {}, TAXON_SEARCH_JSON),
+            '/TaxonData': (200, {}, TAXON_SEARCH_JSON),
+        }, {'call_taxon_search': '/TaxonSearch', 'call_taxon_data': '/TaxonData'})
+
+    def test_repeated_lookups_skip_http(self):
+        cache = MemoryCache()
+        set_memory_cache(cache)
+        for i in range(3):
+            res = bold.call_taxon_search('Euptychia ordinata')
+            self.assertEqual(302603, res.items[0]['tax_id'])
+            res = bold.call_taxon_data(302603)
+            self.assertEqual(7044, res.items[0]['parent_id'])
+        self.assertEqual(2, self.server.requests)
+        self.assertEqual({'hits': 4, 'misses': 2, 'entries': 2, 'capacity': 1000},
+                         cache.stats())
+
+    def test_hits_are_complete_responses(self):
+        set_memory_cache(MemoryCache())
+        index = TaxonomyIndex()
+        metrics.get_metrics().reset()
+        bold.call_taxon_search('Euptychia ordinata')
+        set_taxonomy_index(index)
+        try:
+            res = bold.call_taxon_search('Euptychia ordinata')
+        finally:
+            set_taxonomy_index(None)
+        self.assertEqual(1, self.server.requests)
+        self.assertEqual('call_taxon_search', res.method)
+        self.assertEqual(1, res.record_count)
+        self.assertTrue('total' in res.timings)
+        self.assertEqual(2, metrics.get_metrics().summary()['call_taxon_search']['count'])
+        self.assertEqual('Euptychia ordinata', index.taxon(302603))
+
+    def test_items_are_copies(self):
+        set_memory_cache(MemoryCache())
+        bold.call_taxon_data(302603).items[0]['parent_id'] = None
+        self.assertEqual(7044, bold.call_taxon_data(302603).items[0]['parent_id'])
+
+    def test_invalidate(self):
+        cache = MemoryCache()
+        set_memory_cache(cache)
+        bold.call_taxon_data(302603)
+        bold.call_taxon_data(7044)
+        bold.call_taxon_search('Euptychia ordinata')
+        cache.invalidate('call_taxon_data', tax_id=302603)
+        self.assertEqual(2, cache.stats()['entries'])
+        bold.call_taxon_data(302603)
+        self.assertEqual(4, self.server.requests)
+        cache.invalidate()
+        self.assertEqual(0, cache.stats()['entries'])
+
+    def test_capacity(self):
+        cache = MemoryCache(capacity=2)
+        cache.put('a', [1])
+        cache.put('b', [2])
+        cache.get('a')
+        cache.put('c', [3])
+        self.assertEqual(None, cache.get('b'))
+        self.assertEqual([1], cache.get('a'))
+
+    def tearDown(self):
+        set_memory_cache(None)
+
+
+if __name__ == '__main__':
+    runner = unittest.TextTestRunner(verbosity=2)
+    unittest.main(testRunner=runner)
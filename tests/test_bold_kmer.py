@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+import os
+import shutil
+import tempfile
+import unittest
+import warnings
+
+from Bio import BiopythonWarning
+from Bio.Seq import Seq
+from Bio.SeqRecord import SeqRecord
+
+import bold
+from bold.kmer import KmerIndex
+
+from .fixtures import make_id_engine_xml
+from .stub_server import StubServerTestCase
+
+
+FASTA = (
+    '>SYNTH1-14|Euptychia ordinata|COI-5P|KF000001\n'
+    'AACATTATATTTTATTTTTGGAATTTGAGCAGGAATAGTAGGAACTTCTCTCAGTTTAATTATTCGAATAGAATTAGG\n'
+    '>SYNTH2-14|Euptychia mollis|COI-5P|KF000002\n'
+    'TTTTTGGTATTTGAGCAGGAATAGTAGGAACTTCTCTCAGTTTAATTATTCGAATAGAATTAGGTAATCCAGGTTTCT\n'
+    '>SYNTH3-14|Hermeuptychia hermes|COI-5P|\n'
+    'GGTGCACCTGATATAGCTTTCCCTCGTATAAATAATATAAGATATTGACTACTTCCACCATCTTTAATATTATTAAT\n'
+)
+QUERY = 'aacattatattttattttt-GGAATTTGAGCAGGAATAGTAGGAACTTCTCTCAGTTTAATTATTCGAATAG'
+
+
+class TestKmerIndex(StubServerTestCase):
+
+    def setUp(self):
+        warnings.simplefilter('ignore', BiopythonWarning)
+        self.server = self.start_server({
+            '/sequence': (200, {}, FASTA.encode('utf-8')),
+            '/ids': (200, {}, make_id_engine_xml(3).encode('utf-8')),
+        }, {'call_sequence_data': '/sequence', 'call_id': '/ids'})
+        self.index = KmerIndex(k=8)
+        self.index.add(bold.call_sequence_data(taxon='Euptychia', stream=True).items)
+
+    def id_engine_requests(self):
+        return [path for path in self.server.paths if path.startswith('/ids')]
+
+    def test_search(self):
+        self.assertEqual(3, len(self.index))
+        items = self.index.search(QUERY)
+        self.assertEqual('SYNTH1-14', items[0]['bold_id'])
+        self.assertEqual('Euptychia ordinata', items[0]['taxonomic_identification'])
+        self.assertFalse('sequence_description' in items[0])
+        self.assertEqual(1.0, items[0]['similarity'])
+        self.assertEqual('SYNTH2-14', items[1]['bold_id'])
+        self.assertTrue(items[1]['similarity'] < 1.0)
+        self.assertEqual(1, len(self.index.search(QUERY, top=1)))
+        self.assertEqual([], self.index.search('NNNNNNNNNNNN'))
+
+    def test_add_plain_seq_records(self):
+        index = KmerIndex(k=8)
+        index.add([SeqRecord(Seq(QUERY), id='read1')])
+        items = index.search(QUERY)
+        self.assertEqual('read1', items[0]['bold_id'])
+        self.assertEqual(None, items[0]['taxonomic_identification'])
+
+    def test_save_open(self):
+        directory = tempfile.mkdtemp()
+        try:
+            path = os.path.join(directory, 'barcodes.kmer')
+            self.index.save(path)
+            index = KmerIndex(path)
+            self.assertEqual(8, index.k)
+            self.assertEqual(3, len(index))
+            self.assertEqual(self.index.search(QUERY), index.search(QUERY))
+            self.assertRaises(ValueError, index.add, [])
+            index.close()
+            self.assertRaises(ValueError, KmerIndex, __file__)
+        finally:
+            shutil.rmtree(directory)
+
+    def test_call_id(self):
+        res = self.index.call_id(QUERY)
+        self.assertEqual('call_id', res.method)
+        self.assertEqual('SYNTH1-14', res.items[0]['bold_id'])
+        self.assertEqual(0, len(self.id_engine_requests()))
+
+        res = self.index.call_id(QUERY, db='COX1', threshold=0.9)
+        self.assertEqual('Local', res.items[0]['database'])
+        res = self.index.call_id(QUERY[::-1], db='COX1', threshold=0.9)
+        self.assertEqual('Published', res.items[0]['database'])
+        self.assertEqual(1, len(self.id_engine_requests()))
+        self.assertRaises(ValueError, self.index.call_id, QUERY, threshold=0.9)
+
+
+if __name__ == '__main__':
+    runner = unittest.TextTestRunner(verbosity=2)
+    unittest.main(testRunner=runner)
@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+import unittest
+import warnings
+
+from Bio import BiopythonWarning
+
+import bold
+from bold import metrics
+from bold.session import Session
+
+from .fixtures import TAXON_SEARCH_JSON, make_specimen_xml
+from .stub_server import StubServerTestCase
+
+
+class TestMetrics(StubServerTestCase):
+
+    def setUp(self):
+        warnings.simplefilter('ignore', BiopythonWarning)
+        self.xml = make_specimen_xml(5).encode('utf-8')
+        self.server = self.start_server({
+            '/taxon': (200, {}, TAXON_SEARCH_JSON),
+            '/combined': (200, {}, self.xml),
+        }, {'call_taxon_search': '/taxon', 'call_full_data': '/combined'})
+        self.use_session(Session())
+        metrics.get_metrics().reset()
+        self.events = []
+        metrics.add_hook(self.events.append)
+
+    def test_timings(self):
+        res = bold.call_taxon_search('Euptychia ordinata')
+        self.assertEqual(['connect', 'decode', 'download', 'first_byte', 'parse', 'total'],
+                         sorted(res.timings))
+        self.assertTrue(res.timings['connect'] > 0)
+        self.assertTrue(res.timings['total'] >= res.timings['parse'])
+        self.assertEqual(len(TAXON_SEARCH_JSON), res.bytes_received)
+        self.assertEqual(1, res.record_count)
+        self.assertEqual([res], self.events)
+
+        res = bold.call_taxon_search('Euptychia ordinata')
+        # The connection was reused
+        self.assertEqual(0, res.timings['connect'])
+
+    def test_stream(self):
+        res = bold.call_full_data(geo='Peru', stream=True)
+        self.assertEqual([], self.events)
+        self.assertEqual(5, len(list(res.items)))
+        self.assertEqual([res], self.events)
+        self.assertEqual(5, res.record_count)
+        self.assertEqual(len(self.xml), res.bytes_received)
+        self.assertTrue('parse' in res.timings)
+
+    def test_summary(self):
+        for i in range(3):
+            bold.call_taxon_search('Euptychia ordinata')
+        bold.call_full_data(geo='Peru')
+        summary = metrics.get_metrics().summary()
+        self.assertEqual(3, summary['call_taxon_search']['count'])
+        self.assertEqual(3, summary['call_taxon_search']['records'])
+        self.assertEqual(3, sum(count for bound, count in summary['call_taxon_search']['histogram']))
+        self.assertEqual(len(self.xml), summary['call_full_data']['bytes'])
+        self.assertEqual(5, summary['call_full_data']['records'])
+
+    def tearDown(self):
+        metrics.remove_hook(self.events.append)
+
+
+if __name__ == '__main__':
+    runner = unittest.TextTestRunner(verbosity=2)
+    unittest.main(testRunner=runner)
@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+import io
+import pickle
+import unittest
+
+from bold import api
+from bold.record import record_class
+
+from .fixtures import make_specimen_xml
+
+
+Record = record_class('Record', ['bold_id', 'process_id', 'bin_uri', 'similarity'])
+
+
+class TestRecord(unittest.TestCase):
+
+    def test_access(self):
+        record = Record.from_dict({'similarity': '1', 'bold_id': 'GBLN3590-14'})
+        self.assertEqual('GBLN3590-14', record['bold_id'])
+        self.assertEqual('1', record.similarity)
+        self.assertEqual(None, record.get('bin_uri'))
+        self.assertRaises(KeyError, lambda: record['bin_uri'])
+        self.assertRaises(AttributeError, lambda: record.process_id)
+        self.assertEqual(['bold_id', 'similarity'], record.keys())
+        self.assertTrue('similarity' in record)
+        self.assertFalse('process_id' in record)
+        self.assertEqual(2, len(record))
+
+    def test_to_dict(self):
+        item = {'process_id': 'GBLN4477-14', 'bin_uri': ['BOLD:AAA5125', 'BOLD:AAE2777']}
+        record = Record.from_dict(item)
+        self.assertEqual(item, record.to_dict())
+        self.assertEqual(record, item)
+        self.assertEqual(record, pickle.loads(pickle.dumps(record)))
+
+    def test_unknown_field(self):
+        self.assertRaises(KeyError, Record.from_dict, {'country': 'Peru'})
+
+    def test_compact_response(self):
+        xml_string = make_specimen_xml(10)
+        res = api.Response()
+        res.method = 'call_full_data'
+        res._parse_xml(xml_string)
+        items = res.items
+
+        res.compact = True
+        res._parse_xml(xml_string)
+        self.assertTrue(isinstance(res.items[0], api.SpecimenRecord))
+        self.assertEqual(res.items[0], pickle.loads(pickle.dumps(res.items[0])))
+        self.assertEqual(items, [record.to_dict() for record in res.items])
+
+        res._parse_stream('call_full_data', io.BytesIO(xml_string.encode('utf-8')))
+        self.assertEqual(items, [record.to_dict() for record in res.items])
+
+
+if __name__ == '__main__':
+    runner = unittest.TextTestRunner(verbosity=2)
+    unittest.main(testRunner=runner)
@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+import threading
+import time
+import unittest
+
+from Bio._py3k import HTTPError
+
+import bold
+from bold import api
+from bold.scheduler import AdaptiveLimiter, Scheduler, TokenBucket
+
+from .fixtures import TAXON_SEARCH_JSON
+from .stub_server import StubServerTestCase
+
+
+class TestTokenBucket(unittest.TestCase):
+
+    def test_rate(self):
+        bucket = TokenBucket(rate=50, burst=5)
+        start = time.time()
+        for i in range(15):
+            bucket.acquire()
+        # 5 calls in the burst, then 10 calls at 50 per second
+        self.assertTrue(time.time() - start >= 0.18)
+
+
+class TestAdaptiveLimiter(unittest.TestCase):
+
+    def test_aimd(self):
+        limiter = AdaptiveLimiter(initial=4, maximum=6)
+        for i in range(40):
+            limiter.acquire()
+            limiter.release(0.1)
+        self.assertEqual(6, limiter.limit)
+
+        limiter.acquire()
+        limiter.release(0.1, error=True)
+        self.assertEqual(3, limiter.limit)
+
+        limiter.acquire()
+        limiter.release(1.0)
+        self.assertEqual(1.5, limiter.limit)
+
+    def test_limit_concurrency(self):
+        limiter = AdaptiveLimiter(initial=2)
+        state = {'in_flight': 0, 'max_in_flight': 0}
+        lock = threading.Lock()
+
+        def work():
+            limiter.acquire()
+            with lock:
+                state['in_flight'] += 1
+                state['max_in_flight'] = max(state['max_in_flight'], state['in_flight'])
+            time.sleep(0.02)
+            with lock:
+                state['in_flight'] -= 1
+            limiter.release(0.02, error=True)
+
+        threads = [threading.Thread(target=work) for i in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(2, state['max_in_flight'])
+        self.assertEqual(1, limiter.limit)
+
+
+class TestScheduler(StubServerTestCase):
+
+    def setUp(self):
+        self.attempts = 0
+
+        def flaky(handler):
+            self.attempts += 1
+            if self.attempts < 3:
+                return 503, {}, b'Service unavailable'
+            return 200, {'Content-Type': 'application/json'}, TAXON_SEARCH_JSON
+
+        self.server = self.start_server({
+            '/flaky': flaky,
+            '/missing': (404, {}, b'Not found'),
+        })
+
+    def test_retry(self):
+        calls = []
+
+        def function():
+            calls.append(1)
+            if len(calls) < 3:
+                raise HTTPError('http://example.com', 503, 'Service unavailable', {}, None)
+            return 'done'
+
+        s = Scheduler(retries=3, backoff=0.01)
+        self.assertEqual('done', s.run('call_id', function))
+        self.assertEqual(3, len(calls))
+        # halved twice, then increased once
+        self.assertEqual(2, s.limiters['id_engine'].limit)
+
+    def test_no_retry(self):
+        calls = []
+
+        def function():
+            calls.append(1)
+            raise ValueError('BOLD did not return any result.')
+
+        s = Scheduler(retries=3, backoff=0.01)
+        self.assertRaises(ValueError, s.run, 'call_specimen_data', function)
+        self.assertEqual(1, len(calls))
+
+    def test_call_taxon_search_retries(self):
+        self.use_scheduler(Scheduler(retries=2, backoff=0.01))
+        api._URLS['call_taxon_search'] = self.server.url + '/flaky'
+        res = bold.call_taxon_search('Euptychia ordinata')
+        self.assertEqual(302603, res.items[0]['tax_id'])
+        self.assertEqual(3, self.attempts)
+
+    def test_call_taxon_search_gives_up(self):
+        self.use_scheduler(Scheduler(retries=1, backoff=0.01))
+        api._URLS['call_taxon_search'] = self.server.url + '/flaky'
+        self.assertRaises(HTTPError, bold.call_taxon_search, 'Euptychia ordinata')
+        self.assertEqual(2, self.attempts)
+
+        api._URLS['call_taxon_search'] = self.server.url + '/missing'
+        self.assertRaises(HTTPError, bold.call_taxon_search, 'Euptychia ordinata')
+        self.assertEqual(1, len([path for path in self.server.paths if '/missing' in path]))
+
+
+if __name__ == '__main__':
+    runner = unittest.TextTestRunner(verbosity=2)
+    unittest.main(testRunner=runner)
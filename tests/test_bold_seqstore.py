@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+import os
+import shutil
+import tempfile
+import unittest
+import warnings
+
+from Bio import BiopythonWarning
+from Bio.Seq import Seq
+from Bio.SeqRecord import SeqRecord
+
+import bold
+from bold.seqstore import SequenceStore
+
+from .fixtures import NUCLEOTIDES, make_fasta
+from .stub_server import StubServerTestCase
+
+
+class TestSequenceStore(StubServerTestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.store = SequenceStore(self.directory)
+
+    def test_round_trip(self):
+        seqs = {
+            'plain': NUCLEOTIDES,
+            'odd': 'ACGTACGTA',
+            'ambiguous': 'NNNNACGTRYACGTACGGGTN',
+            'gaps': 'acgt--acgt\n',
+            'empty': '',
+        }
+        self.assertEqual(5, self.store.add([SeqRecord(Seq(seq), id=seq_id, description=seq_id)
+                                            for seq_id, seq in sorted(seqs.items())]))
+        for seq_id, seq in seqs.items():
+            self.assertEqual(seq.replace('-', '').strip().upper(), self.store.sequence(seq_id))
+        self.assertEqual(len(NUCLEOTIDES) // 4 + 3 + 6 + 2, os.path.getsize(
+            os.path.join(self.directory, 'sequences.2bit')))
+        self.assertEqual(5, len(self.store))
+        self.assertTrue('odd' in self.store)
+        self.assertEqual(sorted(seqs), self.store.ids())
+        self.assertRaises(KeyError, self.store.sequence, 'missing')
+
+    def test_readonly(self):
+        self.store.add([SeqRecord(Seq('ACGTN'), id='a')])
+        index = os.path.join(self.directory, 'index.sqlite')
+        modified = os.path.getmtime(index)
+        reader = SequenceStore(self.directory, readonly=True)
+        try:
+            self.assertEqual('ACGTN', reader.sequence('a'))
+            self.assertEqual(['a'], reader.ids())
+            self.assertRaises(ValueError, reader.add, [SeqRecord(Seq('ACGT'), id='b')])
+        finally:
+            reader.close()
+        self.assertEqual(modified, os.path.getmtime(index))
+        missing = os.path.join(self.directory, 'missing')
+        self.assertRaises(IOError, SequenceStore, missing, readonly=True)
+        self.assertFalse(os.path.exists(missing))
+
+    def test_replace_and_reopen(self):
+        self.store.add([SeqRecord(Seq('ACGT'), id='a')])
+        self.assertEqual('ACGT', self.store.sequence('a'))
+        self.store.add([SeqRecord(Seq('TTTTN'), id='a')])
+        self.assertEqual('TTTTN', self.store.sequence('a'))
+
+        # A reader sees what is appended afterwards by another writer
+        reader = SequenceStore(self.directory)
+        try:
+            self.assertEqual('TTTTN', reader.sequence('a'))
+            self.store.add([SeqRecord(Seq('GGGG'), id='b')])
+            self.assertEqual('GGGG', reader.sequence('b'))
+            self.assertEqual(2, len(reader))
+        finally:
+            reader.close()
+
+    def test_add_sequence_data(self):
+        warnings.simplefilter('ignore', BiopythonWarning)
+        self.start_server({'/sequence': (200, {}, make_fasta(20).encode('utf-8'))},
+                          {'call_sequence_data': '/sequence'})
+        self.assertEqual(20, self.store.add(
+            bold.call_sequence_data(taxon='Euptychia', stream=True).items))
+        seq_record = self.store.get('SYNTH7-14')
+        self.assertEqual(NUCLEOTIDES, str(seq_record.seq))
+        self.assertEqual('SYNTH7-14|Euptychia ordinata|COI-5P|KF000007', seq_record.description)
+
+    def tearDown(self):
+        self.store.close()
+        shutil.rmtree(self.directory)
+
+
+if __name__ == '__main__':
+    runner = unittest.TextTestRunner(verbosity=2)
+    unittest.main(testRunner=runner)
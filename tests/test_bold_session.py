@@ -0,0 +1,223 @@
+# -*- coding: utf-8 -*-
+import os
+import time
+import unittest
+import warnings
+
+from Bio import BiopythonWarning
+from Bio._py3k import HTTPError
+
+from bold import api
+from bold.session import Session
+
+from .fixtures import TAXON_SEARCH_JSON, iter_specimen_xml
+from .stub_server import StubServerTestCase
+
+
+class TestSession(StubServerTestCase):
+
+    def setUp(self):
+        self.server = self.start_server({
+            '/index.php/API_Tax/TaxonSearch': (200, {'Content-Type': 'application/json'},
+                                               TAXON_SEARCH_JSON),
+            '/moved': (301, {'Location': '/index.php/API_Tax/TaxonSearch'}, b''),
+            '/error': (500, {}, b'Internal error'),
+            '/loop': (302, {'Location': '/loop'}, b''),
+            '/nowhere': (302, {}, b''),
+        })
+
+    def test_connection_is_reused(self):
+        session = Session()
+        for i in range(10):
+            handle = session.open(self.server.url + '/index.php/API_Tax/TaxonSearch?taxName=x')
+            self.assertEqual(TAXON_SEARCH_JSON, handle.read())
+        self.assertEqual(10, self.server.requests)
+        self.assertEqual(1, self.server.connections)
+        self.assertEqual(1, session.connections_opened)
+
+    def test_request_get_uses_session(self):
+        session = Session()
+        url = self.server.url + '/index.php/API_Tax/TaxonSearch'
+        for i in range(3):
+            res = api.Request(session).get('call_taxon_search', url=url,
+                                           taxonomic_identification='Euptychia ordinata',
+                                           fuzzy=False)
+            self.assertEqual(302603, res.items[0]['tax_id'])
+        self.assertEqual(1, self.server.connections)
+
+    def test_pool_size(self):
+        session = Session(pool_size=1)
+        url = self.server.url + '/index.php/API_Tax/TaxonSearch'
+        handles = [session.open(url), session.open(url)]
+        for handle in handles:
+            handle.read()
+        self.assertEqual(2, session.connections_opened)
+        session.open(url).read()
+        session.open(url).read()
+        self.assertEqual(2, session.connections_opened)
+
+    def test_idle_timeout(self):
+        session = Session(idle_timeout=0.05)
+        url = self.server.url + '/index.php/API_Tax/TaxonSearch'
+        session.open(url).read()
+        time.sleep(0.1)
+        session.open(url).read()
+        self.assertEqual(2, self.server.connections)
+
+    def test_unread_response_is_not_reused(self):
+        session = Session()
+        url = self.server.url + '/index.php/API_Tax/TaxonSearch'
+        session.open(url).close()
+        session.open(url).read()
+        self.assertEqual(2, session.connections_opened)
+
+    def test_readline(self):
+        session = Session()
+        handle = session.open(self.server.url + '/index.php/API_Tax/TaxonSearch')
+        self.assertEqual([TAXON_SEARCH_JSON], list(handle))
+
+    def test_redirect(self):
+        session = Session()
+        handle = session.open(self.server.url + '/moved')
+        self.assertEqual(TAXON_SEARCH_JSON, handle.read())
+        self.assertEqual(1, self.server.connections)
+
+    def test_http_error(self):
+        session = Session()
+        for i in range(3):
+            try:
+                session.open(self.server.url + '/error')
+                self.fail('HTTPError not raised')
+            except HTTPError as e:
+                self.assertEqual(500, e.code)
+                self.assertEqual(b'Internal error', e.read())
+        # The connection went back to the pool after each error
+        self.assertEqual(1, self.server.connections)
+
+    def test_too_many_redirects(self):
+        session = Session()
+        for path in ('/loop', '/nowhere'):
+            try:
+                session.open(self.server.url + path)
+                self.fail('HTTPError not raised')
+            except HTTPError as e:
+                self.assertEqual(302, e.code)
+
+    def test_host_pool_sizes(self):
+        session = Session(pool_size=1, host_pool_sizes={'127.0.0.1': 3})
+        url = self.server.url + '/index.php/API_Tax/TaxonSearch'
+        for i in range(2):
+            handles = [session.open(url) for j in range(3)]
+            for handle in handles:
+                handle.read()
+        self.assertEqual(3, session.connections_opened)
+        self.assertRaises(ValueError, Session, host_pool_sizes={'127.0.0.1': 0})
+
+
+class TestProxy(StubServerTestCase):
+
+    def setUp(self):
+        self.environ = dict(os.environ)
+        for name in list(os.environ):
+            if name.lower().endswith('_proxy'):
+                del os.environ[name]
+        self.server = self.start_server({
+            '/index.php/API_Tax/TaxonSearch': (200, {}, TAXON_SEARCH_JSON),
+        })
+
+    def test_http_proxy(self):
+        os.environ['http_proxy'] = self.server.url
+        session = Session()
+        url = 'http://bold.example/index.php/API_Tax/TaxonSearch?taxName=x'
+        for i in range(2):
+            self.assertEqual(TAXON_SEARCH_JSON, session.open(url).read())
+        self.assertEqual([url, url], self.server.paths)
+        self.assertEqual(1, self.server.connections)
+
+    def test_proxy_credentials(self):
+        os.environ['http_proxy'] = self.server.url.replace('//', '//user:secret@')
+        self.server.routes['/headers'] = lambda handler: (
+            200, {}, handler.headers['Proxy-Authorization'].encode('ascii'))
+        handle = Session().open('http://bold.example/headers')
+        self.assertEqual(b'Basic dXNlcjpzZWNyZXQ=', handle.read())
+
+    def test_no_proxy(self):
+        os.environ['http_proxy'] = 'http://127.0.0.1:9'
+        os.environ['no_proxy'] = '127.0.0.1'
+        handle = Session().open(self.server.url + '/index.php/API_Tax/TaxonSearch')
+        self.assertEqual(TAXON_SEARCH_JSON, handle.read())
+        self.assertEqual(['/index.php/API_Tax/TaxonSearch'], self.server.paths)
+
+    def tearDown(self):
+        os.environ.clear()
+        os.environ.update(self.environ)
+
+
+class TestCompression(StubServerTestCase):
+
+    def setUp(self):
+        self.body = TAXON_SEARCH_JSON * 500
+        self.routes = {
+            '/taxon': (200, {}, self.body),
+            '/headers': lambda handler: (
+                200, {}, handler.headers['Accept-Encoding'].encode('ascii')),
+        }
+
+    def open(self, compression, path='/taxon', session=None):
+        server = self.start_server(self.routes, compression=compression)
+        handle = (session or Session()).open(server.url + path)
+        return handle, handle.read(), server.bytes_sent
+
+    def test_uncompressed(self):
+        handle, body, bytes_sent = self.open(None)
+        self.assertEqual(self.body, body)
+        self.assertEqual(None, handle.content_encoding)
+        self.assertEqual(len(self.body), bytes_sent)
+
+    def test_gzip(self):
+        handle, body, bytes_sent = self.open('gzip')
+        self.assertEqual(self.body, body)
+        self.assertEqual('gzip', handle.content_encoding)
+        self.assertEqual(len(self.body), handle.bytes_read)
+        self.assertTrue(bytes_sent < len(self.body) // 10)
+
+    def test_deflate(self):
+        for compression in ('deflate', 'raw-deflate'):
+            handle, body, bytes_sent = self.open(compression)
+            self.assertEqual(self.body, body)
+            self.assertEqual('deflate', handle.content_encoding)
+
+    def test_small_reads(self):
+        server = self.start_server(self.routes, compression='gzip')
+        handle = Session().open(server.url + '/taxon')
+        chunks = []
+        while True:
+            chunk = handle.read(100)
+            if not chunk:
+                break
+            self.assertTrue(len(chunk) <= 100)
+            chunks.append(chunk)
+        self.assertEqual(self.body, b''.join(chunks))
+        handle = Session().open(server.url + '/taxon')
+        self.assertEqual(self.body, b''.join(handle))
+
+    def test_accept_encoding(self):
+        self.assertEqual(b'gzip, deflate', self.open(None, '/headers')[1])
+        self.assertEqual(b'identity', self.open(None, '/headers', Session(compress=False))[1])
+        handle, body, bytes_sent = self.open('gzip', session=Session(compress=False))
+        self.assertEqual(None, handle.content_encoding)
+        self.assertEqual(len(self.body), bytes_sent)
+
+    def test_stream_chunked(self):
+        warnings.simplefilter('ignore', BiopythonWarning)
+        self.start_server({'/combined': lambda handler: (
+            200, {}, iter_specimen_xml(50, chunk_size=7))}, {'call_full_data': '/combined'},
+            compression='gzip')
+        items = list(api.call_full_data(geo='Peru', stream=True).items)
+        self.assertEqual(50, len(items))
+        self.assertEqual(50, len(api.call_full_data(geo='Peru').items))
+
+
+if __name__ == '__main__':
+    runner = unittest.TextTestRunner(verbosity=2)
+    unittest.main(testRunner=runner)
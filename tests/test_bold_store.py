@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+import unittest
+import warnings
+
+try:
+    from urllib.parse import parse_qs, urlsplit
+except ImportError:
+    from urlparse import parse_qs, urlsplit
+
+from Bio import BiopythonWarning
+
+from bold.store import SpecimenStore
+
+from .fixtures import SPECIMEN_RECORD
+from .stub_server import StubServerTestCase
+
+
+class TestSpecimenStore(StubServerTestCase):
+
+    def setUp(self):
+        warnings.simplefilter('ignore', BiopythonWarning)
+        self.countries = dict(('SYNTH%d-14' % i, 'Peru') for i in range(5))
+        self.unavailable = set()
+        self.server = self.start_server({
+            '/specimen': self.specimen_tsv,
+            '/combined': self.full_data_xml,
+        }, {'call_specimen_data': '/specimen', 'call_full_data': '/combined'})
+        self.store = SpecimenStore(':memory:')
+
+    def specimen_tsv(self, handler):
+        lines = ['processid\trecordID\tcountry']
+        for i, process_id in enumerate(sorted(self.countries)):
+            lines.append('%s\t%d\t%s' % (process_id, i, self.countries[process_id]))
+        return 200, {}, ('\n'.join(lines) + '\n').encode('utf-8')
+
+    def full_data_xml(self, handler):
+        ids = parse_qs(urlsplit(handler.path).query)['ids'][0].split('|')
+        records = []
+        for process_id in ids:
+            if process_id in self.unavailable:
+                continue
+            i = int(process_id[5:-3])
+            record = SPECIMEN_RECORD % {'i': i}
+            records.append(record.replace('<country>Peru</country>',
+                                          '<country>%s</country>' % self.countries[process_id]))
+        if not records:
+            return 200, {}, b''
+        return 200, {}, ('<?xml version="1.0" encoding="UTF-8"?><bold_records>' +
+                         ''.join(records) + '</bold_records>').encode('utf-8')
+
+    def full_data_requests(self):
+        return [path for path in self.server.paths if path.startswith('/combined')]
+
+    def test_sync(self):
+        counts = self.store.sync(container='SYNTH', batch_size=2)
+        self.assertEqual({'listed': 5, 'new': 5, 'changed': 0, 'unchanged': 0, 'missing': 0},
+                         counts)
+        self.assertEqual(3, len(self.full_data_requests()))
+        self.assertEqual(5, len(self.store))
+
+        counts = self.store.sync(container='SYNTH')
+        self.assertEqual({'listed': 5, 'new': 0, 'changed': 0, 'unchanged': 5, 'missing': 0},
+                         counts)
+        self.assertEqual(3, len(self.full_data_requests()))
+
+        self.countries['SYNTH3-14'] = 'Bolivia'
+        self.countries['SYNTH9-14'] = 'Peru'
+        counts = self.store.sync(container='SYNTH')
+        self.assertEqual({'listed': 6, 'new': 1, 'changed': 1, 'unchanged': 4, 'missing': 0},
+                         counts)
+        self.assertTrue('ids=SYNTH3-14%7CSYNTH9-14' in self.full_data_requests()[-1])
+        self.assertEqual('Bolivia', self.store.get('SYNTH3-14')['collection_event_country'])
+
+    def test_sync_missing(self):
+        # the second batch comes back empty and the third one incomplete
+        self.unavailable.update(['SYNTH2-14', 'SYNTH3-14', 'SYNTH4-14'])
+        counts = self.store.sync(batch_size=2)
+        self.assertEqual({'listed': 5, 'new': 2, 'changed': 0, 'unchanged': 0, 'missing': 3},
+                         counts)
+        self.assertEqual(3, len(self.full_data_requests()))
+
+        counts = self.store.sync(batch_size=2)
+        self.assertEqual({'listed': 5, 'new': 0, 'changed': 0, 'unchanged': 2, 'missing': 3},
+                         counts)
+        self.assertEqual(3, len(self.full_data_requests()))
+
+        self.unavailable.remove('SYNTH4-14')
+        self.countries['SYNTH4-14'] = 'Bolivia'
+        counts = self.store.sync(batch_size=2)
+        self.assertEqual({'listed': 5, 'new': 1, 'changed': 0, 'unchanged': 2, 'missing': 2},
+                         counts)
+        self.assertTrue('ids=SYNTH4-14' in self.full_data_requests()[-1])
+        self.assertEqual('Bolivia', self.store.get('SYNTH4-14')['collection_event_country'])
+
+    def test_query(self):
+        items = [
+            {'process_id': 'A-1', 'bin_uri': 'BOLD:AAA0001', 'collection_event_country': 'Peru',
+             'taxonomy_genus_taxon_name': 'Euptychia',
+             'collection_event_collectors': 'Carlos Pena, Jane Doe'},
+            {'process_id': 'A-2', 'bin_uri': ['BOLD:AAA0002', 'BOLD:AAA0003'],
+             'collection_event_country': 'Bolivia', 'taxonomy_genus_taxon_name': 'Euptychia'},
+            {'process_id': 'B-1', 'collection_event_country': 'Peru',
+             'taxonomy_family_taxon_name': 'Nymphalidae'},
+            {'bin_uri': 'BOLD:AAA0004'},
+        ]
+        self.assertEqual({'new': 3, 'changed': 0, 'unchanged': 0},
+                         self.store.add_items(items, container='PROJ'))
+        self.assertEqual(3, len(self.store))
+
+        def process_ids(**filters):
+            return [item['process_id'] for item in self.store.query(**filters)]
+
+        self.assertEqual(['A-1', 'A-2'], process_ids(taxon='Euptychia'))
+        self.assertEqual(['A-1', 'B-1'], process_ids(geo='Peru'))
+        self.assertEqual(['A-1'], process_ids(taxon='Euptychia', geo='Peru'))
+        self.assertEqual(['A-2'], process_ids(bin='BOLD:AAA0002', ids='B-1|A-2'))
+        self.assertEqual(['A-1'], process_ids(researchers='Jane Doe'))
+        self.assertEqual(['A-1', 'A-2', 'B-1'], process_ids(container='PROJ'))
+        self.assertEqual([], process_ids(container='OTHER'))
+        self.assertEqual(['BOLD:AAA0002', 'BOLD:AAA0003'], self.store.get('A-2')['bin_uri'])
+
+        items[0]['collection_event_country'] = 'Ecuador'
+        self.assertEqual({'new': 0, 'changed': 1, 'unchanged': 2}, self.store.add_items(items))
+        self.assertEqual(['B-1'], process_ids(geo='Peru'))
+
+    def tearDown(self):
+        self.store.close()
+
+
+if __name__ == '__main__':
+    runner = unittest.TextTestRunner(verbosity=2)
+    unittest.main(testRunner=runner)
@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+import math
+import unittest
+import warnings
+
+from Bio import BiopythonWarning
+
+import bold
+from bold.table import read_tsv
+
+from .stub_server import StubServerTestCase
+
+
+TSV = 'processid\trecordID\tinstitution_storing\tphylum_taxID\tlat\tlon\tcountry\n' \
+      'ICE001-14\t5001\tUniversity of Iceland\t20\t64.1\t-21.9\tIceland\n' \
+      'ICE002-14\t5002\tUniversity of Iceland\t20\t\t\tIceland\n' \
+      'ICE003-14\t5003\tMined from GenBank\t\t65.7\t-18.1\tIceland\n'
+
+
+class TestTable(StubServerTestCase):
+
+    def setUp(self):
+        warnings.simplefilter('ignore', BiopythonWarning)
+
+    def test_read_tsv(self):
+        table = read_tsv(TSV.splitlines(True))
+        self.assertEqual(3, len(table))
+        self.assertEqual(['processid', 'recordID', 'institution_storing', 'phylum_taxID',
+                          'lat', 'lon', 'country'], table.names)
+        self.assertEqual([5001, 5002, 5003], list(table['recordID']))
+        self.assertEqual('l', table['recordID'].typecode)
+        self.assertEqual(64.1, table['lat'][0])
+        self.assertTrue(math.isnan(table['lat'][1]))
+        self.assertEqual(20, table['phylum_taxID'][0])
+        self.assertTrue(math.isnan(table['phylum_taxID'][2]))
+        self.assertTrue(table['country'][0] is table['country'][2])
+        self.assertEqual('ICE002-14', list(table.rows())[1]['processid'])
+
+    def test_read_tsv_non_numeric(self):
+        table = read_tsv(['recordID\tlat', '1\t2.5', 'x\tnorth'])
+        self.assertEqual(['1', 'x'], table['recordID'])
+        self.assertEqual(['2.5', 'north'], table['lat'])
+
+    def test_read_tsv_mixed(self):
+        table = read_tsv(['recordID\tlat\telev', '1\t\t1200', '\t2\t3.50', '007\t-0\t',
+                          'abc\tx\tunknown'])
+        self.assertEqual(['1', '', '007', 'abc'], table['recordID'])
+        self.assertEqual(['', '2', '-0', 'x'], table['lat'])
+        self.assertEqual(['1200', '3.50', '', 'unknown'], table['elev'])
+
+    def test_read_tsv_empty(self):
+        self.assertEqual(None, read_tsv([]))
+
+    def test_call_specimen_data_columnar(self):
+        server = self.start_server({'/specimen': (200, {}, TSV.encode('utf-8'))},
+                                   {'call_specimen_data': '/specimen'})
+        res = bold.call_specimen_data(geo='Iceland', columnar=True)
+        self.assertTrue('format=tsv' in server.paths[0])
+        self.assertEqual(['Iceland'] * 3, res.items['country'])
+
+        res = bold.call_specimen_data(geo='Iceland|Greenland', shard_by='geo', columnar=True)
+        self.assertEqual(3, len(res.items))
+
+
+if __name__ == '__main__':
+    runner = unittest.TextTestRunner(verbosity=2)
+    unittest.main(testRunner=runner)
@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+import os
+import shutil
+import tempfile
+import unittest
+
+import bold
+from bold.taxonomy import TaxonomyIndex, get_taxonomy_index, set_taxonomy_index
+
+from .stub_server import StubServerTestCase
+
+
+# As parsed from call_taxon_data(302603, include_tree=True)
+TREE_ITEMS = [
+    {'tax_id': 1, 'parent_id': 1, 'taxon': 'Animalia', 'tax_rank': 'kingdom'},
+    {'tax_id': 20, 'parent_id': 1, 'taxon': 'Arthropoda', 'tax_rank': 'phylum'},
+    {'tax_id': 82, 'parent_id': 20, 'taxon': 'Insecta', 'tax_rank': 'class'},
+    {'tax_id': 113, 'parent_id': 82, 'taxon': 'Lepidoptera', 'tax_rank': 'order'},
+    {'tax_id': 7044, 'parent_id': 113, 'taxon': 'Nymphalidae', 'tax_rank': 'family'},
+    {'tax_id': 7045, 'parent_id': 7044, 'taxon': 'Euptychia', 'tax_rank': 'genus'},
+    {'tax_id': 302603, 'parent_id': 7045, 'taxon': 'Euptychia ordinata', 'tax_rank': 'species'},
+    {'tax_id': 302604, 'parent_id': 7045, 'taxon': 'Euptychia mollis', 'tax_rank': 'species'},
+    {'tax_id': 50, 'parent_id': 7044, 'taxon': 'Hermeuptychia', 'tax_rank': 'genus'},
+    {'tax_id': 41, 'parent_id': 82, 'taxon': 'Coleoptera', 'tax_rank': 'order'},
+    {'stats': {'publicspecies': 2}},
+]
+
+TAXON_JSON = b'{"302605":{"taxid":302605,"taxon":"Euptychia westwoodi","tax_rank":"species",' \
+             b'"tax_division":"Animals","parentid":7045,"parentname":"Euptychia"}}'
+
+
+class TestTaxonomyIndex(StubServerTestCase):
+
+    def setUp(self):
+        self.index = TaxonomyIndex()
+        self.index.add_items(TREE_ITEMS)
+
+    def test_lookup(self):
+        self.assertEqual(10, len(self.index))
+        self.assertTrue(302603 in self.index)
+        self.assertEqual('Euptychia ordinata', self.index.taxon(302603))
+        self.assertEqual('genus', self.index.rank('7045'))
+        self.assertEqual(7045, self.index.parent(302603))
+        self.assertEqual(None, self.index.parent(1))
+        self.assertEqual([7045], self.index.find('Euptychia'))
+
+    def test_lineage(self):
+        self.assertEqual([1, 20, 82, 113, 7044, 7045, 302603], self.index.lineage(302603))
+        self.assertEqual([7044, 113, 82, 20, 1], self.index.ancestors(7045))
+        self.assertEqual(7044, self.index.ancestor_at_rank(302603, 'family'))
+        self.assertEqual(None, self.index.ancestor_at_rank(82, 'family'))
+        self.assertRaises(KeyError, self.index.lineage, 999)
+        lineages = self.index.lineages([302603, 302604, 50])
+        self.assertEqual(self.index.lineage(302604), lineages[302604])
+        self.assertEqual([1, 20, 82, 113, 7044, 50], lineages[50])
+
+    def test_lowest_common_ancestor(self):
+        self.assertEqual(7045, self.index.lowest_common_ancestor(302603, 302604))
+        self.assertEqual(7044, self.index.lowest_common_ancestor(302603, 302604, 50))
+        self.assertEqual(82, self.index.lowest_common_ancestor(302603, 41))
+        self.assertEqual(7045, self.index.lowest_common_ancestor(302603, 7045))
+        self.index.add(5, taxon='Plantae')
+        self.assertEqual(None, self.index.lowest_common_ancestor(302603, 5))
+
+    def test_subtree(self):
+        self.assertEqual([50, 7044, 7045, 302603, 302604], sorted(self.index.subtree(7044)))
+        self.assertEqual([302603, 302604], sorted(self.index.subtree(82, rank='species')))
+
+    def test_move(self):
+        # BOLD moved a species to another genus
+        self.index.add(302604, parent_id=50)
+        self.assertEqual([50, 302604], sorted(self.index.subtree(50)))
+        self.assertEqual([7045, 302603], sorted(self.index.subtree(7045)))
+
+    def test_save_load(self):
+        directory = tempfile.mkdtemp()
+        try:
+            path = os.path.join(directory, 'taxonomy.json')
+            self.index.save(path)
+            index = TaxonomyIndex(path)
+            self.assertEqual(len(self.index), len(index))
+            self.assertEqual(self.index.lineage(302603), index.lineage(302603))
+            self.assertEqual('species', index.rank(302604))
+        finally:
+            shutil.rmtree(directory)
+
+    def test_call_taxon_search_feeds_index(self):
+        self.start_server({'/taxon': (200, {}, TAXON_JSON)}, {'call_taxon_search': '/taxon'})
+        self.addCleanup(set_taxonomy_index, None)
+        set_taxonomy_index(self.index)
+        bold.call_taxon_search('Euptychia westwoodi')
+        self.assertEqual(7045, get_taxonomy_index().lowest_common_ancestor(302603, 302605))
+
+
+if __name__ == '__main__':
+    runner = unittest.TextTestRunner(verbosity=2)
+    unittest.main(testRunner=runner)
@@ -1,11 +1,19 @@
 # -*- coding: utf-8 -*-
+import sys
 import unittest
 
+from Bio import MissingPythonDependencyError
 from Bio.Seq import Seq
 from Bio.SeqRecord import SeqRecord
 
 from bold import utils
 
+try:
+    import numpy  # noqa: F401
+    HAS_NUMPY = True
+except ImportError:
+    HAS_NUMPY = False
+
 
 class TestUtils(unittest.TestCase):
 
@@ -27,6 +35,44 @@ class TestUtils(unittest.TestCase):
         seq = {'not a seq object': 'dummy'}
         self.assertRaises(AttributeError, utils._prepare_sequence, seq)
 
+    def test_prepare_sequence_normalizes(self):
+        self.assertEqual('ACGTNACGT', utils._prepare_sequence('acgt-n.ac gt\n'))
+
+    @unittest.skipUnless(HAS_NUMPY, 'needs NumPy')
+    def test_prepare_sequences(self):
+        seqs = ['acgt-n.ac gt', SeqRecord(Seq('ACGTXZ'), id='read1'), '---', 'A' * 640,
+                'N' * 7 + 'A' * 693, 'N' * 8 + 'A' * 692]
+        prepared = utils.prepare_sequences(seqs)
+        self.assertEqual([0, 'read1', 2, 3, 4, 5], [item['id'] for item in prepared])
+        self.assertEqual({'id': 0, 'sequence': 'ACGTNACGT', 'length': 9, 'ambiguous': 1,
+                          'invalid': [], 'valid': True, 'cox1_l640bp': False}, prepared[0])
+        self.assertEqual(['X', 'Z'], prepared[1]['invalid'])
+        self.assertEqual([True, False, False, True, True, True],
+                         [item['valid'] for item in prepared])
+        self.assertEqual([False, False, False, True, True, False],
+                         [item['cox1_l640bp'] for item in prepared])
+        self.assertEqual([], utils.prepare_sequences([]))
+
+    @unittest.skipUnless(HAS_NUMPY, 'needs NumPy')
+    def test_prepare_sequences_same_gaps(self):
+        seqs = ['ACGT\xa0', 'AC\x1cGT\x85', 'ACGT\u2003', 'AC\xe9GT']
+        prepared = utils.prepare_sequences(seqs)
+        for seq, item in zip(seqs, prepared):
+            self.assertEqual(utils._prepare_sequence(seq), item['sequence'])
+            self.assertEqual(len(item['sequence']), item['length'])
+        self.assertEqual([True, True, False, False], [item['valid'] for item in prepared])
+
+    def test_prepare_sequences_without_numpy(self):
+        module = sys.modules.get('numpy')
+        sys.modules['numpy'] = None
+        try:
+            self.assertRaises(MissingPythonDependencyError, utils.prepare_sequences, ['ACGT'])
+        finally:
+            if module is None:
+                del sys.modules['numpy']
+            else:
+                sys.modules['numpy'] = module
+
     def tearDown(self):
         pass
 